@@ -0,0 +1,78 @@
+import asyncio
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Optional
+
+from decouple import config
+from loguru import logger
+
+from app.api.metrics import observe_stage
+
+CPU_POOL_WORKERS = config("cpu_pool_workers", default=2, cast=int)
+CPU_POOL_THRESHOLD = config("cpu_pool_threshold", default=5000, cast=int)
+
+_pool: Optional[ProcessPoolExecutor] = None
+
+
+def use_cpu_pool(size: int) -> bool:
+    """Whether work on size items is large enough to run in the CPU worker pool
+
+    Below the threshold, sending the data to a worker process costs more than
+    the work itself.
+    """
+
+    return CPU_POOL_WORKERS > 0 and size >= CPU_POOL_THRESHOLD
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+
+    if _pool is None:
+        # Workers are spawned, forking would copy the event loop and the
+        # connections of the API into them.
+        _pool = ProcessPoolExecutor(
+            max_workers=CPU_POOL_WORKERS,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+
+    return _pool
+
+
+async def run_cpu_bound(
+    stage: str, offload: bool, fn: Callable[..., Any], *args: Any
+) -> Any:
+    """Runs the CPU-heavy fn(*args) and records its timing as stage
+
+    With offload, fn runs in a worker process, so the event loop keeps serving
+    other requests and SSE clients in the meantime. fn must be a module level
+    function and args and the result must be picklable. Use use_cpu_pool() to
+    decide on offload and pass the raw data the way it pickles cheapest.
+    """
+
+    start = time.perf_counter()
+
+    if offload:
+        try:
+            loop = asyncio.get_running_loop()
+            res = await loop.run_in_executor(_get_pool(), fn, *args)
+            observe_stage(stage, time.perf_counter() - start, True)
+            return res
+        except BrokenProcessPool:
+            logger.error(
+                f"CPU worker pool broke while running {stage}, retrying inline"
+            )
+            shutdown_cpu_pool()
+
+    res = fn(*args)
+    observe_stage(stage, time.perf_counter() - start)
+    return res
+
+
+def shutdown_cpu_pool() -> None:
+    global _pool
+
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
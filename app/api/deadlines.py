@@ -0,0 +1,109 @@
+import asyncio
+import time
+from contextvars import ContextVar
+from typing import Iterable, Optional
+
+from decouple import config
+from fastapi import status
+from fastapi.exceptions import HTTPException
+from loguru import logger
+
+REQUEST_DEADLINE = config("request_deadline", default=300.0, cast=float)
+
+_deadline: ContextVar[Optional[float]] = ContextVar("request_deadline", default=None)
+
+
+def call_timeout(default: Optional[float]) -> Optional[float]:
+    """Returns the timeout in seconds for a call to the lightning node
+
+    default is the deadline of the called method. It is capped by the time left
+    until the deadline of the HTTP request the call is made for, if any.
+    """
+
+    deadline = _deadline.get()
+    if deadline is None:
+        return default
+
+    left = deadline - time.monotonic()
+    if left <= 0:
+        raise HTTPException(
+            status.HTTP_504_GATEWAY_TIMEOUT, detail="Request deadline exceeded"
+        )
+
+    return left if default is None else min(default, left)
+
+
+def clear_request_deadline() -> None:
+    """Detaches the current task from the deadline of the HTTP request
+
+    Used by background work which outlives the request that started it.
+    """
+
+    _deadline.set(None)
+
+
+class RequestDeadlineMiddleware:
+    """Propagates a deadline into each HTTP request and cancels abandoned requests
+
+    The deadline is request_deadline seconds after the request arrived, clients can
+    ask for a shorter one with the X-Request-Timeout header (in seconds). Backend
+    calls use call_timeout() to respect it.
+
+    If the client disconnects before the response is complete, the request is
+    cancelled together with the backend call it is waiting for.
+
+    Requests to exclude_paths, like server-sent event streams which stay open for
+    as long as the client wants, get neither a deadline nor the cancellation.
+    """
+
+    def __init__(self, app, exclude_paths: Iterable[str] = ()) -> None:
+        self.app = app
+        self.exclude_paths = frozenset(exclude_paths)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in self.exclude_paths:
+            return await self.app(scope, receive, send)
+
+        seconds = REQUEST_DEADLINE
+        header = dict(scope["headers"]).get(b"x-request-timeout")
+        if header is not None:
+            try:
+                seconds = min(seconds, float(header))
+            except ValueError:
+                pass
+
+        token = _deadline.set(time.monotonic() + seconds)
+        try:
+            await self._run_cancellable(scope, receive, send)
+        finally:
+            _deadline.reset(token)
+
+    async def _run_cancellable(self, scope, receive, send):
+        # Only this middleware reads from the client, the app gets the messages
+        # through a queue. That way a disconnect is noticed while the app waits
+        # for the lightning node.
+        queue = asyncio.Queue()
+        disconnected = False
+
+        app_task = asyncio.create_task(self.app(scope, queue.get, send))
+
+        async def _watch():
+            nonlocal disconnected
+            while True:
+                message = await receive()
+                queue.put_nowait(message)
+                if message["type"] == "http.disconnect":
+                    disconnected = True
+                    app_task.cancel()
+                    return
+
+        watch_task = asyncio.create_task(_watch())
+        try:
+            await app_task
+        except asyncio.CancelledError:
+            if not disconnected:
+                raise
+
+            logger.debug(f"Client disconnected, cancelled {scope['path']}")
+        finally:
+            watch_task.cancel()
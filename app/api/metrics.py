@@ -0,0 +1,36 @@
+from typing import Dict
+
+from app.api.models import ApiMetrics, StageTiming
+
+_stages: Dict[str, StageTiming] = {}
+_gauges: Dict[str, Dict[str, float]] = {}
+
+
+def observe_stage(name: str, seconds: float, offloaded: bool = False) -> None:
+    """Records a run of a processing stage which took the given time"""
+
+    timing = _stages.get(name)
+    if timing is None:
+        timing = _stages[name] = StageTiming()
+
+    ms = seconds * 1000
+    timing.count += 1
+    timing.offloaded += 1 if offloaded else 0
+    timing.total_ms += ms
+    timing.max_ms = max(timing.max_ms, ms)
+    timing.last_ms = ms
+
+
+def set_gauge(name: str, label: str, value: float) -> None:
+    _gauges.setdefault(name, {})[label] = value
+
+
+def remove_gauge(name: str, label: str) -> None:
+    _gauges.get(name, {}).pop(label, None)
+
+
+def get_metrics() -> ApiMetrics:
+    return ApiMetrics(
+        stages={k: v.model_copy() for k, v in _stages.items()},
+        gauges={k: dict(v) for k, v in _gauges.items()},
+    )
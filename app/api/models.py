@@ -1,6 +1,7 @@
 from enum import Enum
-from typing import Optional
+from typing import Dict, Optional
 
+from fastapi import Query
 from pydantic import BaseModel
 
 
@@ -37,3 +38,22 @@ class ApiStartupStatus(BaseModel):
             self.lightning == StartupState.DONE
             or self.lightning == StartupState.DISABLED
         )
+
+
+class StageTiming(BaseModel):
+    count: int = Query(0, description="Number of times the stage ran")
+    offloaded: int = Query(
+        0, description="Number of runs which were offloaded to the CPU worker pool"
+    )
+    total_ms: float = Query(0, description="Total time spent in the stage")
+    max_ms: float = Query(0, description="Longest run of the stage")
+    last_ms: float = Query(0, description="Duration of the latest run of the stage")
+
+
+class ApiMetrics(BaseModel):
+    stages: Dict[str, StageTiming] = Query(
+        {}, description="Timings of the CPU-heavy processing stages, by stage name"
+    )
+    gauges: Dict[str, Dict[str, float]] = Query(
+        {}, description="Current values of the gauges, by gauge name and label"
+    )
@@ -0,0 +1,41 @@
+from functools import lru_cache
+from typing import Any, List, Mapping, Optional, Type
+
+from pydantic import BaseModel, TypeAdapter
+from starlette.background import BackgroundTask
+from starlette.responses import Response
+
+
+@lru_cache(maxsize=None)
+def _list_adapter(model: Type[BaseModel]) -> TypeAdapter:
+    return TypeAdapter(List[model])
+
+
+class ModelListResponse(Response):
+    """JSON response for a list of models, serialized directly to bytes
+
+    Returning a list of models from a path makes FastAPI validate it against the
+    response_model, convert it to a list of dicts and encode that with json.
+    This response serializes the models in one pass with the pydantic core
+    serializer instead. The body is identical to the one FastAPI would send for
+    response_model=List[model]. Paths keep their response_model for the docs.
+
+    The models are not validated, so they must come from trusted data, like the
+    converters of the backends.
+    """
+
+    media_type = "application/json"
+
+    def __init__(
+        self,
+        content: List[BaseModel],
+        model: Type[BaseModel],
+        status_code: int = 200,
+        headers: Optional[Mapping[str, str]] = None,
+        background: Optional[BackgroundTask] = None,
+    ) -> None:
+        self._adapter = _list_adapter(model)
+        super().__init__(content, status_code, headers, None, background)
+
+    def render(self, content: Any) -> bytes:
+        return self._adapter.dump_json(content)
@@ -1,6 +1,6 @@
 import asyncio
 from asyncio.log import logger
-from typing import Tuple
+from typing import Dict, List, Optional, Set, Tuple
 
 import async_timeout
 from fastapi import Request
@@ -12,6 +12,7 @@ class SSEManager:
     _setup_finished = False
     _num_connections = 0
     _connections = {}
+    _topics: Dict[str, Set[int]] = {}
     _sse_queue = asyncio.Queue()
 
     def setup(self) -> None:
@@ -22,11 +23,16 @@ class SSEManager:
         loop.create_task(self._broadcast_data_sse())
         self._setup_finished = True
 
-    def add_connection(self, request: Request) -> Tuple[EventSourceResponse, int]:
+    def add_connection(
+        self, request: Request, topics: Optional[List[str]] = None
+    ) -> Tuple[EventSourceResponse, int]:
         q = asyncio.Queue()
         id = self._num_connections
         self._num_connections += 1
         self._connections[id] = q
+        for t in topics or []:
+            self._topics.setdefault(t, set()).add(id)
+
         event_source = EventSourceResponse(self._subscribe(request, id, q))
         return (event_source, id)
 
@@ -36,12 +42,41 @@ class SSEManager:
     async def broadcast_to_all(self, data: ServerSentEvent):
         await self._sse_queue.put(data)
 
+    def has_subscribers(self, topics: Optional[List[str]] = None) -> bool:
+        """Returns True if any connection subscribed to one of the topics
+
+        Without topics, returns True if any client is connected at all.
+        """
+
+        if topics is None:
+            return len(self._connections) > 0
+
+        return any(len(self._topics.get(t, ())) > 0 for t in topics)
+
+    async def send_to_topics(self, topics: List[str], data: ServerSentEvent):
+        """Sends data to all connections which subscribed to any of the topics"""
+
+        ids = set()
+        for t in topics:
+            ids.update(self._topics.get(t, ()))
+
+        for id in ids:
+            if self._connections.get(id):
+                await self._connections[id].put(data)
+
+    def _remove_connection(self, id: int):
+        self._connections.pop(id)
+        for t in list(self._topics.keys()):
+            self._topics[t].discard(id)
+            if len(self._topics[t]) == 0:
+                self._topics.pop(t)
+
     async def _subscribe(self, request: Request, id: int, q: asyncio.Queue):
         try:
             while True:
                 if await request.is_disconnected():
                     logger.info(f"Client with ID {id} has disconnected")
-                    self._connections.pop(id)
+                    self._remove_connection(id)
                     await request.close()
                     break
                 else:
@@ -49,7 +84,7 @@ class SSEManager:
                     yield data
         except asyncio.CancelledError as e:
             logger.info(f"CancelledError on client with ID {id}: {e}")
-            self._connections.pop(id)
+            self._remove_connection(id)
             await request.close()
 
     async def _broadcast_data_sse(self):
@@ -1,16 +1,18 @@
 import array
 import asyncio
+import hashlib
 import json
 import os
 import random
 import re
 import time
 import warnings
-from typing import Dict, Optional
+from typing import Any, Dict, List, Optional
 
 from fastapi.encoders import jsonable_encoder
 from fastapi_plugins import redis_plugin
 from loguru import logger
+from pydantic import BaseModel
 
 from app.api.sse_manager import SSEManager
 from app.external.sse_starlette import ServerSentEvent
@@ -58,6 +60,27 @@ async def broadcast_sse_msg(event: str, json_data: Optional[Dict]):
     await sse_mgr.broadcast_to_all(build_sse_event(event, json_data))
 
 
+async def send_sse_msg_to_topics(
+    topics: List[str], event: str, json_data: Optional[Dict]
+):
+    """Sends a message to all clients which subscribed to any of the topics
+
+    Clients subscribe to topics with the topics parameter of /sse/subscribe.
+    """
+
+    await sse_mgr.send_to_topics(topics, build_sse_event(event, json_data))
+
+
+def sse_has_subscribers(topics: Optional[List[str]] = None) -> bool:
+    """Returns True if any client would receive a message for the topics
+
+    Without topics, returns True if any client is connected to /sse/subscribe.
+    Producers use it to skip building messages nobody receives.
+    """
+
+    return sse_mgr.has_subscribers(topics)
+
+
 async def redis_get(key: str) -> str:
     v = await redis_plugin.redis.get(key)
 
@@ -75,6 +98,122 @@ async def redis_get(key: str) -> str:
         return v
 
 
+def _persisted_state_path(name: str) -> str:
+    return os.path.join(os.path.expanduser("~"), ".blitz_api", "state", f"{name}.json")
+
+
+def _read_persisted_state(path: str) -> Optional[Dict]:
+    if not os.path.exists(path):
+        return None
+
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+def _write_persisted_state(path: str, data: Dict) -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    # write to a temporary file first so a crash never leaves a half written file
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(data, f)
+
+    os.replace(tmp_path, path)
+
+
+async def load_persisted_state(name: str) -> Optional[Dict]:
+    """Loads state which was stored with save_persisted_state
+
+    Returns None if no state was stored yet or if it can't be read.
+    """
+
+    path = _persisted_state_path(name)
+    try:
+        return await asyncio.to_thread(_read_persisted_state, path)
+    except (OSError, ValueError) as e:
+        logger.warning(f"Unable to load persisted state '{name}' from {path}: {e}")
+        return None
+
+
+async def save_persisted_state(name: str, data: Dict) -> None:
+    """Stores a JSON serializable dict in the API data folder (~/.blitz_api/state)
+
+    Failing to persist the state is logged but not raised, callers keep working with
+    their in-memory state.
+    """
+
+    path = _persisted_state_path(name)
+    try:
+        await asyncio.to_thread(_write_persisted_state, path, data)
+    except (OSError, TypeError, ValueError) as e:
+        logger.warning(f"Unable to persist state '{name}' to {path}: {e}")
+
+
+def _canonicalize(value: Any, ignore_order: bool) -> Any:
+    if isinstance(value, dict):
+        return {str(k): _canonicalize(v, ignore_order) for k, v in value.items()}
+
+    if isinstance(value, (list, tuple, set)):
+        items = [_canonicalize(v, ignore_order) for v in value]
+        if ignore_order or isinstance(value, set):
+            items.sort(key=lambda v: json.dumps(v, sort_keys=True, default=str))
+        return items
+
+    return value
+
+
+def fingerprint(data: Any, ignore_order: bool = False) -> Dict[str, bytes]:
+    """Computes a stable fingerprint for each top-level field of a model or dict
+
+    Each field is hashed from a canonical JSON serialization with sorted keys.
+    With ignore_order, lists are compared like sets of their items.
+    """
+
+    if isinstance(data, BaseModel):
+        data = data.model_dump()
+
+    res = {}
+    for k, v in data.items():
+        s = json.dumps(
+            _canonicalize(v, ignore_order),
+            sort_keys=True,
+            separators=(",", ":"),
+            default=str,
+        )
+        res[k] = hashlib.blake2b(s.encode(), digest_size=16).digest()
+
+    return res
+
+
+class ChangeDetector:
+    """Detects changes between consecutive samples of a gatherer loop
+
+    Only the fingerprints of the last sample are kept, comparing a new sample
+    costs one serialization instead of a deep comparison of two objects.
+    """
+
+    def __init__(self, ignore_order: bool = False) -> None:
+        self._ignore_order = ignore_order
+        self._last: Optional[Dict[str, bytes]] = None
+
+    def update(self, data: Any) -> List[str]:
+        """Stores the new sample and returns the top-level fields which changed
+
+        The first sample reports all of its fields as changed.
+        """
+
+        current = fingerprint(data, self._ignore_order)
+        last = self._last or {}
+        self._last = current
+
+        changed = [k for k, f in current.items() if last.get(k) != f]
+        changed.extend(k for k in last if k not in current)
+        return changed
+
+    def reset(self) -> None:
+        self._last = None
+
+
 # TODO
 # idea is to have a second redis channel called system, that the API subscribes to.
 # If for example the 'state' value gets changed by the _cache.sh script, it should
@@ -103,11 +242,15 @@ class SSE:
     LN_INFO_LITE = "ln_info_lite"
     LN_INVOICE_STATUS = "ln_invoice_status"
     LN_PAYMENT_STATUS = "ln_payment_status"
+    LN_PAYMENT_PROGRESS = "ln_payment_progress"
     LN_ONCHAIN_PAYMENT_STATUS = "ln_onchain_payment_status"
     LN_FEE_REVENUE = "ln_fee_revenue"
     LN_FORWARD_SUCCESSES = "ln_forward_successes"
+    LN_CHANNEL_CHANGES = "ln_channel_changes"
     WALLET_BALANCE = "wallet_balance"
 
+    JOB_STATUS = "job_status"
+
 
 # https://gist.github.com/risent/4cab3878d995bec7d1c2
 # https://firebase.blog/posts/2015/02/the-2120-ways-to-ensure-unique_68
@@ -1,6 +1,7 @@
 import asyncio
 import binascii
 import json
+from typing import Awaitable, Callable, Dict, List
 
 import zmq
 import zmq.asyncio
@@ -10,7 +11,7 @@ from fastapi.exceptions import HTTPException
 from loguru import logger
 from starlette import status
 
-from app.api.utils import SSE, broadcast_sse_msg
+from app.api.utils import SSE, ChangeDetector, broadcast_sse_msg
 from app.bitcoind.models import (
     BlockchainInfo,
     BlockRpcFunc,
@@ -22,6 +23,7 @@ from app.bitcoind.models import (
 from app.bitcoind.utils import bitcoin_config, bitcoin_rpc_async
 
 _initialized = False
+_new_block_listeners: List[Callable[[Dict], Awaitable[None]]] = []
 
 
 @logger.catch(exclude=(HTTPException,))
@@ -127,6 +129,16 @@ async def get_raw_transaction(txid: str) -> RawTransaction:
     raise HTTPException(status.HTTP_500_INTERNAL_SERVER_ERROR, detail=result["error"])
 
 
+@logger.catch(exclude=(HTTPException,))
+async def validate_address(address: str) -> bool:
+    result = await bitcoin_rpc_async("validateaddress", [address])
+
+    if result["error"] is not None:
+        raise HTTPException(result["status"], detail=result["error"])
+
+    return result["result"]["isvalid"]
+
+
 @logger.catch(exclude=(HTTPException,))
 async def get_btc_info() -> BtcInfo:
     binfo = await get_blockchain_info()
@@ -189,6 +201,18 @@ async def handle_block_sub_redis(verbosity: int = 1) -> str:
         r = await bitcoin_rpc_async("getblock", [hash, verbosity])
         await broadcast_sse_msg(SSE.BTC_NEW_BLOC, r["result"])
 
+        for listener in _new_block_listeners:
+            try:
+                await listener(r["result"])
+            except Exception as e:
+                logger.exception(f"New block listener failed: {e}")
+
+
+def register_new_block_listener(listener: Callable[[Dict], Awaitable[None]]):
+    """Registers a coroutine function which is called with each new block"""
+
+    _new_block_listeners.append(listener)
+
 
 @logger.catch(exclude=(HTTPException,))
 async def register_bitcoin_zmq_sub():
@@ -198,7 +222,7 @@ async def register_bitcoin_zmq_sub():
 
 @logger.catch(exclude=(HTTPException,))
 async def _handle_gather_bitcoin_status():
-    last_info = {}
+    info_changes = ChangeDetector()
     while True:
         try:
             info = await get_btc_info()
@@ -211,10 +235,11 @@ async def _handle_gather_bitcoin_status():
             await asyncio.sleep(2)
             continue
 
-        if last_info != info:
+        changed = info_changes.update(info)
+        if len(changed) > 0:
             # only send data if anything has changed
+            logger.trace(f"BtcInfo changed: {changed}")
             await broadcast_sse_msg(SSE.BTC_INFO, info.model_dump())
-            last_info = info
 
         await asyncio.sleep(2)
 
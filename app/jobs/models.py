@@ -0,0 +1,40 @@
+from enum import Enum
+from typing import Any, Optional
+
+from fastapi import Query
+from pydantic import BaseModel
+
+
+class JobStatus(str, Enum):
+    RUNNING = "running"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+
+
+class JobError(BaseModel):
+    status_code: int = Query(
+        ..., description="The HTTP status code the operation would have returned."
+    )
+    detail: str = Query("", description="The error message.")
+
+
+class Job(BaseModel):
+    id: str = Query(..., description="The unique ID of the job.")
+    type: str = Query(
+        ..., description="The operation which is executed, e.g. `send_payment`."
+    )
+    status: JobStatus = Query(JobStatus.RUNNING, description="The job status.")
+    created_at: int = Query(
+        ..., description="UNIX timestamp in seconds when the job was created."
+    )
+    finished_at: Optional[int] = Query(
+        None, description="UNIX timestamp in seconds when the job finished."
+    )
+    result: Optional[Any] = Query(
+        None,
+        description=(
+            "The response the synchronous endpoint would have returned. "
+            "Only set when the job succeeded."
+        ),
+    )
+    error: Optional[JobError] = Query(None, description="Only set when the job failed.")
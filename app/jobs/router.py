@@ -0,0 +1,35 @@
+from typing import List
+
+from fastapi import APIRouter
+from fastapi.params import Depends
+
+from app.auth.auth_bearer import JWTBearer
+from app.jobs.models import Job
+from app.jobs.service import get_job, list_jobs
+
+_PREFIX = "jobs"
+
+router = APIRouter(prefix=f"/{_PREFIX}", tags=["Jobs"])
+
+
+@router.get(
+    "/",
+    name=f"{_PREFIX}.list",
+    summary="List all running and recently finished jobs",
+    dependencies=[Depends(JWTBearer())],
+    response_model=List[Job],
+)
+async def list_jobs_path():
+    return list_jobs()
+
+
+@router.get(
+    "/{id}",
+    name=f"{_PREFIX}.get",
+    summary="Get the status and result of a job",
+    dependencies=[Depends(JWTBearer())],
+    response_model=Job,
+    responses={404: {"description": "When no job with this ID is known."}},
+)
+async def get_job_path(id: str):
+    return get_job(id)
@@ -0,0 +1,100 @@
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List
+
+from decouple import config
+from fastapi import status
+from fastapi.exceptions import HTTPException
+from loguru import logger
+from pydantic import BaseModel
+
+from app.api.deadlines import clear_request_deadline
+from app.api.utils import SSE, broadcast_sse_msg, next_push_id
+from app.jobs.models import Job, JobError, JobStatus
+
+MAX_FINISHED_JOBS = config("jobs_max_finished", default=200, cast=int)
+
+_jobs: "OrderedDict[str, Job]" = OrderedDict()
+# Keeps references to the running tasks, the event loop only holds weak ones
+_tasks: Dict[str, asyncio.Task] = {}
+
+
+def submit_job(type: str, operation: Callable[[], Awaitable[Any]]) -> Job:
+    """Runs operation in the background and returns its job immediately
+
+    Status changes are broadcast via the job_status SSE event. The result is
+    stored with the job, finished jobs beyond jobs_max_finished are dropped,
+    oldest first.
+    """
+
+    job = Job(
+        id=next_push_id(),
+        type=type,
+        status=JobStatus.RUNNING,
+        created_at=int(time.time()),
+    )
+    _jobs[job.id] = job
+
+    loop = asyncio.get_event_loop()
+    _tasks[job.id] = loop.create_task(_run(job, operation))
+
+    return job
+
+
+def get_job(id: str) -> Job:
+    job = _jobs.get(id)
+    if job is None:
+        raise HTTPException(status.HTTP_404_NOT_FOUND, detail=f"Job {id} not found")
+
+    return job
+
+
+def list_jobs() -> List[Job]:
+    return list(_jobs.values())
+
+
+async def _run(job: Job, operation: Callable[[], Awaitable[Any]]):
+    # The job outlives the request which submitted it
+    clear_request_deadline()
+
+    await broadcast_sse_msg(SSE.JOB_STATUS, job.model_dump())
+
+    try:
+        res = await operation()
+        if isinstance(res, BaseModel):
+            res = res.model_dump()
+
+        job.result = res
+        job.status = JobStatus.SUCCEEDED
+    except HTTPException as e:
+        job.error = JobError(status_code=e.status_code, detail=str(e.detail))
+    except NotImplementedError as e:
+        job.error = JobError(status_code=status.HTTP_501_NOT_IMPLEMENTED, detail=str(e))
+    except ValueError as e:
+        job.error = JobError(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    except Exception as e:
+        logger.exception(f"Job {job.id} ({job.type}) failed: {e}")
+        job.error = JobError(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e)
+        )
+    finally:
+        if job.status != JobStatus.SUCCEEDED:
+            job.status = JobStatus.FAILED
+            if job.error is None:
+                job.error = JobError(
+                    status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                    detail="Job was cancelled",
+                )
+
+        job.finished_at = int(time.time())
+        _tasks.pop(job.id, None)
+        _evict_finished_jobs()
+
+    await broadcast_sse_msg(SSE.JOB_STATUS, job.model_dump())
+
+
+def _evict_finished_jobs():
+    finished = [j.id for j in _jobs.values() if j.status != JobStatus.RUNNING]
+    for id in finished[: max(0, len(finished) - MAX_FINISHED_JOBS)]:
+        _jobs.pop(id)
@@ -0,0 +1,83 @@
+from typing import Dict, List, Optional, Tuple
+
+from app.lightning.models import Channel
+
+
+def channel_key(c: Channel) -> str:
+    # CLN channels don't have a short channel id before they are confirmed
+    if c.channel_id:
+        return c.channel_id
+
+    return f"pending:{c.peer_publickey}"
+
+
+class ChannelTable:
+    """Materialized list of the node's channels
+
+    The table is either replaced by a fresh channel list, which is diffed against
+    the current state, or updated from single channel events. Every update returns
+    the channels which changed and the keys of the ones which were removed.
+    """
+
+    def __init__(self) -> None:
+        self._channels: Dict[str, Channel] = {}
+        self._aliases: Dict[str, str] = {}
+        self._valid = False
+
+    @property
+    def valid(self) -> bool:
+        return self._valid
+
+    def invalidate(self) -> None:
+        self._valid = False
+
+    def channels(self) -> List[Channel]:
+        return list(self._channels.values())
+
+    def alias(self, peer_publickey: str) -> Optional[str]:
+        return self._aliases.get(peer_publickey)
+
+    def replace(self, channels: List[Channel]) -> Tuple[List[Channel], List[str]]:
+        new = {channel_key(c): c for c in channels}
+        changed = [c for k, c in new.items() if self._channels.get(k) != c]
+        removed = [k for k in self._channels if k not in new]
+
+        self._channels = new
+        self._valid = True
+        self._remember_aliases(channels)
+
+        return changed, removed
+
+    def upsert(self, channel: Channel) -> Tuple[List[Channel], List[str]]:
+        if channel.peer_alias in (None, "n/a") and channel.peer_publickey:
+            alias = self._aliases.get(channel.peer_publickey)
+            if alias is not None:
+                channel = channel.model_copy(update={"peer_alias": alias})
+
+        key = channel_key(channel)
+        if self._channels.get(key) == channel:
+            return [], []
+
+        self._channels[key] = channel
+        self._remember_aliases([channel])
+        return [channel], []
+
+    def set_active(self, key: str, active: bool) -> Tuple[List[Channel], List[str]]:
+        c = self._channels.get(key)
+        if c is None or c.active == active:
+            return [], []
+
+        c = c.model_copy(update={"active": active})
+        self._channels[key] = c
+        return [c], []
+
+    def remove(self, key: str) -> Tuple[List[Channel], List[str]]:
+        if self._channels.pop(key, None) is None:
+            return [], []
+
+        return [], [key]
+
+    def _remember_aliases(self, channels: List[Channel]) -> None:
+        for c in channels:
+            if c.peer_publickey and c.peer_alias not in (None, "", "n/a"):
+                self._aliases[c.peer_publickey] = c.peer_alias
@@ -123,6 +123,15 @@ This endpoints attempts to pay a payment request.
 Intermediate status updates will be sent via the SSE channel. This endpoint returns the last success or error message from the node.
 """
 
+forward_stats_desc = """
+Returns routing statistics of successful forwards over an arbitrary time range.
+
+* __group_by=channel__: One entry per channel. Incoming volume is accounted to the incoming channel. Outgoing volume and the fee earned are accounted to the outgoing channel.
+* __group_by=day__: One entry per day (UTC).
+
+Statistics are computed from a local forward history store. It is filled by the live forward listener and backfilled from the node's forwarding history on start up. Until backfilling is done, the statistics might be incomplete.
+"""
+
 open_channel_desc = """
 __open-channel__ attempts to open a channel with a peer.
 
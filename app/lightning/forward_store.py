@@ -0,0 +1,321 @@
+import asyncio
+import json
+import os
+
+import numpy as np
+from loguru import logger
+
+from app.lightning.models import (
+    ForwardStatsEntry,
+    ForwardStatsGroupBy,
+    ForwardSuccessEvent,
+)
+
+_COLUMNS = {
+    "timestamp_ns": np.int64,
+    "chan_in": np.uint32,
+    "chan_out": np.uint32,
+    "amt_in_msat": np.int64,
+    "amt_out_msat": np.int64,
+    "fee_msat": np.int64,
+}
+_INITIAL_CAPACITY = 4096
+_NS_PER_DAY = 86400 * 1_000_000_000
+
+
+class ForwardStore:
+    """Columnar history of successful forwards
+
+    Each column is a NumPy array memory-mapped from a .npy file in the store folder.
+    Channel IDs are stored as codes into a channel list which is kept in meta.json,
+    together with the number of valid rows. Rows are written before the row count
+    is updated, a crash in between only loses the last batch.
+
+    Writing flushes every column to disk, so live forwards are buffered by add()
+    and written in batches by flush(). Writes run in a thread, to not block the
+    event loop, one at a time.
+
+    Queries are vectorized over the columns, so grouping millions of forwards takes
+    milliseconds and doesn't touch the lightning node at all.
+    """
+
+    def __init__(self, path: str) -> None:
+        self._path = os.path.expanduser(path)
+        self._count = 0
+        self._channels: list[str] = []
+        self._channel_codes: dict[str, int] = {}
+        self._columns: dict[str, np.ndarray] = {}
+        self._opened = False
+        self._lock = asyncio.Lock()
+
+        # Forwards seen by the live listener before backfilling finished
+        self._backfilled = False
+        self._backfill_cutoff_ns = 0
+        self._pending: list[ForwardSuccessEvent] = []
+
+    @property
+    def count(self) -> int:
+        return self._count
+
+    @property
+    def last_timestamp_ns(self) -> int:
+        if self._count == 0:
+            return 0
+
+        return int(self._columns["timestamp_ns"][: self._count].max())
+
+    def open(self) -> None:
+        if self._opened:
+            return
+
+        os.makedirs(self._path, exist_ok=True)
+
+        meta = self._read_meta()
+        files_exist = all(os.path.exists(self._column_path(c)) for c in _COLUMNS)
+        if meta is None or not files_exist:
+            if meta is not None:
+                logger.warning("Forward store is incomplete, starting a new one.")
+
+            self._create(_INITIAL_CAPACITY)
+        else:
+            self._count = meta["count"]
+            self._channels = meta["channels"]
+            self._channel_codes = {c: i for i, c in enumerate(self._channels)}
+            for name in _COLUMNS:
+                self._columns[name] = np.lib.format.open_memmap(
+                    self._column_path(name), mode="r+"
+                )
+
+        self._opened = True
+        logger.info(f"Opened forward store at {self._path} with {self._count} rows")
+
+    def add(self, events: list[ForwardSuccessEvent]) -> None:
+        """Buffers forwards received from the live forward listener
+
+        They are written by the next flush() after backfilling is done. Forwards
+        which are already part of the backfilled history are skipped then.
+        """
+
+        self._pending.extend(events)
+
+    async def flush(self) -> None:
+        """Writes the buffered live forwards"""
+
+        if not self._backfilled or len(self._pending) == 0:
+            return
+
+        events = [e for e in self._pending if e.timestamp_ns > self._backfill_cutoff_ns]
+        self._pending = []
+        try:
+            await self._write(events)
+        except OSError as e:
+            logger.error(f"Unable to write to the forward store: {e}")
+            # retried with the next flush
+            self._pending = events + self._pending
+
+    async def backfill(self, history) -> None:
+        """Appends all forwards from the history which are newer than the stored ones
+
+        history must be a callable which accepts a start time in seconds and
+        returns an async generator of ForwardSuccessEvent.
+        """
+
+        self.open()
+
+        last_ns = self.last_timestamp_ns
+        batch = []
+        num_added = 0
+        try:
+            async for e in history(last_ns // 1_000_000_000):
+                if e.timestamp_ns <= last_ns:
+                    continue
+
+                batch.append(e)
+                if len(batch) >= _INITIAL_CAPACITY:
+                    await self._write(batch)
+                    num_added += len(batch)
+                    batch = []
+
+            await self._write(batch)
+            num_added += len(batch)
+            logger.info(f"Backfilled {num_added} forwards into the forward store")
+        finally:
+            # Even if backfilling failed, live forwards must not pile up in memory
+            self._backfill_cutoff_ns = self.last_timestamp_ns
+            self._backfilled = True
+            await self.flush()
+
+    async def stats(
+        self,
+        from_ns: int | None,
+        to_ns: int | None,
+        group_by: ForwardStatsGroupBy,
+    ) -> list[ForwardStatsEntry]:
+        self.open()
+
+        # don't read the columns while _grow() replaces them
+        async with self._lock:
+            return self._stats(from_ns, to_ns, group_by)
+
+    def _stats(
+        self,
+        from_ns: int | None,
+        to_ns: int | None,
+        group_by: ForwardStatsGroupBy,
+    ) -> list[ForwardStatsEntry]:
+        n = self._count
+        ts = self._columns["timestamp_ns"][:n]
+        mask = np.ones(n, dtype=bool)
+        if from_ns is not None:
+            mask &= ts >= from_ns
+        if to_ns is not None:
+            mask &= ts < to_ns
+
+        chan_in = self._columns["chan_in"][:n][mask]
+        chan_out = self._columns["chan_out"][:n][mask]
+        amt_in = self._columns["amt_in_msat"][:n][mask]
+        amt_out = self._columns["amt_out_msat"][:n][mask]
+        fee = self._columns["fee_msat"][:n][mask]
+
+        if group_by == ForwardStatsGroupBy.DAY:
+            days, idx = np.unique(ts[mask] // _NS_PER_DAY, return_inverse=True)
+            # YYYY-MM-DD in UTC
+            keys = [str(np.datetime64(int(d), "D")) for d in days]
+            num = np.bincount(idx, minlength=len(days))
+            return self._build_entries(
+                keys,
+                num,
+                num,
+                self._group_sum(idx, amt_in, len(days)),
+                self._group_sum(idx, amt_out, len(days)),
+                self._group_sum(idx, fee, len(days)),
+            )
+
+        # Incoming volume is accounted to the incoming channel, outgoing volume
+        # and the fee earned to the outgoing channel.
+        num_chan = len(self._channels)
+        num_in = np.bincount(chan_in, minlength=num_chan)
+        num_out = np.bincount(chan_out, minlength=num_chan)
+        used = np.nonzero((num_in > 0) | (num_out > 0))[0]
+
+        return self._build_entries(
+            [self._channels[c] for c in used],
+            num_in[used],
+            num_out[used],
+            self._group_sum(chan_in, amt_in, num_chan)[used],
+            self._group_sum(chan_out, amt_out, num_chan)[used],
+            self._group_sum(chan_out, fee, num_chan)[used],
+        )
+
+    async def _write(self, events: list[ForwardSuccessEvent]) -> None:
+        if len(events) == 0:
+            return
+
+        async with self._lock:
+            await asyncio.to_thread(self._append, events)
+
+    def _append(self, events: list[ForwardSuccessEvent]) -> None:
+        if len(events) == 0:
+            return
+
+        start = self._count
+        end = start + len(events)
+        if end > len(self._columns["timestamp_ns"]):
+            self._grow(end)
+
+        cols = self._columns
+        cols["timestamp_ns"][start:end] = [e.timestamp_ns for e in events]
+        cols["chan_in"][start:end] = [self._code(e.chan_id_in) for e in events]
+        cols["chan_out"][start:end] = [self._code(e.chan_id_out) for e in events]
+        cols["amt_in_msat"][start:end] = [e.amt_in_msat for e in events]
+        cols["amt_out_msat"][start:end] = [e.amt_out_msat for e in events]
+        cols["fee_msat"][start:end] = [e.fee_msat for e in events]
+
+        for c in cols.values():
+            c.flush()
+
+        self._count = end
+        self._write_meta()
+
+    def _code(self, channel_id: str) -> int:
+        code = self._channel_codes.get(channel_id)
+        if code is None:
+            code = len(self._channels)
+            self._channels.append(channel_id)
+            self._channel_codes[channel_id] = code
+
+        return code
+
+    def _create(self, capacity: int) -> None:
+        self._count = 0
+        self._channels = []
+        self._channel_codes = {}
+        for name, dtype in _COLUMNS.items():
+            self._columns[name] = np.lib.format.open_memmap(
+                self._column_path(name), mode="w+", dtype=dtype, shape=(capacity,)
+            )
+
+        self._write_meta()
+
+    def _grow(self, min_capacity: int) -> None:
+        capacity = max(len(self._columns["timestamp_ns"]) * 2, min_capacity)
+        for name, dtype in _COLUMNS.items():
+            path = self._column_path(name)
+            tmp_path = f"{path}.tmp"
+            grown = np.lib.format.open_memmap(
+                tmp_path, mode="w+", dtype=dtype, shape=(capacity,)
+            )
+            grown[: self._count] = self._columns[name][: self._count]
+            grown.flush()
+
+            del grown
+            del self._columns[name]
+            os.replace(tmp_path, path)
+            self._columns[name] = np.lib.format.open_memmap(path, mode="r+")
+
+    def _column_path(self, name: str) -> str:
+        return os.path.join(self._path, f"{name}.npy")
+
+    def _read_meta(self) -> dict | None:
+        path = os.path.join(self._path, "meta.json")
+        if not os.path.exists(path):
+            return None
+
+        try:
+            with open(path, "r") as f:
+                meta = json.load(f)
+                return {"count": int(meta["count"]), "channels": meta["channels"]}
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            logger.warning(f"Unable to read forward store meta data: {e}")
+            return None
+
+    def _write_meta(self) -> None:
+        path = os.path.join(self._path, "meta.json")
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"count": self._count, "channels": self._channels}, f)
+
+        os.replace(tmp_path, path)
+
+    @staticmethod
+    def _group_sum(groups: np.ndarray, values: np.ndarray, size: int) -> np.ndarray:
+        # np.bincount sums as float, np.add.at keeps the exact integer values
+        res = np.zeros(size, dtype=np.int64)
+        np.add.at(res, groups, values)
+        return res
+
+    @staticmethod
+    def _build_entries(
+        keys, num_in, num_out, amt_in, amt_out, fee
+    ) -> list[ForwardStatsEntry]:
+        return [
+            ForwardStatsEntry(
+                group=k,
+                num_forwards_in=int(num_in[i]),
+                num_forwards_out=int(num_out[i]),
+                amt_in_msat=int(amt_in[i]),
+                amt_out_msat=int(amt_out[i]),
+                fee_msat=int(fee[i]),
+            )
+            for i, k in enumerate(keys)
+        ]
@@ -1,7 +1,7 @@
 import asyncio
-import json
 import sys
-from typing import AsyncGenerator, List, Optional
+from contextlib import aclosing
+from typing import AsyncGenerator, Dict, List, Optional
 
 import grpc
 from decouple import config
@@ -12,10 +12,28 @@ from starlette import status
 import app.lightning.impl.protos.cln.node_pb2 as ln
 import app.lightning.impl.protos.cln.node_pb2_grpc as clnrpc
 import app.lightning.impl.protos.cln.primitives_pb2 as lnp
-from app.api.utils import SSE, broadcast_sse_msg, config_get_hex_str, next_push_id
+from app.api.cpu_pool import run_cpu_bound, use_cpu_pool
+from app.api.deadlines import call_timeout, clear_request_deadline
+from app.api.utils import (
+    SSE,
+    broadcast_sse_msg,
+    config_get_hex_str,
+    load_persisted_state,
+    next_push_id,
+    save_persisted_state,
+)
+from app.bitcoind.service import register_new_block_listener
 from app.bitcoind.utils import bitcoin_rpc_async
 from app.lightning.exceptions import NodeNotFoundError
-from app.lightning.impl.cln_utils import cln_classify_fee_revenue, parse_cln_msat
+from app.lightning.impl.cln_jrpc_pool import CLNConnectionPool, CLNRPCError
+from app.lightning.impl.cln_onchain import OnChainTxTable
+from app.lightning.impl.cln_utils import (
+    CLN_LIST_FILTERS,
+    FeeRevenueAggregator,
+    bolt11_timestamp,
+    cln_forward_time,
+)
+from app.lightning.impl.generic_txs import cln_grpc_generic_txs, pack_messages
 from app.lightning.impl.ln_base import LightningNodeBase
 from app.lightning.models import (
     Channel,
@@ -27,73 +45,35 @@ from app.lightning.models import (
     InvoiceState,
     LnInfo,
     LnInitState,
+    LnNodeEvent,
     NewAddressInput,
     OnChainTransaction,
     Payment,
     PaymentRequest,
     SendCoinsInput,
     SendCoinsResponse,
-    TxStatus,
     WalletBalance,
 )
-from app.lightning.utils import alias_or_empty, generic_grpc_error_handler
-
-
-@logger.catch(exclude=(HTTPException,))
-async def _make_local_call(cmd: str):
-    # FIXME: this is a hack because some of the commands are not exposed
-    # in the CLN grpc interface yet.
-
-    testnet = config("network") == "testnet"
-    cmd = f"lightning-cli -k {'--testnet ' if testnet else ''}{cmd}"
-    proc = await asyncio.create_subprocess_shell(
-        cmd,
-        stdout=asyncio.subprocess.PIPE,
-        stderr=asyncio.subprocess.PIPE,
-    )
-    stdout, stderr = await proc.communicate()
-
-    if stderr is not None and stderr != b"":
-        err = stderr.decode()
-        if "lightning-cli: Connecting to 'lightning-rpc': Permission denied" in err:
-            logger.critical(
-                (
-                    "Unable to connect to lightning-cli: Permission denied. "
-                    "Is the lightning-rpc socket readable for the API user?"
-                )
-            )
-
-            raise HTTPException(
-                status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail="Unable to connect to lightning-cli: Permission denied.",
-            )
-
-        if "lightning-cli: Moving into" in err and "No such file or directory" in err:
-            logger.critical(
-                (
-                    "Unable to connect to lightning-cli: No such file or directory. "
-                    "Is the lightning-rpc socket available to the API user?"
-                )
-            )
+from app.lightning.utils import (
+    InvoiceCursor,
+    PageCollector,
+    alias_or_empty,
+    generic_grpc_error_handler,
+    in_range,
+    raise_if_deadline_exceeded,
+)
 
-            raise HTTPException(
-                status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail=(
-                    "Unable to connect to lightning-cli: "
-                    "API Can't access lightning-cli.",
-                ),
-            )
+_FEE_REVENUE_STATE = "cln_fee_revenue"
+# Default deadlines in seconds, capped by the deadline of the HTTP request
+_TIMEOUT_SHORT = 20
+_TIMEOUT_LIST = 120
+# opening channels, on-chain sends, connecting peers and closing channels, which
+# waits up to 120 seconds for the peer before force closing
+_TIMEOUT_ACTION = 180
 
-        logger.critical(f"Unable to connect to lightning-cli: {err}")
-
-        raise HTTPException(
-            status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=(
-                "Unable to connect to lightning-cli: "
-                "Unknown error. Please consult the logs."
-            ),
-        )
-    return stdout, stderr
+_INVOICE_CURSOR_STATE = "cln_invoice_cursor"
+_FORWARDS_PAGE_SIZE = 1000
+_JSONRPC2_INVALID_PARAMS = -32602
 
 
 @logger.catch(exclude=(HTTPException,))
@@ -105,11 +85,27 @@ class LnNodeCLNgRPC(LightningNodeBase):
     _initialized = False
     _channel = None
     _cln_stub: clnrpc.NodeStub = None
+    # Connection to lightning-rpc for commands the gRPC interface doesn't expose
+    _rpc: CLNConnectionPool | None = None
+    _rpc_connect_task: asyncio.Task | None = None
     # Decoding the payment request take a long time,
     # hence we build a simple cache here.
     _memo_cache = {}
     _block_cache = {}
 
+    # Fee revenue is maintained incrementally from the forwards we see
+    _fee_revenue: FeeRevenueAggregator | None = None
+    # Set to False if CLN doesn't support listforwards pagination (< v23.11)
+    _fwd_pagination: bool = True
+    # Set to False if CLN doesn't support listinvoices pagination (< v23.08)
+    _list_pagination: bool = True
+
+    def __init__(self) -> None:
+        super().__init__()
+        self._fee_revenue_lock = asyncio.Lock()
+        # Wallet transactions, updated from new bookkeeper events on each request
+        self._onchain_txs = OnChainTxTable()
+
     def get_implementation_name(self) -> str:
         return "CLN_GRPC"
 
@@ -146,6 +142,25 @@ class LnNodeCLNgRPC(LightningNodeBase):
             certificate_chain=cln_grpc_cert,
         )
 
+        socket_path = config("cln_jrpc_path", default=None)
+        if socket_path is None:
+            logger.error(
+                (
+                    "cln_jrpc_path is missing from the config file. Commands which "
+                    "CLN doesn't expose via gRPC won't be available."
+                )
+            )
+        else:
+            # The invoice subscription uses gRPC, no subscription connection needed
+            self._rpc = CLNConnectionPool(
+                socket_path,
+                1,
+                subscription=False,
+                stream_lists=config("cln_jrpc_stream_lists", default=False, cast=bool),
+            )
+            self._rpc_connect_task = asyncio.create_task(self._connect_rpc())
+            self._rpc_connect_task.add_done_callback(self._on_rpc_connected)
+
         opts = (
             ("grpc.ssl_target_name_override", "cln"),
             ("grpc.max_receive_message_length", 1024 * 1024 * 10),
@@ -160,10 +175,15 @@ class LnNodeCLNgRPC(LightningNodeBase):
                     )
                     self._cln_stub = clnrpc.NodeStub(self._channel)
 
-                await self._cln_stub.Getinfo(ln.GetinfoRequest())
+                info = await self._cln_stub.Getinfo(
+                    ln.GetinfoRequest(), timeout=call_timeout(_TIMEOUT_SHORT)
+                )
+                self._onchain_txs.block_height = info.blockheight
+                register_new_block_listener(self._handle_new_block)
                 self._initialized = True
                 yield InitLnRepoUpdate(state=LnInitState.DONE)
             except grpc.aio._call.AioRpcError as error:
+                raise_if_deadline_exceeded(error)
                 details = error.details()
                 logger.debug(f"Waiting for CLN daemon... Details {details}")
 
@@ -190,7 +210,7 @@ class LnNodeCLNgRPC(LightningNodeBase):
         logger.trace("get_wallet_balance() ")
 
         req = ln.ListfundsRequest()
-        res = await self._cln_stub.ListFunds(req)
+        res = await self._cln_stub.ListFunds(req, timeout=call_timeout(_TIMEOUT_LIST))
         onchain_confirmed = onchain_unconfirmed = onchain_total = 0
 
         for o in res.outputs:
@@ -266,65 +286,50 @@ class LnNodeCLNgRPC(LightningNodeBase):
         try:
             res = await asyncio.gather(
                 *[
-                    self._cln_stub.ListInvoices(list_invoice_req),
+                    self._cln_stub.ListInvoices(
+                        list_invoice_req, timeout=call_timeout(_TIMEOUT_LIST)
+                    ),
                     self.list_on_chain_tx(),
-                    self._cln_stub.ListPays(list_payments_req),
+                    self._cln_stub.ListPays(
+                        list_payments_req, timeout=call_timeout(_TIMEOUT_LIST)
+                    ),
                     self.get_ln_info(),
                 ]
             )
-            tx = []
-            for invoice in res[0].invoices:
-                i = GenericTx.from_cln_grpc_invoice(invoice)
-                if successful_only and i.status == TxStatus.SUCCEEDED:
-                    tx.append(i)
-                    continue
-                tx.append(i)
-
-            for transaction in res[1]:
-                t = GenericTx.from_onchain_tx(transaction, res[3].block_height)
-                if successful_only and t.status == TxStatus.SUCCEEDED:
-                    tx.append(t)
-                    continue
-
-                tx.append(t)
-
+            decoded = {}
             for pay in res[2].pays:
-                decoded_bolt11: PaymentRequest = None
-
-                if pay.bolt11 is not None and len(pay.bolt11) > 0:
-                    if pay.bolt11 in self._memo_cache:
-                        decoded_bolt11 = self._memo_cache[pay.bolt11]
-                    else:
-                        decoded_bolt11 = await self.decode_pay_request(pay.bolt11)
-                        self._memo_cache[pay.bolt11] = decoded_bolt11
-
-                p = GenericTx.from_cln_grpc_payment(
-                    pay, decoded_bolt11.description, decoded_bolt11.num_msat
-                )
-
-                if successful_only and p.status == TxStatus.SUCCEEDED:
-                    tx.append(p)
+                if pay.bolt11 is None or len(pay.bolt11) == 0:
                     continue
 
-                tx.append(p)
-
-            def sortKey(e: GenericTx):
-                return e.time_stamp
-
-            tx.sort(key=sortKey)
-
-            if reversed:
-                tx.reverse()
-
-            tx_length = len(tx)
-            for invoice in range(tx_length):
-                tx[invoice].index = invoice
+                if pay.bolt11 in self._memo_cache:
+                    decoded_bolt11 = self._memo_cache[pay.bolt11]
+                else:
+                    decoded_bolt11 = await self.decode_pay_request(pay.bolt11)
+                    self._memo_cache[pay.bolt11] = decoded_bolt11
 
-            if max_tx == 0:
-                max_tx = tx_length
+                decoded[pay.bolt11] = (
+                    decoded_bolt11.description,
+                    decoded_bolt11.num_msat,
+                )
 
-            return tx[index_offset : index_offset + max_tx]
+            invoices = res[0].invoices
+            payments = res[2].pays
+            offload = use_cpu_pool(len(invoices) + len(res[1]) + len(payments))
+            return await run_cpu_bound(
+                "cln_list_all_tx",
+                offload,
+                cln_grpc_generic_txs,
+                pack_messages(invoices, offload),
+                res[1],
+                pack_messages(payments, offload),
+                decoded,
+                res[3].block_height,
+                index_offset,
+                max_tx,
+                reversed,
+            )
         except grpc.aio._call.AioRpcError as error:
+            raise_if_deadline_exceeded(error)
             generic_grpc_error_handler(error)
 
     @logger.catch(exclude=(HTTPException,))
@@ -334,108 +339,87 @@ class LnNodeCLNgRPC(LightningNodeBase):
         index_offset: int,
         num_max_invoices: int,
         reversed: bool,
+        creation_date_start: Optional[int] = None,
+        creation_date_end: Optional[int] = None,
     ) -> List[Invoice]:
         logger.trace("list_invoices() ")
 
+        page = PageCollector(index_offset, num_max_invoices, reversed)
+        by_date = creation_date_start is not None or creation_date_end is not None
+
+        if (
+            self._list_pagination
+            and self._rpc is not None
+            and self._rpc.connected
+            and not pending_only
+            and not by_date
+            and page.limit is not None
+        ):
+            # The CLN grpc interface doesn't support pagination of listinvoices
+            # yet. Without a status or date filter, CLN can stop after the
+            # requested page.
+            params = {"index": "created", "start": 0, "limit": page.limit}
+            stream = self._rpc_stream(
+                "listinvoices", "invoices", "listing invoices", params
+            )
+            async with aclosing(stream):
+                async for i in stream:
+                    page.add(Invoice.from_cln_json(i))
+                    if page.done:
+                        break
+
+            return page.page()
+
         try:
             req = ln.ListinvoicesRequest()
-            res = await self._cln_stub.ListInvoices(req)
+            res = await self._cln_stub.ListInvoices(
+                req, timeout=call_timeout(_TIMEOUT_LIST)
+            )
 
-            tx = []
             for i in res.invoices:
-                if pending_only:
-                    if i.status == 0:
-                        tx.append(Invoice.from_cln_grpc(i))
-                else:
-                    tx.append(Invoice.from_cln_grpc(i))
+                if pending_only and i.status != 0:
+                    continue
 
-            if reversed:
-                tx.reverse()
+                # CLN can't filter by creation date, the bolt11 tells it
+                if by_date and not in_range(
+                    bolt11_timestamp(i.bolt11), creation_date_start, creation_date_end
+                ):
+                    continue
 
-            if num_max_invoices == 0 or num_max_invoices is None:
-                return tx
+                page.add(Invoice.from_cln_grpc(i))
+                if page.done:
+                    break
 
-            return tx[index_offset : index_offset + num_max_invoices]
+            return page.page()
 
         except grpc.aio._call.AioRpcError as error:
+            raise_if_deadline_exceeded(error)
             generic_grpc_error_handler(error)
 
     @logger.catch(exclude=(HTTPException,))
-    async def list_on_chain_tx(self) -> List[OnChainTransaction]:
-        logger.trace("list_on_chain_tx() ")
-        info = await self.get_ln_info()  # for current block height
-        res = await _make_local_call("bkpr-listincome")
-
-        if not res:
-            raise HTTPException(
-                status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail="Unknown CLN error while listing account income events",
-            )
-
-        if len(res) == 0:
-            raise HTTPException(
-                status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail=(
-                    "No response from CLN while trying to list account income events"
-                ),
-            )
-
-        decoded = res[0].decode()
-        js = json.loads(decoded)
-
-        txs = {}
-        num_events = len(js["income_events"])
-        for i in range(0, num_events):
-            e = js["income_events"][i]
-            if e["account"] != "wallet":
-                continue
-
-            if e["tag"] == "deposit" or e["tag"] == "withdrawal":
-                tx = OnChainTransaction.from_cln_bkpr(e)
-                txs[tx.tx_hash] = tx
-            elif e["tag"] == "onchain_fee":
-                if e["txid"] in txs:
-                    txs[e["txid"]].total_fees = parse_cln_msat(e["debit_msat"]) / 1000
-
-        # TODO: Improve this once CLN reports the block height in bkpr-listincome
-        # see https://github.com/ElementsProject/lightning/issues/5694
-
-        # now get the block height for each tx ...
-        res = await _make_local_call("bkpr-listaccountevents")
-        if not res:
-            raise HTTPException(
-                status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail="Unknown CLN error while listing account events",
-            )
-
-        if len(res) == 0:
-            raise HTTPException(
-                status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail="No response from CLN while trying to list account events",
-            )
-
-        decoded = res[0].decode()
-        js = json.loads(decoded)
-        num_events = len(js["events"])
-        for i in range(0, num_events):
-            e = js["events"][i]
-            if e["account"] != "wallet" or e["type"] != "chain":
-                continue
-
-            txid = ""
-            if e["tag"] == "deposit":
-                txid = e["outpoint"].split(":")[0]
-            elif e["tag"] == "withdrawal":
-                txid = e["txid"]
-
-            if len(txid) == 0:
-                continue
+    async def list_on_chain_tx(
+        self, start_height: Optional[int] = None, end_height: Optional[int] = None
+    ) -> List[OnChainTransaction]:
+        logger.trace(f"list_on_chain_tx({start_height}, {end_height})")
+        action = "listing on-chain transactions"
+        txs = self._onchain_txs
+        async with txs.lock:
+            # The bookkeeper can only filter income events by time
+            params = {"start_time": txs.income_time}
+            async for e in self._rpc_stream(
+                "bkpr-listincome", "income_events", action, params
+            ):
+                txs.add_income_event(e)
 
-            if txid in txs:
-                txs[txid].block_height = e["blockheight"]
-                txs[txid].num_confirmations = info.block_height - txs[txid].block_height
+            # TODO: Improve this once CLN reports the block height in
+            # bkpr-listincome, see
+            # https://github.com/ElementsProject/lightning/issues/5694
+            async for e in self._rpc_stream(
+                "bkpr-listaccountevents", "events", action, {"account": "wallet"}
+            ):
+                txs.add_account_event(e)
 
-        return [txs[k] for k in txs.keys()]
+        return txs.transactions(start_height, end_height)
 
     @logger.catch(exclude=(HTTPException,))
     async def list_payments(
@@ -444,6 +428,8 @@ class LnNodeCLNgRPC(LightningNodeBase):
         index_offset: int,
         max_payments: int,
         reversed: bool,
+        creation_date_start: Optional[int] = None,
+        creation_date_end: Optional[int] = None,
     ):
         logger.trace(
             (
@@ -454,26 +440,29 @@ class LnNodeCLNgRPC(LightningNodeBase):
         )
         try:
             req = ln.ListpaysRequest()
-            res = await self._cln_stub.ListPays(req)
+            if not include_incomplete:
+                req.status = ln.ListpaysRequest.ListpaysStatus.COMPLETE
 
-            pays = []
+            res = await self._cln_stub.ListPays(
+                req, timeout=call_timeout(_TIMEOUT_LIST)
+            )
+
+            page = PageCollector(index_offset, max_payments, reversed)
             for p in res.pays:
-                if p.status == 2:
-                    # always include completed payments
-                    pays.append(Payment.from_cln_grpc(p))
+                # always include completed payments
+                if p.status != 2 and not include_incomplete:
                     continue
 
-                if include_incomplete:
-                    pays.append(Payment.from_cln_grpc(p))
-
-            if reversed:
-                pays.reverse()
+                if not in_range(p.created_at, creation_date_start, creation_date_end):
+                    continue
 
-            if max_payments == 0 or max_payments is None:
-                return pays
+                page.add(Payment.from_cln_grpc(p))
+                if page.done:
+                    break
 
-            return pays[index_offset : index_offset + max_payments]
+            return page.page()
         except grpc.aio._call.AioRpcError as error:
+            raise_if_deadline_exceeded(error)
             generic_grpc_error_handler(error)
 
     @logger.catch(exclude=(HTTPException,))
@@ -509,7 +498,9 @@ class LnNodeCLNgRPC(LightningNodeBase):
         )
 
         try:
-            res = await self._cln_stub.Invoice(req)
+            res = await self._cln_stub.Invoice(
+                req, timeout=call_timeout(_TIMEOUT_SHORT)
+            )
             return Invoice(
                 payment_request=res.bolt11,
                 memo=memo,
@@ -519,6 +510,7 @@ class LnNodeCLNgRPC(LightningNodeBase):
                 state=InvoiceState.OPEN,
             )
         except grpc.aio._call.AioRpcError as error:
+            raise_if_deadline_exceeded(error)
             details = error.details()
             logger.debug(details)
 
@@ -536,44 +528,31 @@ class LnNodeCLNgRPC(LightningNodeBase):
     async def decode_pay_request(self, pay_req: str) -> PaymentRequest:
         logger.trace(f"decode_pay_request(pay_req={pay_req})")
 
-        res = await _make_local_call(f"decodepay bolt11={pay_req}")
+        res = await self._rpc_request("decodepay", {"bolt11": pay_req}, _TIMEOUT_SHORT)
 
-        if not res:
-            raise HTTPException(
-                status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail="Unknown CLN error decoding pay request",
-            )
+        if "error" in res:
+            m = res["error"]["message"]
+            if "Invalid bolt11: Bad bech32 string" in m:
+                raise HTTPException(
+                    status.HTTP_400_BAD_REQUEST,
+                    detail="Invalid bolt11: Bad bech32 string",
+                )
 
-        if len(res) == 0:
             raise HTTPException(
                 status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail="No response from CLN decoding pay request",
-            )
-
-        decoded = res[0].decode()
-
-        if "Invalid bolt11: Bad bech32 string" in decoded:
-            raise HTTPException(
-                status.HTTP_400_BAD_REQUEST,
-                detail="Invalid bolt11: Bad bech32 string",
+                detail=f"Unknown CLN error decoding pay request: {m}",
             )
 
-        return PaymentRequest.from_cln_json(json.loads(decoded))
+        return PaymentRequest.from_cln_json(res["result"])
 
     @logger.catch(exclude=(HTTPException,))
     async def get_fee_revenue(self) -> FeeRevenue:
         logger.trace("get_fee_revenue()")
-        try:
-            # status 1 == "settled"
-            req = ln.ListforwardsRequest(status=1)
-            res = await self._cln_stub.ListForwards(req)
-            day, week, month, year, total = cln_classify_fee_revenue(res.forwards)
 
-            return FeeRevenue(day=day, week=week, month=month, year=year, total=total)
-        except grpc.aio._call.AioRpcError as error:
-            raise HTTPException(
-                status.HTTP_500_INTERNAL_SERVER_ERROR, detail=error.details()
-            )
+        agg = await self._get_fee_revenue_aggregator()
+        day, week, month, year, total = agg.classify()
+
+        return FeeRevenue(day=day, week=week, month=month, year=year, total=total)
 
     @logger.catch(exclude=(HTTPException,))
     async def new_address(self, input: NewAddressInput) -> str:
@@ -581,16 +560,20 @@ class LnNodeCLNgRPC(LightningNodeBase):
 
         try:
             req = ln.NewaddrRequest()
-            res = await self._cln_stub.NewAddr(req)
+            res = await self._cln_stub.NewAddr(
+                req, timeout=call_timeout(_TIMEOUT_SHORT)
+            )
 
             return res.bech32
         except grpc.aio._call.AioRpcError as error:
+            raise_if_deadline_exceeded(error)
             raise HTTPException(
                 status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(error)
             )
 
             return res.bech32
         except grpc.aio._call.AioRpcError as error:
+            raise_if_deadline_exceeded(error)
             generic_grpc_error_handler(error)
 
     @logger.catch(exclude=(HTTPException,))
@@ -608,7 +591,9 @@ class LnNodeCLNgRPC(LightningNodeBase):
             fee_rate = lnp.Feerate(slow=True)
 
         try:
-            funds = await self._cln_stub.ListFunds(ln.ListfundsRequest())
+            funds = await self._cln_stub.ListFunds(
+                ln.ListfundsRequest(), timeout=call_timeout(_TIMEOUT_LIST)
+            )
             if len(funds.outputs) == 0:
                 raise HTTPException(
                     status.HTTP_412_PRECONDITION_FAILED,
@@ -645,11 +630,14 @@ class LnNodeCLNgRPC(LightningNodeBase):
                 feerate=fee_rate,
                 utxos=utxos,
             )
-            response = await self._cln_stub.Withdraw(req)
+            response = await self._cln_stub.Withdraw(
+                req, timeout=call_timeout(_TIMEOUT_ACTION)
+            )
             r = SendCoinsResponse.from_cln_grpc(response, input)
             await broadcast_sse_msg(SSE.LN_ONCHAIN_PAYMENT_STATUS, r.model_dump())
             return r
         except grpc.aio._call.AioRpcError as error:
+            raise_if_deadline_exceeded(error)
             details = error.details()
             logger.debug(details)
 
@@ -678,6 +666,33 @@ class LnNodeCLNgRPC(LightningNodeBase):
             else:
                 generic_grpc_error_handler(error)
 
+    @logger.catch(exclude=(HTTPException,))
+    async def send_many(self, outputs: Dict[str, int]) -> str:
+        logger.trace(f"send_many(outputs={outputs})")
+
+        # multiwithdraw is not available via gRPC
+        params = {"outputs": [{a: amt} for a, amt in outputs.items()]}
+        res = await self._rpc_request("multiwithdraw", params, _TIMEOUT_ACTION)
+
+        if "error" not in res:
+            return res["result"]["txid"]
+
+        details = res["error"].get("message", "")
+        logger.error(f"multiwithdraw failed: {details}")
+
+        if details.find("Could not parse destination address") > -1:
+            raise HTTPException(
+                status.HTTP_400_BAD_REQUEST,
+                detail=f"Could not parse a destination address: {details}",
+            )
+        elif details.find("Could not afford") > -1:
+            raise HTTPException(status.HTTP_412_PRECONDITION_FAILED, detail=details)
+
+        raise HTTPException(
+            status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Unknown error: {details}",
+        )
+
     @logger.catch(exclude=(HTTPException,))
     async def send_payment(
         self,
@@ -703,8 +718,11 @@ class LnNodeCLNgRPC(LightningNodeBase):
         )
 
         try:
-            res = await self._cln_stub.Pay(req)
+            res = await self._cln_stub.Pay(
+                req, timeout=call_timeout(timeout_seconds + _TIMEOUT_SHORT)
+            )
         except grpc.aio._call.AioRpcError as error:
+            raise_if_deadline_exceeded(error)
             details = error.details()
             logger.debug(details)
 
@@ -749,9 +767,12 @@ class LnNodeCLNgRPC(LightningNodeBase):
 
         req = ln.GetinfoRequest()
         try:
-            res = await self._cln_stub.Getinfo(req)
+            res = await self._cln_stub.Getinfo(
+                req, timeout=call_timeout(_TIMEOUT_SHORT)
+            )
             return LnInfo.from_cln_grpc(self.get_implementation_name(), res)
         except grpc.aio._call.AioRpcError as error:
+            raise_if_deadline_exceeded(error)
             details = error.details()
             logger.debug(details)
 
@@ -777,25 +798,41 @@ class LnNodeCLNgRPC(LightningNodeBase):
     async def listen_invoices(self) -> AsyncGenerator[Invoice, None]:
         logger.trace("listen_invoices()")
         try:
-            lastpay_index = 0
-            invoices = await self.list_invoices(
-                pending_only=False,
-                index_offset=0,
-                num_max_invoices=9999999999999,
-                reversed=False,
-            )
+            # Resume from the last invoice we've seen. CLN will return all invoices
+            # which were paid in the meantime, one after another.
+            info = await self.get_ln_info()
+            cursor = InvoiceCursor(_INVOICE_CURSOR_STATE, info.identity_pubkey)
+            lastpay_index = await cursor.load()
+            if lastpay_index is not None:
+                logger.info(f"Resuming invoice subscription at {lastpay_index}")
+            else:
+                # No cursor yet, this downloads all invoices once
+                lastpay_index = 0
+                invoices = await self.list_invoices(
+                    pending_only=False,
+                    index_offset=0,
+                    num_max_invoices=9999999999999,
+                    reversed=False,
+                )
+
+                for i in invoices:  # type Invoice
+                    if (
+                        i.state == InvoiceState.SETTLED
+                        and i.settle_index > lastpay_index
+                    ):
+                        lastpay_index = i.settle_index
 
-            for i in invoices:  # type Invoice
-                if i.state == InvoiceState.SETTLED and i.settle_index > lastpay_index:
-                    lastpay_index = i.settle_index
+                await cursor.save(lastpay_index)
 
             while True:
                 req = ln.WaitanyinvoiceRequest(lastpay_index=lastpay_index)
                 i = await self._cln_stub.WaitAnyInvoice(req)
                 i = Invoice.from_cln_grpc(i)
                 lastpay_index = i.settle_index
+                cursor.save_soon(lastpay_index)
                 yield i
         except grpc.aio._call.AioRpcError as error:
+            raise_if_deadline_exceeded(error)
             details = error.details()
             logger.debug(details)
 
@@ -818,32 +855,66 @@ class LnNodeCLNgRPC(LightningNodeBase):
 
         interval = config("gather_ln_info_interval", default=2, cast=float)
 
-        # make sure we know how many forwards we have
-        # we need to calculate the difference between each iteration
-        # status=1 == "settled"
-        req = ln.ListforwardsRequest(status=1)
-        res = await self._cln_stub.ListForwards(req)
-        num_fwd_last_poll = len(res.forwards)
+        # Only forwards which got settled since the last poll are fetched.
+        await self._get_fee_revenue_aggregator()
         while True:
-            res = await self._cln_stub.ListForwards(req)
-            if len(res.forwards) > num_fwd_last_poll:
-                fwds = res.forwards[num_fwd_last_poll:]
-                for fwd in fwds:
+            async with self._fee_revenue_lock:
+                fwds = await self._fetch_new_forwards()
+
+            for fwd in fwds:
+                if isinstance(fwd, dict):
+                    yield ForwardSuccessEvent.from_cln_json(fwd)
+                else:
                     yield ForwardSuccessEvent.from_cln_grpc(fwd)
 
-                num_fwd_last_poll = len(res.forwards)
             await asyncio.sleep(interval - 0.1)
 
+    @logger.catch(exclude=(HTTPException,))
+    async def listen_node_events(self) -> AsyncGenerator[LnNodeEvent, None]:
+        logger.trace("listen_node_events()")
+
+        # CLN has no subscription for on-chain transactions or channel events.
+        raise NotImplementedError(
+            "Node event subscriptions are not supported by Core Lightning"
+        )
+
+        # makes this function an async generator
+        yield
+
+    @logger.catch(exclude=(HTTPException,))
+    async def forwarding_history(
+        self, start_time: int
+    ) -> AsyncGenerator[ForwardSuccessEvent, None]:
+        logger.trace(f"forwarding_history(start_time={start_time})")
+
+        start = 0
+        while True:
+            page, paginated = await self._list_settled_forwards(start)
+            for fwd in page:
+                if cln_forward_time(fwd) < start_time:
+                    continue
+
+                if isinstance(fwd, dict):
+                    yield ForwardSuccessEvent.from_cln_json(fwd)
+                else:
+                    yield ForwardSuccessEvent.from_cln_grpc(fwd)
+
+            if not paginated or len(page) < _FORWARDS_PAGE_SIZE:
+                return
+
+            start = page[-1]["updated_index"] + 1
+
     @logger.catch(exclude=(HTTPException,))
     async def connect_peer(self, uri: str) -> bool:
         logger.trace(f"connect_peer(node_URI={uri})")
 
         try:
             req = ln.ConnectRequest(id=uri)
-            await self._cln_stub.ConnectPeer(req)
+            await self._cln_stub.ConnectPeer(req, timeout=call_timeout(_TIMEOUT_ACTION))
 
             return True
         except grpc.aio._call.AioRpcError as error:
+            raise_if_deadline_exceeded(error)
             details = error.details()
             logger.warning(details)
 
@@ -885,7 +956,9 @@ class LnNodeCLNgRPC(LightningNodeBase):
 
         try:
             request = ln.ListnodesRequest(id=node_pub)
-            response = await self._cln_stub.ListNodes(request)
+            response = await self._cln_stub.ListNodes(
+                request, timeout=call_timeout(_TIMEOUT_SHORT)
+            )
 
             if len(response.nodes) == 0:
                 raise NodeNotFoundError(node_pub.hex())
@@ -893,6 +966,7 @@ class LnNodeCLNgRPC(LightningNodeBase):
             return str(response.nodes[0].alias)
 
         except grpc.aio._call.AioRpcError as error:
+            raise_if_deadline_exceeded(error)
             logger.error(error.details())
 
             raise HTTPException(
@@ -932,10 +1006,13 @@ class LnNodeCLNgRPC(LightningNodeBase):
             raise HTTPException(status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
 
         try:
-            res = await self._cln_stub.FundChannel(req)
+            res = await self._cln_stub.FundChannel(
+                req, timeout=call_timeout(_TIMEOUT_ACTION)
+            )
             return res.txid.hex()
 
         except grpc.aio._call.AioRpcError as error:
+            raise_if_deadline_exceeded(error)
             details = error.details()
             logger.debug(details)
 
@@ -983,7 +1060,9 @@ class LnNodeCLNgRPC(LightningNodeBase):
         logger.trace("channel_list()")
 
         try:
-            res = await self._cln_stub.ListFunds(ln.ListfundsRequest())
+            res = await self._cln_stub.ListFunds(
+                ln.ListfundsRequest(), timeout=call_timeout(_TIMEOUT_LIST)
+            )
             peer_ids = [c.peer_id for c in res.channels]
             peer_res = await asyncio.gather(
                 *[alias_or_empty(self.peer_resolve_alias, p) for p in peer_ids],
@@ -996,6 +1075,7 @@ class LnNodeCLNgRPC(LightningNodeBase):
 
             return channels
         except grpc.aio._call.AioRpcError as error:
+            raise_if_deadline_exceeded(error)
             raise HTTPException(
                 status.HTTP_500_INTERNAL_SERVER_ERROR, detail=error.details()
             )
@@ -1015,7 +1095,7 @@ class LnNodeCLNgRPC(LightningNodeBase):
                 unilateraltimeout=wait_time_before_unilateral_close,
                 feerange=[lnp.Feerate(slow=True), lnp.Feerate(urgent=True)],
             )
-            res = await self._cln_stub.Close(req)
+            res = await self._cln_stub.Close(req, timeout=call_timeout(_TIMEOUT_ACTION))
 
             # “mutual”, “unilateral”, “unopened”
             t = res.item_type
@@ -1031,6 +1111,7 @@ class LnNodeCLNgRPC(LightningNodeBase):
                 detail=f"CLN returned unknown close type: {t}",
             )
         except grpc.aio._call.AioRpcError as error:
+            raise_if_deadline_exceeded(error)
             if "Channel is in state AWAITING_UNILATERAL" in error.details():
                 raise HTTPException(
                     status.HTTP_400_BAD_REQUEST,
@@ -1041,6 +1122,201 @@ class LnNodeCLNgRPC(LightningNodeBase):
                 status.HTTP_500_INTERNAL_SERVER_ERROR, detail=error.details()
             )
 
+    async def _get_fee_revenue_aggregator(self) -> FeeRevenueAggregator:
+        async with self._fee_revenue_lock:
+            if self._fee_revenue is None:
+                state = await load_persisted_state(_FEE_REVENUE_STATE)
+                self._fee_revenue = FeeRevenueAggregator.from_dict(state)
+
+                # Catch up with the forwards which happened while we weren't running.
+                await self._fetch_new_forwards()
+
+            return self._fee_revenue
+
+    async def _fetch_new_forwards(self) -> list:
+        """Adds all settled forwards the fee revenue aggregator hasn't seen yet
+
+        Must be called with _fee_revenue_lock held.
+        Returns the new forwards, either as JSON dicts or gRPC objects.
+        """
+
+        fwds = []
+        # Number of forwards which are counted again after starting over,
+        # they were already returned before and aren't new.
+        seen = 0
+        while True:
+            agg = self._fee_revenue
+            page, paginated = await self._list_settled_forwards(agg.next_updated_index)
+
+            if not paginated:
+                # All settled forwards were returned, skip the ones we've seen
+                if agg.num_forwards > len(page):
+                    # node data doesn't match our state, e.g. the node was replaced
+                    agg = self._fee_revenue = FeeRevenueAggregator()
+
+                fwds = page[agg.num_forwards :]
+                agg.add_forwards(fwds)
+                # The state can't be continued by updated_index anymore
+                agg.next_updated_index = 0
+                break
+
+            if agg.num_forwards > 0 and agg.next_updated_index == 0:
+                # State was built without pagination, start over
+                # to not count forwards twice
+                seen = agg.num_forwards
+                agg = self._fee_revenue = FeeRevenueAggregator()
+
+            if len(page) > 0:
+                agg.add_forwards(page)
+                agg.next_updated_index = page[-1]["updated_index"] + 1
+                fwds.extend(page[seen:])
+                seen = max(0, seen - len(page))
+
+            if len(page) < _FORWARDS_PAGE_SIZE:
+                break
+
+        if len(fwds) > 0:
+            await save_persisted_state(_FEE_REVENUE_STATE, self._fee_revenue.to_dict())
+
+        return fwds
+
+    async def _list_settled_forwards(self, start: int) -> tuple[list, bool]:
+        """Lists one page of settled forwards with an updated_index >= start
+
+        Returns the forwards and whether they are a page. Pages are paginated
+        via lightning-rpc and consist of JSON dicts. If lightning-rpc isn't
+        configured or connected, or CLN doesn't support pagination, all settled
+        forwards are returned as gRPC objects instead.
+        """
+
+        if self._fwd_pagination and self._rpc is None:
+            logger.info(
+                "cln_jrpc_path is not configured. "
+                "Listing all settled forwards via gRPC."
+            )
+            self._fwd_pagination = False
+
+        if self._fwd_pagination and self._rpc.connected:
+            # The CLN grpc interface doesn't support pagination of listforwards yet.
+            # Settling a forward changes its updated_index, not its created_index.
+            # Paging by updated_index makes sure we see forwards which were already
+            # offered during the last poll but got settled in the meantime.
+            params = {
+                "status": "settled",
+                "index": "updated",
+                "start": start,
+                "limit": _FORWARDS_PAGE_SIZE,
+            }
+            res = await self._rpc_request("listforwards", params)
+
+            if "error" not in res:
+                fwds = res["result"]["forwards"]
+                # Older CLN versions ignore the index parameter and don't
+                # return the updated_index, paging by it isn't possible then.
+                if len(fwds) == 0 or fwds[-1].get("updated_index") is not None:
+                    return fwds, True
+
+            elif res["error"]["code"] != _JSONRPC2_INVALID_PARAMS:
+                raise HTTPException(
+                    status.HTTP_500_INTERNAL_SERVER_ERROR,
+                    detail=res["error"]["message"],
+                )
+
+            logger.info(
+                "CLN doesn't support listforwards pagination. "
+                "Falling back to listing all settled forwards."
+            )
+            self._fwd_pagination = False
+
+        try:
+            # status 1 == "settled"
+            req = ln.ListforwardsRequest(status=1)
+            res = await self._cln_stub.ListForwards(
+                req, timeout=call_timeout(_TIMEOUT_LIST)
+            )
+            return res.forwards, False
+        except grpc.aio._call.AioRpcError as error:
+            raise_if_deadline_exceeded(error)
+            raise HTTPException(
+                status.HTTP_500_INTERNAL_SERVER_ERROR, detail=error.details()
+            )
+
+    async def _handle_new_block(self, block: dict) -> None:
+        self._onchain_txs.block_height = block["height"]
+
+    async def _connect_rpc(self) -> None:
+        # Runs in the background, not bound to the request initialize() was called by
+        clear_request_deadline()
+        await self._rpc.connect()
+
+    def _on_rpc_connected(self, task: asyncio.Task) -> None:
+        if task.cancelled():
+            return
+
+        e = task.exception()
+        if e is not None:
+            logger.critical(
+                f"Unable to connect to lightning-rpc: {e}. Commands which CLN "
+                "doesn't expose via gRPC won't be available."
+            )
+
+    async def _rpc_request(
+        self, method: str, params: dict, timeout: float = _TIMEOUT_LIST
+    ) -> dict:
+        """Sends a command CLN doesn't expose via gRPC to the lightning-rpc socket
+
+        Returns the JSON-RPC response, which contains either result or error.
+        """
+
+        if self._rpc is None:
+            raise HTTPException(
+                status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=f"{method} is only available with cln_jrpc_path configured",
+            )
+
+        return await self._rpc.request(
+            method, params, timeout, CLN_LIST_FILTERS.get(method)
+        )
+
+    async def _rpc_stream(
+        self, method: str, key: str, action: str, params: Optional[dict] = None
+    ) -> AsyncGenerator[dict, None]:
+        """Yields the elements of result[key] of a command sent to lightning-rpc"""
+
+        if params is None:
+            params = {}
+
+        if self._rpc is None:
+            raise HTTPException(
+                status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=f"{method} is only available with cln_jrpc_path configured",
+            )
+
+        try:
+            async for element in self._rpc.stream(
+                method, params, key, _TIMEOUT_LIST, CLN_LIST_FILTERS.get(method)
+            ):
+                yield element
+        except CLNRPCError as e:
+            if e.error.get("code") != _JSONRPC2_INVALID_PARAMS or "index" not in params:
+                logger.error(f"Error while {action}: {e.error}")
+                raise HTTPException(
+                    status.HTTP_500_INTERNAL_SERVER_ERROR,
+                    detail=f"Error while {action}: {e.error}",
+                )
+
+            # Nothing was yielded yet, the error comes instead of the list
+            logger.info(
+                f"CLN doesn't support {method} pagination. "
+                "Falling back to listing everything."
+            )
+            self._list_pagination = False
+            params = {
+                k: v for k, v in params.items() if k not in ("index", "start", "limit")
+            }
+            async for element in self._rpc_stream(method, key, action, params):
+                yield element
+
     @logger.catch(exclude=(HTTPException,))
     def _handle_base_cln_error(self, error: grpc.aio._call.AioRpcError) -> None:
         # This method handles all errors common to all CLN calls
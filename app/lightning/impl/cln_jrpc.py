@@ -1,7 +1,7 @@
 import asyncio
-import json
 import os
 import sys
+from contextlib import aclosing
 from typing import AsyncGenerator, Dict, List, Optional, Union
 
 import decouple
@@ -10,14 +10,28 @@ from fastapi.exceptions import HTTPException
 from loguru import logger
 from starlette import status
 
-from app.api.utils import SSE, broadcast_sse_msg, next_push_id
+from app.api.cpu_pool import run_cpu_bound, use_cpu_pool
+from app.api.utils import (
+    SSE,
+    broadcast_sse_msg,
+    load_persisted_state,
+    next_push_id,
+    save_persisted_state,
+)
+from app.bitcoind.service import register_new_block_listener
 from app.bitcoind.utils import bitcoin_rpc_async
 from app.lightning.exceptions import NodeNotFoundError
+from app.lightning.impl.cln_jrpc_pool import CLNConnectionPool, CLNRPCError
+from app.lightning.impl.cln_onchain import OnChainTxTable
 from app.lightning.impl.cln_utils import (
+    CLN_LIST_FILTERS,
+    FeeRevenueAggregator,
+    bolt11_timestamp,
     calc_fee_rate_str,
-    cln_classify_fee_revenue,
+    cln_forward_time,
     parse_cln_msat,
 )
+from app.lightning.impl.generic_txs import cln_generic_txs
 from app.lightning.impl.ln_base import LightningNodeBase
 from app.lightning.models import (
     Channel,
@@ -29,37 +43,69 @@ from app.lightning.models import (
     InvoiceState,
     LnInfo,
     LnInitState,
+    LnNodeEvent,
     NewAddressInput,
     OnChainTransaction,
     Payment,
     PaymentRequest,
     SendCoinsInput,
     SendCoinsResponse,
-    TxStatus,
     WalletBalance,
 )
-from app.lightning.utils import alias_or_empty
-
-_WAIT_ANY_INVOICE_ID = 0
-_SOCKET_BUFFER_SIZE_LIMIT = 1024 * 1024 * 10  # 10 MB
+from app.lightning.utils import InvoiceCursor, PageCollector, alias_or_empty, in_range
+
+_FEE_REVENUE_STATE = "cln_fee_revenue"
+_INVOICE_CURSOR_STATE = "cln_invoice_cursor"
+_FORWARDS_PAGE_SIZE = 1000
+_JSONRPC2_INVALID_PARAMS = -32602
+_RESUBSCRIBE_DELAY = 5
+
+# Default deadlines in seconds, capped by the deadline of the HTTP request
+_TIMEOUT_SHORT = 20
+_TIMEOUT_LIST = 120
+# opening channels, on-chain sends, connecting peers and closing channels, which
+# waits up to 120 seconds for the peer before force closing
+_TIMEOUT_ACTION = 180
+_METHOD_TIMEOUTS = {
+    "listfunds": _TIMEOUT_LIST,
+    "listinvoices": _TIMEOUT_LIST,
+    "listpays": _TIMEOUT_LIST,
+    "listforwards": _TIMEOUT_LIST,
+    "bkpr-listincome": _TIMEOUT_LIST,
+    "bkpr-listaccountevents": _TIMEOUT_LIST,
+    "withdraw": _TIMEOUT_ACTION,
+    "multiwithdraw": _TIMEOUT_ACTION,
+    "fundchannel": _TIMEOUT_ACTION,
+    "close": _TIMEOUT_ACTION,
+    "connect": _TIMEOUT_ACTION,
+}
 
 
 class LnNodeCLNjRPC(LightningNodeBase):
     lastpay_index = 0
-    _current_id: int = _WAIT_ANY_INVOICE_ID + 1
-    _futures: dict[int, asyncio.Future] = {}
+    _invoice_cursor: InvoiceCursor | None = None
     _socket_path: str | None = None
-    _reader: asyncio.StreamReader | None = None
-    _writer: asyncio.StreamWriter | None = None
-    _loop: asyncio.AbstractEventLoop | None = None
+    _pool: CLNConnectionPool | None = None
     _initialized: bool = False
-    _invoice_queue = asyncio.Queue()
 
     # Decoding the payment request take a long time,
     # hence we build a simple cache here.
     _bolt11_cache: dict[str, PaymentRequest] = {}
     _block_cache = {}
 
+    # Fee revenue is maintained incrementally from the forwards we see
+    _fee_revenue: FeeRevenueAggregator | None = None
+    # Set to False if CLN doesn't support listforwards pagination (< v23.11)
+    _fwd_pagination: bool = True
+    # Set to False if CLN doesn't support listinvoices pagination (< v23.08)
+    _list_pagination: bool = True
+
+    def __init__(self) -> None:
+        super().__init__()
+        self._fee_revenue_lock = asyncio.Lock()
+        # Wallet transactions, updated from new bookkeeper events on each request
+        self._onchain_txs = OnChainTxTable()
+
     def get_implementation_name(self) -> str:
         return "CLN_JRPC"
 
@@ -99,37 +145,23 @@ class LnNodeCLNjRPC(LightningNodeBase):
             f"Establishing a connection to the CLN socket at {self._socket_path}"
         )
 
-        self._loop = asyncio.get_running_loop()
-
-        while True:
-            try:
-                if not isinstance(self._socket_path, str):
-                    logger.trace(
-                        f"self._socket_path is None, retrying {type(self._socket_path)}"
-                    )
-                    await asyncio.sleep(10)
-                    continue
-
-                self._reader, self._writer = await asyncio.open_unix_connection(
-                    path=self._socket_path,
-                    limit=_SOCKET_BUFFER_SIZE_LIMIT,
-                )
-
-                break
-            except ConnectionRefusedError:
-                logger.info("CLN ConnectionRefusedError. Retrying in 10 seconds.")
-                await asyncio.sleep(10)
-
-        asyncio.create_task(self._read_loop())
-
-        logger.info("Setting up invoice waitanyinvoice subscription.")
-        await self._refresh_invoice_sub(True)
+        num_connections = decouple.config("cln_jrpc_connections", default=2, cast=int)
+        stream_lists = decouple.config(
+            "cln_jrpc_stream_lists", default=False, cast=bool
+        )
+        self._pool = CLNConnectionPool(
+            self._socket_path, num_connections, stream_lists=stream_lists
+        )
+        await self._pool.connect()
 
         info = await self.get_ln_info()
         if info is None:
             logger.error("Failed to get CLN node info.")
             sys.exit(1)
 
+        self._onchain_txs.block_height = info.block_height
+        register_new_block_listener(self._handle_new_block)
+
         logger.success(
             (
                 f"Connected to CLN node with alias {info.alias} and "
@@ -232,57 +264,33 @@ class LnNodeCLNjRPC(LightningNodeBase):
         if res[3] is None:
             logger.error("get_ln_info() returned None")
 
-        tx = []
-        for invoice in res[0]:
-            i = GenericTx.from_invoice(invoice)
-            if successful_only and i.status == "succeeded":
-                tx.append(i)
-                continue
-            tx.append(i)
-
-        for transaction in res[1]:
-            t = GenericTx.from_onchain_tx(transaction, res[3].block_height)
-            if successful_only and t.status == TxStatus.SUCCEEDED:
-                tx.append(t)
-                continue
-
-            tx.append(t)
-
+        payments = []
+        comments = {}
         for pay in res[2]:
-            if pay is not Payment:
+            if not isinstance(pay, Payment):
                 logger.error("Payment is not a payment class.")
                 continue
 
-            comment = ""
-
             if pay.payment_request is not None and len(pay.payment_request) > 0:
                 b11 = await self._decode_bolt11_cached(pay.payment_request)
-                comment = b11.description
-
-            p = GenericTx.from_payment(pay, comment)
-
-            if successful_only and p.status == "succeeded":
-                tx.append(p)
-                continue
-
-            tx.append(p)
-
-        def sortKey(e: GenericTx):
-            return e.time_stamp
-
-        tx.sort(key=sortKey)
-
-        if reversed:
-            tx.reverse()
-
-        num_tx = len(tx)
-        for invoice in range(num_tx):
-            tx[invoice].index = invoice
-
-        if max_tx == 0:
-            max_tx = num_tx
-
-        return tx[index_offset : index_offset + max_tx]
+                comments[pay.payment_request] = b11.description
+
+            payments.append(pay)
+
+        offload = use_cpu_pool(len(res[0]) + len(res[1]) + len(payments))
+        return await run_cpu_bound(
+            "cln_list_all_tx",
+            offload,
+            cln_generic_txs,
+            res[0],
+            res[1],
+            payments,
+            comments,
+            res[3].block_height,
+            index_offset,
+            max_tx,
+            reversed,
+        )
 
     @logger.catch(exclude=(HTTPException,))
     async def list_invoices(
@@ -291,6 +299,8 @@ class LnNodeCLNjRPC(LightningNodeBase):
         index_offset: int,
         num_max_invoices: int,
         reversed: bool,
+        creation_date_start: Optional[int] = None,
+        creation_date_end: Optional[int] = None,
     ):
         logger.trace(
             (
@@ -299,89 +309,65 @@ class LnNodeCLNjRPC(LightningNodeBase):
             )
         )
 
-        res = await self._send_request("listinvoices")
-
-        if "error" in res:
-            self._raise_internal_server_error("listing invoices", res)
-
-        if "result" not in res or "invoices" not in res["result"]:
-            logger.error(f"Got no error and no invoices key result: {res}")
-            raise HTTPException(
-                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail=f"Error while listing invoices: {res}",
-            )
+        page = PageCollector(index_offset, num_max_invoices, reversed)
+        by_date = creation_date_start is not None or creation_date_end is not None
 
-        res = res["result"]["invoices"]
-
-        invoices = []
-        for i in res:
-            if not pending_only:
-                invoices.append(Invoice.from_cln_json(i))
-                continue
+        # Without a status or date filter, CLN can stop after the requested page.
+        params = {}
+        if (
+            self._list_pagination
+            and not pending_only
+            and not by_date
+            and page.limit is not None
+        ):
+            params = {"index": "created", "start": 0, "limit": page.limit}
 
-            if i["status"] == "unpaid":
-                invoices.append(Invoice.from_cln_json(i))
+        stream = self._stream_request(
+            "listinvoices", "invoices", "listing invoices", params
+        )
+        async with aclosing(stream):
+            async for i in stream:
+                if pending_only and i["status"] != "unpaid":
+                    continue
 
-        if reversed:
-            invoices.reverse()
+                # CLN can't filter by creation date, the bolt11 tells it
+                if by_date and not in_range(
+                    bolt11_timestamp(i.get("bolt11")),
+                    creation_date_start,
+                    creation_date_end,
+                ):
+                    continue
 
-        if num_max_invoices == 0 or num_max_invoices is None:
-            return invoices
+                page.add(Invoice.from_cln_json(i))
+                if page.done:
+                    break
 
-        return invoices[index_offset : index_offset + num_max_invoices]
+        return page.page()
 
     @logger.catch(exclude=(HTTPException,))
-    async def list_on_chain_tx(self) -> List[OnChainTransaction]:
-        logger.trace("list_on_chain_tx()")
-        info = await self.get_ln_info()  # for current block height
-        res = await self._send_request("bkpr-listincome")
-        if "error" in res:
-            self._raise_internal_server_error("listing on-chain transactions", res)
-        res = res["result"]
-
-        txs = {}
-        num_events = len(res["income_events"])
-        for i in range(0, num_events):
-            e = res["income_events"][i]
-            if e["account"] != "wallet":
-                continue
-
-            if e["tag"] == "deposit" or e["tag"] == "withdrawal":
-                tx = OnChainTransaction.from_cln_bkpr(e)
-                txs[tx.tx_hash] = tx
-            elif e["tag"] == "onchain_fee":
-                if e["txid"] in txs:
-                    txs[e["txid"]].total_fees = parse_cln_msat(e["debit_msat"]) / 1000
-
-        # TODO: Improve this once CLN reports the block height in bkpr-listincome
-        # see https://github.com/ElementsProject/lightning/issues/5694
-
-        # now get the block height for each tx ...
-        res = await self._send_request("bkpr-listaccountevents")
-        if "error" in res:
-            self._raise_internal_server_error("listing on-chain transactions", res)
-        res = res["result"]
-
-        num_events = len(res["events"])
-        for i in range(0, num_events):
-            e = res["events"][i]
-            if e["account"] != "wallet" or e["type"] != "chain":
-                continue
-
-            txid = ""
-            if e["tag"] == "deposit":
-                txid = e["outpoint"].split(":")[0]
-            elif e["tag"] == "withdrawal":
-                txid = e["txid"]
-
-            if len(txid) == 0:
-                continue
+    async def list_on_chain_tx(
+        self, start_height: Optional[int] = None, end_height: Optional[int] = None
+    ) -> List[OnChainTransaction]:
+        logger.trace(f"list_on_chain_tx({start_height}, {end_height})")
+        action = "listing on-chain transactions"
+        txs = self._onchain_txs
+        async with txs.lock:
+            # The bookkeeper can only filter income events by time
+            params = {"start_time": txs.income_time}
+            async for e in self._stream_request(
+                "bkpr-listincome", "income_events", action, params
+            ):
+                txs.add_income_event(e)
 
-            if txid in txs:
-                txs[txid].block_height = e["blockheight"]
-                txs[txid].num_confirmations = info.block_height - txs[txid].block_height
+            # TODO: Improve this once CLN reports the block height in
+            # bkpr-listincome, see
+            # https://github.com/ElementsProject/lightning/issues/5694
+            async for e in self._stream_request(
+                "bkpr-listaccountevents", "events", action, {"account": "wallet"}
+            ):
+                txs.add_account_event(e)
 
-        return [txs[k] for k in txs.keys()]
+        return txs.transactions(start_height, end_height)
 
     @logger.catch(exclude=(HTTPException,))
     async def list_payments(
@@ -390,43 +376,37 @@ class LnNodeCLNjRPC(LightningNodeBase):
         index_offset: int,
         max_payments: int,
         reversed: bool,
+        creation_date_start: Optional[int] = None,
+        creation_date_end: Optional[int] = None,
     ):
         logger.trace(
             f"list_payments({include_incomplete}, {index_offset}, "
             f"{max_payments}, {reversed})"
         )
 
-        res = await self._send_request("listpays")
-        if "error" in res:
-            self._raise_internal_server_error("listing payments", res)
-
-        if "result" not in res or "pays" not in res["result"]:
-            logger.error(f"Got no error and no pays key result: {res}")
-            raise HTTPException(
-                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail=f"Error while listing payments: {res}",
-            )
-
-        res = res["result"]["pays"]
+        page = PageCollector(index_offset, max_payments, reversed)
+        params = {} if include_incomplete else {"status": "complete"}
 
-        pays = []
-        for p in res:
-            if p["status"] == "complete":
-                pays.append(Payment.from_cln_jrpc(p))
-                continue
+        stream = self._stream_request("listpays", "pays", "listing payments", params)
+        async with aclosing(stream):
+            async for p in stream:
+                if not in_range(
+                    p["created_at"], creation_date_start, creation_date_end
+                ):
+                    continue
 
-            if include_incomplete:
-                b11_decoded = await self._decode_bolt11_cached(p["bolt11"])
-                p["amount_msat"] = b11_decoded.num_msat
-                pays.append(Payment.from_cln_jrpc(p))
+                if p["status"] != "complete":
+                    if not include_incomplete:
+                        continue
 
-        if reversed:
-            pays.reverse()
+                    b11_decoded = await self._decode_bolt11_cached(p["bolt11"])
+                    p["amount_msat"] = b11_decoded.num_msat
 
-        if max_payments == 0 or max_payments is None:
-            return pays
+                page.add(Payment.from_cln_jrpc(p))
+                if page.done:
+                    break
 
-        return pays[index_offset : index_offset + max_payments]
+        return page.page()
 
     @logger.catch(exclude=(HTTPException,))
     async def add_invoice(
@@ -491,22 +471,12 @@ class LnNodeCLNjRPC(LightningNodeBase):
 
     @logger.catch(exclude=(HTTPException,))
     async def get_fee_revenue(self) -> FeeRevenue:
-        params = ["settled"]  # only list settled forwards
-        res = await self._send_request("listforwards", params)
-
-        if "error" not in res:
-            res = res["result"]
-            day, week, month, year, total = cln_classify_fee_revenue(res["forwards"])
+        logger.trace("get_fee_revenue()")
 
-            return FeeRevenue(day=day, week=week, month=month, year=year, total=total)
+        agg = await self._get_fee_revenue_aggregator()
+        day, week, month, year, total = agg.classify()
 
-        m = res["error"]["message"]
-        logger.error(m)
-
-        raise HTTPException(
-            status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Unknown error: {m}",
-        )
+        return FeeRevenue(day=day, week=week, month=month, year=year, total=total)
 
     @logger.catch(exclude=(HTTPException,))
     async def new_address(self, input: NewAddressInput) -> str:
@@ -577,6 +547,32 @@ class LnNodeCLNjRPC(LightningNodeBase):
             detail=f"Unknown error: {details}",
         )
 
+    @logger.catch(exclude=(HTTPException,))
+    async def send_many(self, outputs: Dict[str, int]) -> str:
+        logger.trace(f"send_many(outputs={outputs})")
+
+        params = {"outputs": [{a: amt} for a, amt in outputs.items()]}
+        res = await self._send_request("multiwithdraw", params)
+
+        if "error" not in res:
+            return res["result"]["txid"]
+
+        details = res["error"].get("message", "")
+        logger.error(f"multiwithdraw failed: {details}")
+
+        if details.find("Could not parse destination address") > -1:
+            raise HTTPException(
+                status.HTTP_400_BAD_REQUEST,
+                detail=f"Could not parse a destination address: {details}",
+            )
+        elif details.find("Could not afford") > -1:
+            raise HTTPException(status.HTTP_412_PRECONDITION_FAILED, detail=details)
+
+        raise HTTPException(
+            status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Unknown error: {details}",
+        )
+
     @logger.catch(exclude=(HTTPException,))
     async def send_payment(
         self,
@@ -614,7 +610,7 @@ class LnNodeCLNjRPC(LightningNodeBase):
             "retry_for": timeout_seconds,
             **({"msatoshi": amount_msat} if amount_msat is not None else {}),
         }
-        res = await self._send_request("pay", params)
+        res = await self._send_request("pay", params, timeout_seconds + _TIMEOUT_SHORT)
 
         if "error" not in res:
             res = res["result"]
@@ -678,19 +674,42 @@ class LnNodeCLNjRPC(LightningNodeBase):
     async def listen_invoices(self) -> AsyncGenerator[Invoice, None]:
         logger.trace("listen_invoices()")
 
+        # Resume from the last invoice we've seen. CLN will return all invoices
+        # which were paid in the meantime, one after another.
+        info = await self.get_ln_info()
+        self._invoice_cursor = InvoiceCursor(
+            _INVOICE_CURSOR_STATE, info.identity_pubkey
+        )
+        lastpay_index = await self._invoice_cursor.load()
+        if lastpay_index is not None:
+            self.lastpay_index = lastpay_index
+            logger.info(f"Resuming invoice subscription at {self.lastpay_index}")
+        else:
+            await self._scan_lastpay_index()
+
         while True:
             try:
-                data = await self._invoice_queue.get()
-                data = json.loads(data)["result"]
-                i = Invoice.from_cln_json(data)
+                res = await self._pool.subscription.request(
+                    "waitanyinvoice", {"lastpay_index": self.lastpay_index}, None
+                )
+            except HTTPException as e:
+                logger.warning(
+                    "Invoice subscription lost, resubscribing in "
+                    f"{_RESUBSCRIBE_DELAY} seconds: {e.detail}"
+                )
+                await asyncio.sleep(_RESUBSCRIBE_DELAY)
+                continue
+
+            try:
+                i = Invoice.from_cln_json(res["result"])
                 self.lastpay_index = i.settle_index
-                await self._refresh_invoice_sub()
+                self._invoice_cursor.save_soon(self.lastpay_index)
                 yield i
             except Exception as e:
                 logger.error(f"Got an invoice but could not parse the data: {e}")
                 # if we have an error we are in an unknown state
                 # so we fetch the latest invoice index and start from there
-                await self._refresh_invoice_sub(True)
+                await self._scan_lastpay_index()
 
     @logger.catch(exclude=(HTTPException,))
     async def listen_forward_events(self) -> AsyncGenerator[ForwardSuccessEvent, None]:
@@ -701,26 +720,46 @@ class LnNodeCLNjRPC(LightningNodeBase):
 
         interval = config("gather_ln_info_interval", default=2, cast=float)
 
-        # make sure we know how many forwards we have
-        # we need to calculate the difference between each iteration
-        res = await self._send_request("listforwards", {"status": "settled"})
+        # Only forwards which got settled since the last poll are fetched.
+        await self._get_fee_revenue_aggregator()
+        while True:
+            async with self._fee_revenue_lock:
+                fwds = await self._fetch_new_forwards()
 
-        if "error" in res:
-            self._raise_internal_server_error("getting forwards", res)
+            for fwd in fwds:
+                yield ForwardSuccessEvent.from_cln_json(fwd)
 
-        res = res["result"]
-        num_fwd_last_poll = len(res["forwards"])
-        while True:
-            res = await self._send_request("listforwards", {"status": "settled"})
-            res = res["result"]
-            if len(res["forwards"]) > num_fwd_last_poll:
-                fwds = res["forwards"][num_fwd_last_poll:]
+            await asyncio.sleep(interval - 0.1)
+
+    @logger.catch(exclude=(HTTPException,))
+    async def listen_node_events(self) -> AsyncGenerator[LnNodeEvent, None]:
+        logger.trace("listen_node_events()")
+
+        # CLN has no subscription for on-chain transactions or channel events.
+        raise NotImplementedError(
+            "Node event subscriptions are not supported by Core Lightning"
+        )
+
+        # makes this function an async generator
+        yield
+
+    @logger.catch(exclude=(HTTPException,))
+    async def forwarding_history(
+        self, start_time: int
+    ) -> AsyncGenerator[ForwardSuccessEvent, None]:
+        logger.trace(f"forwarding_history(start_time={start_time})")
 
-                for fwd in fwds:
+        start = 0
+        while True:
+            page = await self._list_settled_forwards(start)
+            for fwd in page:
+                if cln_forward_time(fwd) >= start_time:
                     yield ForwardSuccessEvent.from_cln_json(fwd)
 
-                num_fwd_last_poll = len(res["forwards"])
-            await asyncio.sleep(interval - 0.1)
+            if not self._fwd_pagination or len(page) < _FORWARDS_PAGE_SIZE:
+                return
+
+            start = page[-1]["updated_index"] + 1
 
     @logger.catch(exclude=(HTTPException,))
     async def channel_open(
@@ -921,61 +960,158 @@ class LnNodeCLNjRPC(LightningNodeBase):
 
         raise HTTPException(status.HTTP_500_INTERNAL_SERVER_ERROR, detail=message)
 
-    async def _read_loop(self):
-        logger.trace("_read_loop()")
-        if self._writer is None or self._reader is None:
-            message = "Not initialized - _writer or _reader not yet available"
-            logger.error(message)
-            raise HTTPException(status.HTTP_500_INTERNAL_SERVER_ERROR, detail=message)
+    async def _send_request(
+        self,
+        method: str,
+        params: Union[Dict, List, None] = {},
+        timeout: Optional[float] = None,
+    ) -> dict:
+        if timeout is None:
+            timeout = _METHOD_TIMEOUTS.get(method, _TIMEOUT_SHORT)
+
+        return await self._pool.request(
+            method, params, timeout, CLN_LIST_FILTERS.get(method)
+        )
 
-        while not self._writer.is_closing():
-            try:
-                data = await self._reader.readline()
-                data = data.decode("utf-8")
+    async def _handle_new_block(self, block: dict) -> None:
+        self._onchain_txs.block_height = block["height"]
 
-                if data == "\n":
-                    continue
+    async def _stream_request(
+        self,
+        method: str,
+        key: str,
+        action: str,
+        params: Union[Dict, List, None] = {},
+        timeout: Optional[float] = None,
+    ) -> AsyncGenerator[dict, None]:
+        """Yields the elements of result[key] one after another
 
-                if data:
-                    self._handle_response(data)
-            except (ValueError, asyncio.exceptions.LimitOverrunError) as e:
-                logger.exception(e)
-                continue
+        Used for calls returning huge lists. With cln_jrpc_stream_lists they are
+        never held in memory as a whole.
+        """
 
-    def _handle_response(self, data):
-        logger.trace(f"_handle_response(data={data})")
+        if timeout is None:
+            timeout = _METHOD_TIMEOUTS.get(method, _TIMEOUT_SHORT)
 
-        response = json.loads(data)
-        id = response["id"]
+        try:
+            async for element in self._pool.stream(
+                method, params, key, timeout, CLN_LIST_FILTERS.get(method)
+            ):
+                yield element
+        except CLNRPCError as e:
+            if (
+                e.error.get("code") != _JSONRPC2_INVALID_PARAMS
+                or not isinstance(params, dict)
+                or "index" not in params
+            ):
+                self._raise_internal_server_error(action, {"error": e.error})
 
-        if id == _WAIT_ANY_INVOICE_ID:
-            return self._invoice_queue.put_nowait(data)
+            # Nothing was yielded yet, the error comes instead of the list
+            logger.info(
+                f"CLN doesn't support {method} pagination. "
+                "Falling back to listing everything."
+            )
+            self._list_pagination = False
+            params = {
+                k: v for k, v in params.items() if k not in ("index", "start", "limit")
+            }
+            async for element in self._stream_request(
+                method, key, action, params, timeout
+            ):
+                yield element
+
+    async def _get_fee_revenue_aggregator(self) -> FeeRevenueAggregator:
+        async with self._fee_revenue_lock:
+            if self._fee_revenue is None:
+                state = await load_persisted_state(_FEE_REVENUE_STATE)
+                self._fee_revenue = FeeRevenueAggregator.from_dict(state)
+
+                # Catch up with the forwards which happened while we weren't running.
+                await self._fetch_new_forwards()
+
+            return self._fee_revenue
 
-        logger.trace(f"Got response: {response} for id {self._current_id}")
-        future = self._futures[id]
-        future.set_result(response)
+    async def _fetch_new_forwards(self) -> list:
+        """Adds all settled forwards the fee revenue aggregator hasn't seen yet
 
-        del self._futures[id]
+        Must be called with _fee_revenue_lock held.
+        Returns the new forwards.
+        """
 
-    def _send_request(self, method: str, params: Union[Dict, List, None] = {}):
-        self._current_id += 1
-        data = self._build_request_data(method, self._current_id, params)
-        logger.trace(f"Sending request: {data} with id {self._current_id}")
-        self._writer.write(data.encode("utf-8"))
-        future = self._loop.create_future()
-        self._futures[self._current_id] = future
+        fwds = []
+        while True:
+            agg = self._fee_revenue
+            if self._fwd_pagination and agg.num_forwards > 0:
+                if agg.next_updated_index == 0:
+                    # State was built without pagination, start over
+                    # to not count forwards twice
+                    agg = self._fee_revenue = FeeRevenueAggregator()
+
+            page = await self._list_settled_forwards(agg.next_updated_index)
+
+            if not self._fwd_pagination:
+                # All settled forwards were returned, skip the ones we've seen
+                if agg.num_forwards > len(page):
+                    # node data doesn't match our state, e.g. the node was replaced
+                    agg = self._fee_revenue = FeeRevenueAggregator()
+
+                fwds = page[agg.num_forwards :]
+                agg.add_forwards(fwds)
+                break
+
+            if len(page) > 0:
+                agg.add_forwards(page)
+                agg.next_updated_index = page[-1]["updated_index"] + 1
+                fwds.extend(page)
+
+            if len(page) < _FORWARDS_PAGE_SIZE:
+                break
 
-        return future
+        if len(fwds) > 0:
+            await save_persisted_state(_FEE_REVENUE_STATE, self._fee_revenue.to_dict())
 
-    def _build_request_data(self, method: str, id: int, params) -> bytes:
-        return json.dumps(
-            {
-                "jsonrpc": "2.0",
-                "id": id,
-                "method": method,
-                "params": params,
+        return fwds
+
+    async def _list_settled_forwards(self, start: int) -> list:
+        """Lists one page of settled forwards with an updated_index >= start
+
+        If CLN doesn't support pagination, all settled forwards are returned and
+        _fwd_pagination is set to False.
+        """
+
+        if self._fwd_pagination:
+            # Settling a forward changes its updated_index, not its created_index.
+            # Paging by updated_index makes sure we see forwards which were already
+            # offered during the last poll but got settled in the meantime.
+            params = {
+                "status": "settled",
+                "index": "updated",
+                "start": start,
+                "limit": _FORWARDS_PAGE_SIZE,
             }
-        )
+            res = await self._send_request("listforwards", params)
+
+            if "error" not in res:
+                fwds = res["result"]["forwards"]
+                # Older CLN versions ignore the index parameter and don't
+                # return the updated_index, paging by it isn't possible then.
+                if len(fwds) == 0 or fwds[-1].get("updated_index") is not None:
+                    return fwds
+
+            elif res["error"]["code"] != _JSONRPC2_INVALID_PARAMS:
+                self._raise_internal_server_error("getting forwards", res)
+
+            logger.info(
+                "CLN doesn't support listforwards pagination. "
+                "Falling back to listing all settled forwards."
+            )
+            self._fwd_pagination = False
+
+        res = await self._send_request("listforwards", {"status": "settled"})
+        if "error" in res:
+            self._raise_internal_server_error("getting forwards", res)
+
+        return res["result"]["forwards"]
 
     def _raise_internal_server_error(self, action, res):
         err = res["error"]
@@ -986,38 +1122,29 @@ class LnNodeCLNjRPC(LightningNodeBase):
             detail=f"Error while {action}: {err}",
         )
 
-    async def _refresh_invoice_sub(self, refresh_pay_index=False):
-        if refresh_pay_index:
-            logger.info("Refreshing pay_index")
-
-            invoices = await self.list_invoices(
-                pending_only=False,
-                index_offset=0,
-                num_max_invoices=9999999999999,
-                reversed=True,
-            )
+    async def _scan_lastpay_index(self):
+        # This downloads all invoices, it's only done if we have no
+        # cursor yet or if we are in an unknown state
+        logger.info("Refreshing pay_index")
 
-            if invoices is not None:
-                for i in invoices:  # type Invoice
-                    if i.state is not InvoiceState.SETTLED:
-                        continue
+        invoices = await self.list_invoices(
+            pending_only=False,
+            index_offset=0,
+            num_max_invoices=9999999999999,
+            reversed=True,
+        )
 
-                    if (
-                        i.settle_index is not None
-                        and i.settle_index < self.lastpay_index
-                    ):
-                        break
+        if invoices is not None:
+            for i in invoices:  # type Invoice
+                if i.state is not InvoiceState.SETTLED:
+                    continue
 
-                    self.lastpay_index = i.settle_index
+                if i.settle_index is not None and i.settle_index < self.lastpay_index:
+                    break
 
-        data = self._build_request_data(
-            "waitanyinvoice",
-            _WAIT_ANY_INVOICE_ID,
-            {"lastpay_index": self.lastpay_index},
-        )
+                self.lastpay_index = i.settle_index
 
-        logger.trace(f"Sending waitanyinvoice request: {data}")
-        self._writer.write(data.encode("utf-8"))
+        await self._invoice_cursor.save(self.lastpay_index)
 
     async def _decode_bolt11_cached(self, bolt11: str) -> PaymentRequest:
         if bolt11 in self._bolt11_cache:
@@ -0,0 +1,305 @@
+import asyncio
+import json
+import time
+from typing import AsyncGenerator, Dict, List, Optional, Union
+
+from fastapi import status
+from fastapi.exceptions import HTTPException
+from loguru import logger
+
+from app.api.deadlines import call_timeout
+from app.lightning.impl.json_stream import JSONArrayStream, JSONFrameReader
+
+_READ_CHUNK_SIZE = 256 * 1024
+_RECONNECT_DELAY = 10
+
+# Calls which can return very large responses. They get their own connection so
+# they don't hold up small, latency sensitive calls like getinfo or pay.
+_BULK_METHODS = {
+    "listinvoices",
+    "listpays",
+    "listforwards",
+    "listtransactions",
+    "bkpr-listincome",
+    "bkpr-listaccountevents",
+}
+
+
+class CLNRPCError(Exception):
+    """CLN answered a streamed request with an error"""
+
+    def __init__(self, error: dict) -> None:
+        super().__init__(error)
+        self.error = error
+
+
+def _encode_request(
+    id: int,
+    method: str,
+    params: Union[Dict, List, None],
+    filter: Optional[dict],
+) -> bytes:
+    request = {"jsonrpc": "2.0", "id": id, "method": method, "params": params}
+    if filter is not None:
+        request["filter"] = filter
+
+    return json.dumps(request).encode("utf-8")
+
+
+class CLNConnection:
+    """A single connection to the CLN JSON-RPC unix socket
+
+    Requests are multiplexed by their id. If the socket fails, the pending
+    requests fail with 503 and the connection is re-established in the background.
+    """
+
+    def __init__(self, name: str, socket_path: str) -> None:
+        self._name = name
+        self._socket_path = socket_path
+        self._reader: asyncio.StreamReader | None = None
+        self._writer: asyncio.StreamWriter | None = None
+        self._futures: dict[int, asyncio.Future] = {}
+        self._current_id = 0
+        self._connected = asyncio.Event()
+
+    @property
+    def num_pending(self) -> int:
+        return len(self._futures)
+
+    @property
+    def connected(self) -> bool:
+        return self._connected.is_set()
+
+    async def connect(self) -> None:
+        while True:
+            try:
+                self._reader, self._writer = await asyncio.open_unix_connection(
+                    path=self._socket_path
+                )
+                break
+            except (ConnectionRefusedError, FileNotFoundError) as e:
+                logger.info(
+                    f"CLN connection {self._name}: {e}. "
+                    f"Retrying in {_RECONNECT_DELAY} seconds."
+                )
+                await asyncio.sleep(_RECONNECT_DELAY)
+            except OSError as e:
+                # e.g. a PermissionError, which won't go away without a fix of
+                # the socket permissions or the cln_jrpc_path config
+                logger.critical(
+                    f"CLN connection {self._name}: unable to open "
+                    f"{self._socket_path}: {e}. "
+                    f"Retrying in {_RECONNECT_DELAY} seconds."
+                )
+                await asyncio.sleep(_RECONNECT_DELAY)
+
+        self._connected.set()
+        asyncio.create_task(self._read_loop())
+
+    async def request(
+        self,
+        method: str,
+        params: Union[Dict, List, None],
+        timeout: Optional[float],
+        filter: Optional[dict] = None,
+    ) -> dict:
+        if not self._connected.is_set():
+            raise HTTPException(
+                status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Not connected to CLN, reconnecting",
+            )
+
+        self._current_id += 1
+        id = self._current_id
+        data = _encode_request(id, method, params, filter)
+        logger.trace(f"Sending request on {self._name}: {data}")
+
+        future = asyncio.get_running_loop().create_future()
+        self._futures[id] = future
+        try:
+            self._writer.write(data)
+            return await asyncio.wait_for(future, call_timeout(timeout))
+        except asyncio.TimeoutError:
+            raise HTTPException(
+                status.HTTP_504_GATEWAY_TIMEOUT,
+                detail=f"CLN didn't answer {method} in time",
+            )
+        finally:
+            # Also removes the future if the request was cancelled, so abandoned
+            # requests don't pile up. A late response is dropped.
+            self._futures.pop(id, None)
+
+    async def _read_loop(self) -> None:
+        frames = JSONFrameReader()
+        while not self._writer.is_closing():
+            try:
+                data = await self._reader.read(_READ_CHUNK_SIZE)
+                if not data:
+                    break
+
+                for response in frames.feed(data):
+                    self._handle_response(response)
+            except ConnectionError as e:
+                logger.error(f"CLN connection {self._name} failed: {e}")
+                break
+
+        logger.error(f"CLN connection {self._name} was lost, reconnecting")
+        self._connected.clear()
+        self._writer.close()
+        self._fail_pending_requests("Connection to CLN was lost")
+
+        await self.connect()
+
+    def _handle_response(self, response: dict) -> None:
+        id = response.get("id")
+
+        future = self._futures.pop(id, None)
+        if future is None or future.done():
+            logger.debug(
+                f"Dropping response {id}, the request timed out or was cancelled"
+            )
+            return
+
+        future.set_result(response)
+
+    def _fail_pending_requests(self, message: str) -> None:
+        for future in self._futures.values():
+            if not future.done():
+                future.set_exception(
+                    HTTPException(status.HTTP_503_SERVICE_UNAVAILABLE, detail=message)
+                )
+
+        self._futures.clear()
+
+
+class CLNConnectionPool:
+    """Routes JSON-RPC requests over several connections to the CLN socket
+
+    Large list calls use a dedicated bulk connection, all other calls go to the
+    least busy of the regular connections. Long running subscriptions like
+    waitanyinvoice have their own connection as well, unless subscription is
+    False.
+
+    With stream_lists, streamed lists are parsed element by element while they
+    are received instead of as a whole. This needs less memory for huge lists,
+    but the scanning is several times slower than json.loads and runs on the
+    event loop.
+    """
+
+    def __init__(
+        self,
+        socket_path: str,
+        num_connections: int,
+        subscription: bool = True,
+        stream_lists: bool = False,
+    ) -> None:
+        self._socket_path = socket_path
+        self._stream_lists = stream_lists
+        self.bulk = CLNConnection("bulk", socket_path)
+        self.subscription: CLNConnection | None = None
+        if subscription:
+            self.subscription = CLNConnection("subscription", socket_path)
+        self._connections = [
+            CLNConnection(f"regular-{i}", socket_path)
+            for i in range(max(1, num_connections))
+        ]
+
+    @property
+    def connected(self) -> bool:
+        """True if the bulk and all regular connections are usable"""
+        return self.bulk.connected and all(c.connected for c in self._connections)
+
+    async def connect(self) -> None:
+        connections = [self.bulk, *self._connections]
+        if self.subscription is not None:
+            connections.append(self.subscription)
+
+        await asyncio.gather(*[c.connect() for c in connections])
+
+    async def request(
+        self,
+        method: str,
+        params: Union[Dict, List, None],
+        timeout: Optional[float],
+        filter: Optional[dict] = None,
+    ) -> dict:
+        if method in _BULK_METHODS:
+            conn = self.bulk
+        else:
+            conn = min(self._connections, key=lambda c: c.num_pending)
+
+        return await conn.request(method, params, timeout, filter)
+
+    async def stream(
+        self,
+        method: str,
+        params: Union[Dict, List, None],
+        key: str,
+        timeout: Optional[float],
+        filter: Optional[dict] = None,
+    ) -> AsyncGenerator[dict, None]:
+        """Yields the elements of the array result[key] one after another
+
+        The request gets a connection of its own which is closed afterwards. The
+        response is parsed once it is complete, or while it is still being
+        received if the pool was created with stream_lists.
+        Raises CLNRPCError if CLN returns an error.
+        """
+
+        timeout = call_timeout(timeout)
+        deadline = None if timeout is None else time.monotonic() + timeout
+
+        try:
+            reader, writer = await asyncio.open_unix_connection(path=self._socket_path)
+        except OSError as e:
+            raise HTTPException(
+                status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail=f"Unable to connect to CLN: {e}",
+            )
+
+        parser = JSONArrayStream(key) if self._stream_lists else None
+        frames = JSONFrameReader()
+        document = None
+        try:
+            logger.trace(f"Streaming {method} with params {params}")
+            writer.write(_encode_request(1, method, params, filter))
+
+            while document is None:
+                left = None if deadline is None else deadline - time.monotonic()
+                data = await asyncio.wait_for(reader.read(_READ_CHUNK_SIZE), left)
+                if not data:
+                    raise HTTPException(
+                        status.HTTP_503_SERVICE_UNAVAILABLE,
+                        detail="Connection to CLN was lost",
+                    )
+
+                if parser is None:
+                    docs = frames.feed(data)
+                    if len(docs) > 0:
+                        document = docs[0]
+                    continue
+
+                for element in parser.feed(data):
+                    yield element
+
+                if parser.done:
+                    document = parser.document
+        except asyncio.TimeoutError:
+            raise HTTPException(
+                status.HTTP_504_GATEWAY_TIMEOUT,
+                detail=f"CLN didn't answer {method} in time",
+            )
+        except ConnectionError as e:
+            raise HTTPException(
+                status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail=f"Connection to CLN failed: {e}",
+            )
+        finally:
+            writer.close()
+
+        if "error" in document:
+            raise CLNRPCError(document["error"])
+
+        if parser is None:
+            for element in document["result"][key]:
+                yield element
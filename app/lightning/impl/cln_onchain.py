@@ -0,0 +1,91 @@
+import asyncio
+from typing import Dict, List, Optional
+
+from app.lightning.impl.cln_utils import parse_cln_msat
+from app.lightning.models import OnChainTransaction
+from app.lightning.utils import in_range
+
+
+class OnChainTxTable:
+    """Wallet transactions, built incrementally from CLN bookkeeper events
+
+    The bookkeeper only reports the block height of a transaction in
+    bkpr-listaccountevents, the amount in bkpr-listincome and the fee as a
+    separate income event. The table joins them by txid as the events come in.
+
+    income_time and events_time are the timestamps of the newest events seen so
+    far. Callers only need to fetch events from there on. Applying an event twice
+    has no effect, so the boundary may be fetched again.
+
+    Confirmations are derived from block_height, the current chain tip, which is
+    kept up to date by the caller.
+    """
+
+    def __init__(self) -> None:
+        self.lock = asyncio.Lock()
+        self.block_height: Optional[int] = None
+        self.income_time = 0
+        self.events_time = 0
+        self._txs: Dict[str, OnChainTransaction] = {}
+        self._fees: Dict[str, float] = {}
+        self._heights: Dict[str, int] = {}
+
+    def add_income_event(self, e: dict) -> None:
+        self.income_time = max(self.income_time, e["timestamp"])
+
+        if e["account"] != "wallet":
+            return
+
+        if e["tag"] == "deposit" or e["tag"] == "withdrawal":
+            tx = OnChainTransaction.from_cln_bkpr(e)
+            self._txs[tx.tx_hash] = tx
+        elif e["tag"] == "onchain_fee":
+            self._fees[e["txid"]] = parse_cln_msat(e["debit_msat"]) / 1000
+
+    def add_account_event(self, e: dict) -> None:
+        if e["timestamp"] < self.events_time:
+            return
+
+        self.events_time = e["timestamp"]
+
+        if e["account"] != "wallet" or e["type"] != "chain":
+            return
+
+        if e["tag"] == "deposit":
+            self._heights[e["outpoint"].split(":")[0]] = e["blockheight"]
+        elif e["tag"] == "withdrawal":
+            self._heights[e["txid"]] = e["blockheight"]
+
+    def transactions(
+        self, start_height: Optional[int] = None, end_height: Optional[int] = None
+    ) -> List[OnChainTransaction]:
+        """Returns the transactions confirmed within the given block heights
+
+        Unconfirmed transactions are only included without an end height, the
+        same way LND handles it.
+        """
+
+        txs = []
+        for txid, tx in self._txs.items():
+            height = self._heights.get(txid, 0)
+            if height and not in_range(height, start_height, end_height):
+                continue
+
+            if not height and end_height is not None:
+                continue
+
+            confirmations = 0
+            if height and self.block_height is not None:
+                confirmations = self.block_height - height
+
+            txs.append(
+                tx.model_copy(
+                    update={
+                        "block_height": height,
+                        "num_confirmations": confirmations,
+                        "total_fees": self._fees.get(txid, 0),
+                    }
+                )
+            )
+
+        return txs
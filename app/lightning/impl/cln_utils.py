@@ -1,4 +1,9 @@
 import time
+from typing import Optional
+
+from loguru import logger
+
+_BECH32_CHARSET = "qpzry9x8gf2tvdw0s3jn54khce6mua7l"
 
 
 def calc_fee_rate_str(sat_per_vbyte, target_conf) -> str:
@@ -23,6 +28,135 @@ def calc_fee_rate_str(sat_per_vbyte, target_conf) -> str:
     return fee_rate
 
 
+def _fields(*names: str) -> dict:
+    return {n: True for n in names}
+
+
+# Response filters for the CLN list calls, see the filter section in
+# lightningd-rpc(7). They only request the fields our converters read, which
+# trims the responses considerably on nodes with a long history.
+# Must be kept in sync with the from_cln_json / from_cln_jrpc converters.
+CLN_LIST_FILTERS = {
+    # Invoice.from_cln_json
+    "listinvoices": {
+        "invoices": [
+            _fields(
+                "label",
+                "description",
+                "payment_preimage",
+                "payment_hash",
+                "amount_msat",
+                "status",
+                "expires_at",
+                "paid_at",
+                "bolt11",
+                "pay_index",
+                "amount_received_msat",
+            )
+        ]
+    },
+    # Payment.from_cln_jrpc
+    "listpays": {
+        "pays": [
+            _fields(
+                "payment_hash",
+                "payment_preimage",
+                "amount_msat",
+                "amount_sent_msat",
+                "bolt11",
+                "status",
+                "created_at",
+                "label",
+            )
+        ]
+    },
+    # get_wallet_balance and Channel.from_cln_jrpc
+    "listfunds": {
+        "outputs": [_fields("amount_msat", "status", "reserved")],
+        "channels": [
+            _fields(
+                "peer_id",
+                "connected",
+                "state",
+                "short_channel_id",
+                "our_amount_msat",
+                "amount_msat",
+            )
+        ],
+    },
+    # ForwardSuccessEvent.from_cln_json and FeeRevenueAggregator
+    "listforwards": {
+        "forwards": [
+            _fields(
+                "in_channel",
+                "out_channel",
+                "in_msat",
+                "out_msat",
+                "fee_msat",
+                "received_time",
+                "resolved_time",
+                "updated_index",
+            )
+        ]
+    },
+    # OnChainTransaction.from_cln_bkpr and the fee events
+    "bkpr-listincome": {
+        "income_events": [
+            _fields(
+                "account",
+                "tag",
+                "credit_msat",
+                "debit_msat",
+                "outpoint",
+                "txid",
+                "timestamp",
+            )
+        ]
+    },
+    # block heights of the on-chain transactions
+    "bkpr-listaccountevents": {
+        "events": [
+            _fields(
+                "account",
+                "type",
+                "tag",
+                "outpoint",
+                "txid",
+                "timestamp",
+                "blockheight",
+            )
+        ]
+    },
+}
+
+
+def bolt11_timestamp(bolt11: Optional[str]) -> Optional[int]:
+    """Reads the creation time of a BOLT11 invoice without decoding all of it
+
+    CLN doesn't report when an invoice was created, but the data part of every
+    BOLT11 invoice starts with its timestamp, 35 bits as seven bech32 characters.
+    Returns None for anything else, e.g. BOLT12 invoices.
+    """
+
+    if not bolt11:
+        return None
+
+    sep = bolt11.rfind("1")
+    data = bolt11[sep + 1 : sep + 8].lower()
+    if sep == -1 or len(data) < 7:
+        return None
+
+    timestamp = 0
+    for c in data:
+        value = _BECH32_CHARSET.find(c)
+        if value == -1:
+            return None
+
+        timestamp = timestamp << 5 | value
+
+    return timestamp
+
+
 def parse_cln_msat(msat) -> int:
     if isinstance(msat, str):
         return int(msat.replace("msat", ""))
@@ -30,40 +164,155 @@ def parse_cln_msat(msat) -> int:
     return msat
 
 
-def cln_classify_fee_revenue(forwards: list):
-    """Calculate revenue from fees"""
-    day = week = month = year = total = 0
-
-    now = time.time()
-    t_day = now - 86400.0  # 1 day
-    t_week = now - 604800.0  # 1 week
-    t_month = now - 2592000.0  # 1 month
-    t_year = now - 31536000.0  # 1 year
-
-    # TODO: performance: cache this in redis
-    for f in forwards:
-        received_time = fee = 0
-        if isinstance(f, dict):
-            received_time = f["received_time"]
-            fee = parse_cln_msat(f["fee_msat"])
-        else:
-            received_time = f.received_time
-            fee = f.fee_msat.msat
-
-        total += fee
-
-        if received_time > t_day:
-            day += fee
-            week += fee
-            month += fee
-            year += fee
-        elif received_time > t_week:
-            week += fee
-            month += fee
-            year += fee
-        elif received_time > t_month:
-            month += fee
-            year += fee
-        elif received_time > t_year:
-            year += fee
-    return (day, week, month, year, total)
+def cln_forward_time(f) -> float:
+    """Returns the time a JSON or gRPC CLN forward was settled, in seconds
+
+    Falls back to the time it was received if the node doesn't report the
+    resolved_time, like the gRPC interface of older CLN versions.
+    """
+
+    if isinstance(f, dict):
+        return f.get("resolved_time") or f["received_time"]
+
+    return getattr(f, "resolved_time", 0) or f.received_time
+
+
+def cln_parse_forward_fee(f) -> tuple[float, int]:
+    """Returns (resolved_time, fee_msat) of a JSON or gRPC CLN forward"""
+
+    if isinstance(f, dict):
+        return (cln_forward_time(f), parse_cln_msat(f["fee_msat"]))
+
+    return (cln_forward_time(f), f.fee_msat.msat)
+
+
+class FeeRevenueAggregator:
+    """Incrementally maintained fee revenue of settled forwards
+
+    Fees are summed up in hourly buckets. Each time window (day, week, month, year)
+    keeps a running sum and the first bucket it covers. When time moves on, only the
+    buckets which fell out of a window are subtracted from its sum. Reading the
+    revenue is therefore O(1) and adding a forward is amortized O(1), no matter how
+    many forwards the node has handled.
+
+    The window boundaries have a resolution of one bucket (one hour).
+
+    next_updated_index is the CLN listforwards `updated_index` to continue from. It
+    is persisted together with the sums so both always match.
+    """
+
+    BUCKET_SECONDS = 3600
+    WINDOWS = {
+        "day": 86400,  # 1 day
+        "week": 604800,  # 1 week
+        "month": 2592000,  # 1 month
+        "year": 31536000,  # 1 year
+    }
+
+    def __init__(self) -> None:
+        self.total = 0
+        self.num_forwards = 0
+        self.next_updated_index = 0
+        self._buckets: dict[int, int] = {}
+        self._sums = {w: 0 for w in self.WINDOWS}
+        self._starts = {w: None for w in self.WINDOWS}
+
+    def _bucket(self, timestamp: float) -> int:
+        return int(timestamp) // self.BUCKET_SECONDS
+
+    def _window_start(self, window: str, now_bucket: int) -> int:
+        return now_bucket - self.WINDOWS[window] // self.BUCKET_SECONDS + 1
+
+    def _advance(self, now: float) -> None:
+        now_bucket = self._bucket(now)
+
+        for w in self.WINDOWS:
+            start = self._window_start(w, now_bucket)
+            old_start = self._starts[w]
+
+            if old_start is not None and start <= old_start:
+                continue
+
+            if old_start is None or start - old_start > len(self._buckets):
+                # the window moved further than the number of buckets we hold,
+                # summing up what is left is cheaper than walking the gap
+                self._sums[w] = sum(
+                    fee for b, fee in self._buckets.items() if b >= start
+                )
+            else:
+                for b in range(old_start, start):
+                    self._sums[w] -= self._buckets.get(b, 0)
+
+            self._starts[w] = start
+
+        # The year window is the largest one, older buckets are not needed anymore
+        year_start = self._starts["year"]
+        if len(self._buckets) > 0 and min(self._buckets) < year_start:
+            self._buckets = {b: f for b, f in self._buckets.items() if b >= year_start}
+
+    def add(self, resolved_time: float, fee_msat: int) -> None:
+        """Adds the fee of a single settled forward"""
+
+        self._advance(time.time())
+
+        self.total += fee_msat
+        self.num_forwards += 1
+
+        bucket = self._bucket(resolved_time)
+        if bucket < self._starts["year"]:
+            return
+
+        self._buckets[bucket] = self._buckets.get(bucket, 0) + fee_msat
+        for w in self.WINDOWS:
+            if bucket >= self._starts[w]:
+                self._sums[w] += fee_msat
+
+    def add_forwards(self, forwards) -> None:
+        """Adds a list of settled JSON or gRPC CLN forwards"""
+
+        for f in forwards:
+            self.add(*cln_parse_forward_fee(f))
+
+    def classify(self) -> tuple[int, int, int, int, int]:
+        """Returns the fee revenue as (day, week, month, year, total)"""
+
+        self._advance(time.time())
+
+        return (
+            self._sums["day"],
+            self._sums["week"],
+            self._sums["month"],
+            self._sums["year"],
+            self.total,
+        )
+
+    def to_dict(self) -> dict:
+        return {
+            "total": self.total,
+            "num_forwards": self.num_forwards,
+            "next_updated_index": self.next_updated_index,
+            "buckets": {str(b): fee for b, fee in self._buckets.items()},
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict | None) -> "FeeRevenueAggregator":
+        """Restores an aggregator from to_dict() data
+
+        Returns an empty aggregator if data is None or invalid.
+        """
+
+        agg = cls()
+        if data is None:
+            return agg
+
+        try:
+            agg.total = int(data["total"])
+            agg.num_forwards = int(data["num_forwards"])
+            agg.next_updated_index = int(data["next_updated_index"])
+            agg._buckets = {int(b): int(fee) for b, fee in data["buckets"].items()}
+        except (AttributeError, KeyError, TypeError, ValueError) as e:
+            logger.warning(f"Discarding invalid fee revenue state: {e}")
+            return cls()
+
+        agg._advance(time.time())
+        return agg
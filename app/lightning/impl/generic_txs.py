@@ -0,0 +1,113 @@
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+
+import app.lightning.impl.protos.cln.node_pb2 as cln
+import app.lightning.impl.protos.lnd.lightning_pb2 as lnd
+from app.lightning.models import GenericTx, Invoice, OnChainTransaction, Payment
+
+# The functions below build the list of /lightning/list-all-tx. They are run
+# with app.api.cpu_pool.run_cpu_bound, possibly in a worker process. Protobuf
+# messages don't pickle, so they are passed serialized there.
+
+MessageOrBytes = Union[bytes, object]
+
+
+def pack_messages(messages: Sequence, offload: bool) -> List[MessageOrBytes]:
+    """Serializes the protobuf messages if they are sent to a worker process"""
+
+    if not offload:
+        return list(messages)
+
+    return [m.SerializeToString() for m in messages]
+
+
+def _unpack(message_type, m: MessageOrBytes):
+    return message_type.FromString(m) if isinstance(m, bytes) else m
+
+
+def page_txs(
+    tx: List[GenericTx], index_offset: int, max_tx: int, reversed: bool
+) -> List[GenericTx]:
+    """Sorts the transactions by time, indexes them and returns the page"""
+
+    tx.sort(key=lambda e: e.time_stamp)
+
+    if reversed:
+        tx.reverse()
+
+    for i, t in enumerate(tx):
+        t.index = i
+
+    if max_tx == 0:
+        max_tx = len(tx)
+
+    return tx[index_offset : index_offset + max_tx]
+
+
+def lnd_generic_txs(
+    invoices: List[MessageOrBytes],
+    transactions: List[MessageOrBytes],
+    payments: List[MessageOrBytes],
+    comments: Dict[str, str],
+    index_offset: int,
+    max_tx: int,
+    reversed: bool,
+) -> List[GenericTx]:
+    tx = [GenericTx.from_lnd_grpc_invoice(_unpack(lnd.Invoice, i)) for i in invoices]
+
+    for t in transactions:
+        tx.append(GenericTx.from_lnd_grpc_onchain_tx(_unpack(lnd.Transaction, t)))
+
+    for p in payments:
+        p = _unpack(lnd.Payment, p)
+        comment = comments.get(p.payment_request, "")
+        tx.append(GenericTx.from_lnd_grpc_payment(p, comment))
+
+    return page_txs(tx, index_offset, max_tx, reversed)
+
+
+def cln_generic_txs(
+    invoices: List[Invoice],
+    transactions: List[OnChainTransaction],
+    payments: List[Payment],
+    comments: Dict[str, str],
+    block_height: int,
+    index_offset: int,
+    max_tx: int,
+    reversed: bool,
+) -> List[GenericTx]:
+    tx = [GenericTx.from_invoice(i) for i in invoices]
+
+    for t in transactions:
+        tx.append(GenericTx.from_onchain_tx(t, block_height))
+
+    for p in payments:
+        comment = comments.get(p.payment_request, "")
+        tx.append(GenericTx.from_payment(p, comment))
+
+    return page_txs(tx, index_offset, max_tx, reversed)
+
+
+def cln_grpc_generic_txs(
+    invoices: List[MessageOrBytes],
+    transactions: List[OnChainTransaction],
+    payments: List[MessageOrBytes],
+    decoded: Dict[str, Tuple[str, Optional[int]]],
+    block_height: int,
+    index_offset: int,
+    max_tx: int,
+    reversed: bool,
+) -> List[GenericTx]:
+    tx = [
+        GenericTx.from_cln_grpc_invoice(_unpack(cln.ListinvoicesInvoices, i))
+        for i in invoices
+    ]
+
+    for t in transactions:
+        tx.append(GenericTx.from_onchain_tx(t, block_height))
+
+    for p in payments:
+        p = _unpack(cln.ListpaysPays, p)
+        comment, amount = decoded.get(p.bolt11, ("", None))
+        tx.append(GenericTx.from_cln_grpc_payment(p, comment, amount))
+
+    return page_txs(tx, index_offset, max_tx, reversed)
@@ -0,0 +1,181 @@
+import json
+import re
+from typing import Any, List, Optional
+
+from loguru import logger
+
+# CLN terminates every JSON-RPC response with an empty line. JSON strings can't
+# contain raw line breaks, so the delimiter never shows up inside a response.
+_FRAME_DELIMITER = b"\n\n"
+
+_STRUCTURAL_CHARS = re.compile(rb'[{}\[\]"]')
+_QUOTE = ord('"')
+_BACKSLASH = ord("\\")
+_OPENING = b"{["
+
+
+class JSONFrameReader:
+    """Splits a byte stream into JSON documents separated by empty lines
+
+    Documents are parsed straight from the received bytes, without decoding them
+    to str first. There is no size limit for a single document.
+    """
+
+    def __init__(self) -> None:
+        self._buf = bytearray()
+        self._searched = 0
+
+    def feed(self, data: bytes) -> List[Any]:
+        """Adds received data, returns the documents which are now complete"""
+
+        self._buf += data
+        docs = []
+
+        while True:
+            end = self._buf.find(_FRAME_DELIMITER, self._searched)
+            if end == -1:
+                # The delimiter might be split between two chunks
+                self._searched = max(0, len(self._buf) - 1)
+                return docs
+
+            if end + len(_FRAME_DELIMITER) == len(self._buf):
+                # Common case: the chunk ended with the response, no copy needed
+                frame = self._buf
+                self._buf = bytearray()
+            else:
+                frame = self._buf[:end]
+                del self._buf[: end + len(_FRAME_DELIMITER)]
+
+            self._searched = 0
+
+            if frame.isspace() or len(frame) == 0:
+                continue
+
+            try:
+                docs.append(json.loads(frame))
+            except ValueError as e:
+                logger.error(f"Dropping malformed JSON-RPC response: {e}")
+
+
+class JSONArrayStream:
+    """Incrementally parses a JSON-RPC response and emits the elements of one array
+
+    The elements of result[key] are returned by feed() as soon as they are
+    complete and are removed from the buffer, so the whole list is never held in
+    memory. The elements must be objects or arrays. Once the response is complete,
+    done is True and document holds the response without the streamed elements.
+    """
+
+    def __init__(self, key: str) -> None:
+        self._path = [None, b"result", key.encode("utf-8")]
+        self._buf = bytearray()
+        self._pos = 0
+        self._doc_start: Optional[int] = None
+        self._keys: List[Optional[bytes]] = []
+        self._last_string: Optional[bytes] = None
+        self._string_start: Optional[int] = None
+        self._array_start: Optional[int] = None
+        self._element_start: Optional[int] = None
+        self.done = False
+        self.document: Optional[dict] = None
+
+    def feed(self, data: bytes) -> List[Any]:
+        """Adds received data, returns the array elements which are now complete"""
+
+        if self.done:
+            return []
+
+        buf = self._buf
+        buf += data
+        elements = []
+
+        while not self.done:
+            if self._string_start is not None:
+                end = self._find_string_end()
+                if end == -1:
+                    break
+
+                if len(self._keys) <= 2:
+                    # Only keys of the outer objects are needed to find the array
+                    self._last_string = bytes(buf[self._string_start : end])
+                self._string_start = None
+                self._pos = end + 1
+                continue
+
+            m = _STRUCTURAL_CHARS.search(buf, self._pos)
+            if m is None:
+                self._pos = len(buf)
+                break
+
+            i = m.start()
+            c = buf[i]
+            self._pos = i + 1
+
+            if c == _QUOTE:
+                self._string_start = i + 1
+            elif c in _OPENING:
+                self._open(i)
+            else:
+                element = self._close(i)
+                if element is not None:
+                    elements.append(element)
+
+        return elements
+
+    def _open(self, i: int) -> None:
+        if self._doc_start is None:
+            self._doc_start = i
+
+        if self._keys == self._path and self._element_start is None:
+            self._element_start = i
+
+        self._keys.append(self._last_string)
+        self._last_string = None
+
+        if self._keys == self._path:
+            self._array_start = i + 1
+
+    def _close(self, i: int) -> Optional[Any]:
+        buf = self._buf
+
+        if self._keys == self._path:
+            # End of the streamed array, drop the separators left between the
+            # removed elements
+            del buf[self._array_start : i]
+            self._pos = self._array_start + 1
+            i = self._array_start
+
+        self._keys.pop()
+        self._last_string = None
+
+        if len(self._keys) == 0:
+            self.document = json.loads(buf[self._doc_start : i + 1])
+            self.done = True
+            return None
+
+        if self._keys != self._path or self._element_start is None:
+            return None
+
+        element = json.loads(buf[self._element_start : i + 1])
+        del buf[self._array_start : i + 1]
+        self._pos = self._array_start
+        self._element_start = None
+        return element
+
+    def _find_string_end(self) -> int:
+        buf = self._buf
+        while True:
+            end = buf.find(b'"', self._pos)
+            if end == -1:
+                self._pos = len(buf)
+                return -1
+
+            # The quote is escaped if it follows an odd number of backslashes
+            j = end
+            while j > self._string_start and buf[j - 1] == _BACKSLASH:
+                j -= 1
+
+            if (end - j) % 2 == 0:
+                return end
+
+            self._pos = end + 1
@@ -1,5 +1,5 @@
 from abc import abstractmethod
-from typing import AsyncGenerator, List, Optional
+from typing import AsyncGenerator, Dict, List, Optional
 
 from app.lightning.models import (
     Channel,
@@ -9,6 +9,7 @@ from app.lightning.models import (
     InitLnRepoUpdate,
     Invoice,
     LnInfo,
+    LnNodeEvent,
     NewAddressInput,
     OnChainTransaction,
     Payment,
@@ -45,11 +46,15 @@ class LightningNodeBase:
         index_offset: int,
         num_max_invoices: int,
         reversed: bool,
+        creation_date_start: Optional[int] = None,
+        creation_date_end: Optional[int] = None,
     ):
         raise NotImplementedError()
 
     @abstractmethod
-    async def list_on_chain_tx(self) -> List[OnChainTransaction]:
+    async def list_on_chain_tx(
+        self, start_height: Optional[int] = None, end_height: Optional[int] = None
+    ) -> List[OnChainTransaction]:
         raise NotImplementedError()
 
     @abstractmethod
@@ -59,6 +64,8 @@ class LightningNodeBase:
         index_offset: int,
         max_payments: int,
         reversed: bool,
+        creation_date_start: Optional[int] = None,
+        creation_date_end: Optional[int] = None,
     ):
         raise NotImplementedError()
 
@@ -88,6 +95,14 @@ class LightningNodeBase:
     async def send_coins(self, input: SendCoinsInput) -> SendCoinsResponse:
         raise NotImplementedError()
 
+    @abstractmethod
+    async def send_many(self, outputs: Dict[str, int]) -> str:
+        """Pays the amounts in sat to the addresses in a single transaction
+
+        Returns the txid of the transaction.
+        """
+        raise NotImplementedError()
+
     @abstractmethod
     async def send_payment(
         self,
@@ -114,6 +129,16 @@ class LightningNodeBase:
     async def listen_forward_events(self) -> ForwardSuccessEvent:
         raise NotImplementedError()
 
+    @abstractmethod
+    async def listen_node_events(self) -> AsyncGenerator[LnNodeEvent, None]:
+        raise NotImplementedError()
+
+    @abstractmethod
+    async def forwarding_history(
+        self, start_time: int
+    ) -> AsyncGenerator[ForwardSuccessEvent, None]:
+        raise NotImplementedError()
+
     @abstractmethod
     async def channel_open(
         self, local_funding_amount: int, node_URI: str, target_confs: int
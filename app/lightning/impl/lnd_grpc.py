@@ -1,6 +1,6 @@
 import asyncio
 import os
-from typing import AsyncGenerator, List, Optional
+from typing import AsyncGenerator, Dict, List, Optional
 
 import grpc
 from decouple import config as dconfig
@@ -15,9 +15,14 @@ import app.lightning.impl.protos.lnd.router_pb2 as router
 import app.lightning.impl.protos.lnd.router_pb2_grpc as routerrpc
 import app.lightning.impl.protos.lnd.walletunlocker_pb2 as unlocker
 import app.lightning.impl.protos.lnd.walletunlocker_pb2_grpc as unlockerrpc
+from app.api.cpu_pool import run_cpu_bound, use_cpu_pool
+from app.api.deadlines import call_timeout
 from app.api.utils import SSE, broadcast_sse_msg, config_get_hex_str
 from app.lightning.exceptions import NodeNotFoundError
+from app.lightning.impl.generic_txs import lnd_generic_txs, pack_messages
 from app.lightning.impl.ln_base import LightningNodeBase
+from app.lightning.impl.lnd_htlcs import HtlcTracker
+from app.lightning.impl.lnd_utils import fetch_pages
 from app.lightning.models import (
     Channel,
     FeeRevenue,
@@ -28,6 +33,8 @@ from app.lightning.models import (
     InvoiceState,
     LnInfo,
     LnInitState,
+    LnNodeEvent,
+    LnNodeEventType,
     NewAddressInput,
     OnchainAddressType,
     OnChainTransaction,
@@ -37,7 +44,12 @@ from app.lightning.models import (
     SendCoinsResponse,
     WalletBalance,
 )
-from app.lightning.utils import alias_or_empty
+from app.lightning.payment_progress import PaymentProgress
+from app.lightning.utils import (
+    InvoiceCursor,
+    alias_or_empty,
+    raise_if_deadline_exceeded,
+)
 
 
 @logger.catch(exclude=(HTTPException,))
@@ -51,6 +63,35 @@ def _check_if_locked(error):
         )
 
 
+def _channel_point_str(p) -> str:
+    txid = p.funding_txid_str
+    if not txid:
+        # funding_txid_bytes is in internal byte order
+        txid = p.funding_txid_bytes[::-1].hex()
+
+    return f"{txid}:{p.output_index}"
+
+
+def _node_event_from_channel_update(u) -> LnNodeEvent:
+    t = ln.ChannelEventUpdate.UpdateType
+    e = LnNodeEvent(LnNodeEventType.CHANNEL)
+    if u.type == t.OPEN_CHANNEL:
+        e.channel = Channel.from_lnd_grpc(u.open_channel)
+        e.channel_id = e.channel.channel_id
+    elif u.type == t.CLOSED_CHANNEL:
+        e.channel_id = u.closed_channel.channel_point
+        e.closed = True
+    elif u.type == t.ACTIVE_CHANNEL:
+        e.channel_id = _channel_point_str(u.active_channel)
+        e.active = True
+    elif u.type == t.INACTIVE_CHANNEL:
+        e.channel_id = _channel_point_str(u.inactive_channel)
+        e.active = False
+
+    # pending open and fully resolved channels need a full channel list
+    return e
+
+
 # Due to updated ECDSA generated tls.cert we need to let gprc know that
 # we need to use that cipher suite otherwise there will be a handshake
 # error when we communicate with the lnd rpc server.
@@ -60,6 +101,15 @@ os.environ["GRPC_SSL_CIPHER_SUITES"] = "HIGH+ECDSA"
 # os.environ["GRPC_TRACE"] = "all"
 # os.environ["GRPC_VERBOSITY"] = "DEBUG"
 
+# Default deadlines in seconds, capped by the deadline of the HTTP request
+_TIMEOUT_SHORT = 20
+_TIMEOUT_LIST = 120
+# opening and closing channels, on-chain sends, connecting peers
+_TIMEOUT_ACTION = 120
+
+_INVOICE_CURSOR_STATE = "lnd_invoice_cursor"
+_RESUBSCRIBE_DELAY = 5
+
 
 class LnNodeLNDgRPC(LightningNodeBase):
     _lnd_connect_error_debug_msg = """
@@ -81,6 +131,50 @@ This will show more debug information.
     _memo_cache = {}
     _initialized = False
 
+    def _invoice_pages(
+        self,
+        pending_only: bool = False,
+        index_offset: int = 0,
+        creation_date_start: Optional[int] = None,
+        creation_date_end: Optional[int] = None,
+    ) -> AsyncGenerator[ln.Invoice, None]:
+        async def fetch(index_offset: int, page_size: int):
+            req = ln.ListInvoiceRequest(
+                pending_only=pending_only,
+                index_offset=index_offset,
+                num_max_invoices=page_size,
+                creation_date_start=creation_date_start or 0,
+                creation_date_end=creation_date_end or 0,
+            )
+            res = await self._lnd_stub.ListInvoices(
+                req, timeout=call_timeout(_TIMEOUT_LIST)
+            )
+            return res.invoices, res.last_index_offset
+
+        return fetch_pages(fetch, index_offset)
+
+    def _payment_pages(
+        self,
+        include_incomplete: bool = True,
+        index_offset: int = 0,
+        creation_date_start: Optional[int] = None,
+        creation_date_end: Optional[int] = None,
+    ) -> AsyncGenerator[ln.Payment, None]:
+        async def fetch(index_offset: int, page_size: int):
+            req = ln.ListPaymentsRequest(
+                include_incomplete=include_incomplete,
+                index_offset=index_offset,
+                max_payments=page_size,
+                creation_date_start=creation_date_start or 0,
+                creation_date_end=creation_date_end or 0,
+            )
+            res = await self._lnd_stub.ListPayments(
+                req, timeout=call_timeout(_TIMEOUT_LIST)
+            )
+            return res.payments, res.last_index_offset
+
+        return fetch_pages(fetch, index_offset)
+
     def _create_stubs(self) -> None:
         if self._channel is not None:
             logger.warning("gRPC channel already created.")
@@ -131,7 +225,9 @@ This will show more debug information.
                             self._lnd_grpc_url, self._combined_creds
                         )
                         temp_stub = lnrpc.LightningStub(temp_channel)
-                await temp_stub.GetInfo(ln.GetInfoRequest())
+                await temp_stub.GetInfo(
+                    ln.GetInfoRequest(), timeout=call_timeout(_TIMEOUT_SHORT)
+                )
 
                 if self._channel is None:
                     self._create_stubs()
@@ -139,6 +235,7 @@ This will show more debug information.
                 await self._init_queue.put(InitLnRepoUpdate(state=LnInitState.DONE))
                 break
             except grpc.aio._call.AioRpcError as error:
+                raise_if_deadline_exceeded(error)
                 details = error.details()
                 logger.debug(f"Waiting for LND daemon... Details {details}")
 
@@ -290,13 +387,18 @@ This will show more debug information.
 
         try:
             w_req = ln.WalletBalanceRequest()
-            onchain = await self._lnd_stub.WalletBalance(w_req)
+            onchain = await self._lnd_stub.WalletBalance(
+                w_req, timeout=call_timeout(_TIMEOUT_SHORT)
+            )
 
             c_req = ln.ChannelBalanceRequest()
-            channel = await self._lnd_stub.ChannelBalance(c_req)
+            channel = await self._lnd_stub.ChannelBalance(
+                c_req, timeout=call_timeout(_TIMEOUT_SHORT)
+            )
 
             return WalletBalance.from_lnd_grpc(onchain, channel)
         except grpc.aio._call.AioRpcError as error:
+            raise_if_deadline_exceeded(error)
             _check_if_locked(error)
             raise HTTPException(
                 status.HTTP_500_INTERNAL_SERVER_ERROR, detail=error.details()
@@ -314,74 +416,63 @@ This will show more debug information.
         )
 
         # TODO: find a better caching strategy
-        list_invoice_req = ln.ListInvoiceRequest(
-            pending_only=successful_only,
-            index_offset=0,
-            num_max_invoices=0,
-            reversed=reversed,
-        )
-
         get_tx_req = ln.GetTransactionsRequest()
-
-        list_payments_req = ln.ListPaymentsRequest(
-            include_incomplete=not successful_only,
-            index_offset=0,
-            max_payments=0,
-            reversed=reversed,
-        )
+        get_tx = None
 
         try:
-            res = await asyncio.gather(
-                *[
-                    self._lnd_stub.ListInvoices(list_invoice_req),
-                    self._lnd_stub.GetTransactions(get_tx_req),
-                    self._lnd_stub.ListPayments(list_payments_req),
-                ]
-            )
-
-            tx = []
-            for i in res[0].invoices:
-                tx.append(GenericTx.from_lnd_grpc_invoice(i))
-            for t in res[1].transactions:
-                tx.append(GenericTx.from_lnd_grpc_onchain_tx(t))
-            for p in res[2].payments:
-                comment = ""
-                if p.payment_request in self._memo_cache:
-                    comment = self._memo_cache[p.payment_request]
-                else:
-                    if p.payment_request is not None and p.payment_request != "":
-                        pr = await self.decode_pay_request(p.payment_request)
-                        if pr is None:
-                            logger.error(
-                                f"Unable to decode payment request {p.payment_request}"
-                            )
-                            continue
-
-                        comment = pr.description
-                        self._memo_cache[p.payment_request] = pr.description
-                tx.append(GenericTx.from_lnd_grpc_payment(p, comment))
-
-            def sortKey(e: GenericTx):
-                return e.time_stamp
-
-            tx.sort(key=sortKey)
-
-            if reversed:
-                tx.reverse()
-
-            current_tx = len(tx)
-            for i in range(current_tx):
-                tx[i].index = i
+            # Invoices and payments are fetched page by page in the meantime
+            get_tx = asyncio.ensure_future(
+                self._lnd_stub.GetTransactions(
+                    get_tx_req, timeout=call_timeout(_TIMEOUT_LIST)
+                )
+            )
 
-            if max_tx == 0:
-                max_tx = current_tx
+            invoices = [
+                i async for i in self._invoice_pages(pending_only=successful_only)
+            ]
 
-            return tx[index_offset : index_offset + max_tx]
+            payments = []
+            comments = {}
+            async for p in self._payment_pages(include_incomplete=not successful_only):
+                if p.payment_request in self._memo_cache:
+                    comments[p.payment_request] = self._memo_cache[p.payment_request]
+                elif p.payment_request is not None and p.payment_request != "":
+                    pr = await self.decode_pay_request(p.payment_request)
+                    if pr is None:
+                        logger.error(
+                            f"Unable to decode payment request {p.payment_request}"
+                        )
+                        continue
+
+                    comments[p.payment_request] = pr.description
+                    self._memo_cache[p.payment_request] = pr.description
+                payments.append(p)
+
+            transactions = (await get_tx).transactions
+
+            offload = use_cpu_pool(len(invoices) + len(transactions) + len(payments))
+            return await run_cpu_bound(
+                "lnd_list_all_tx",
+                offload,
+                lnd_generic_txs,
+                pack_messages(invoices, offload),
+                pack_messages(transactions, offload),
+                pack_messages(payments, offload),
+                comments,
+                index_offset,
+                max_tx,
+                reversed,
+            )
         except grpc.aio._call.AioRpcError as error:
+            raise_if_deadline_exceeded(error)
             _check_if_locked(error)
             raise HTTPException(
                 status.HTTP_500_INTERNAL_SERVER_ERROR, detail=error.details()
             )
+        finally:
+            # Don't leave the call running if paging failed or was cancelled
+            if get_tx is not None and not get_tx.done():
+                get_tx.cancel()
 
     @logger.catch(exclude=(HTTPException,))
     async def list_invoices(
@@ -390,33 +481,61 @@ This will show more debug information.
         index_offset: int,
         num_max_invoices: int,
         reversed: bool,
+        creation_date_start: Optional[int] = None,
+        creation_date_end: Optional[int] = None,
     ):
         logger.trace("logger.list_invoices() ")
 
         try:
+            if num_max_invoices == 0 and (not reversed or index_offset == 0):
+                # All invoices, walk through them in pages
+                pages = self._invoice_pages(
+                    pending_only,
+                    index_offset,
+                    creation_date_start,
+                    creation_date_end,
+                )
+                return [Invoice.from_lnd_grpc(i) async for i in pages]
+
             req = ln.ListInvoiceRequest(
                 pending_only=pending_only,
                 index_offset=index_offset,
                 num_max_invoices=num_max_invoices,
                 reversed=reversed,
+                creation_date_start=creation_date_start or 0,
+                creation_date_end=creation_date_end or 0,
+            )
+            response = await self._lnd_stub.ListInvoices(
+                req, timeout=call_timeout(_TIMEOUT_LIST)
             )
-            response = await self._lnd_stub.ListInvoices(req)
             return [Invoice.from_lnd_grpc(i) for i in response.invoices]
         except grpc.aio._call.AioRpcError as error:
+            raise_if_deadline_exceeded(error)
             _check_if_locked(error)
             raise HTTPException(
                 status.HTTP_500_INTERNAL_SERVER_ERROR, detail=error.details()
             )
 
     @logger.catch(exclude=(HTTPException,))
-    async def list_on_chain_tx(self) -> List[OnChainTransaction]:
-        logger.trace("logger.list_on_chain_tx() ")
+    async def list_on_chain_tx(
+        self, start_height: Optional[int] = None, end_height: Optional[int] = None
+    ) -> List[OnChainTransaction]:
+        logger.trace(
+            f"logger.list_on_chain_tx(start_height={start_height}, "
+            f"end_height={end_height})"
+        )
 
         try:
-            req = ln.GetTransactionsRequest()
-            response = await self._lnd_stub.GetTransactions(req)
+            # An end_height of 0 includes unconfirmed transactions
+            req = ln.GetTransactionsRequest(
+                start_height=start_height or 0, end_height=end_height or 0
+            )
+            response = await self._lnd_stub.GetTransactions(
+                req, timeout=call_timeout(_TIMEOUT_LIST)
+            )
             return [OnChainTransaction.from_lnd_grpc(t) for t in response.transactions]
         except grpc.aio._call.AioRpcError as error:
+            raise_if_deadline_exceeded(error)
             _check_if_locked(error)
             raise HTTPException(
                 status.HTTP_500_INTERNAL_SERVER_ERROR, detail=error.details()
@@ -429,6 +548,8 @@ This will show more debug information.
         index_offset: int,
         max_payments: int,
         reversed: bool,
+        creation_date_start: Optional[int] = None,
+        creation_date_end: Optional[int] = None,
     ):
         logger.trace(
             (
@@ -439,15 +560,30 @@ This will show more debug information.
         )
 
         try:
+            if max_payments == 0 and (not reversed or index_offset == 0):
+                # All payments, walk through them in pages
+                pages = self._payment_pages(
+                    include_incomplete,
+                    index_offset,
+                    creation_date_start,
+                    creation_date_end,
+                )
+                return [Payment.from_lnd_grpc(p) async for p in pages]
+
             req = ln.ListPaymentsRequest(
                 include_incomplete=include_incomplete,
                 index_offset=index_offset,
                 max_payments=max_payments,
                 reversed=reversed,
+                creation_date_start=creation_date_start or 0,
+                creation_date_end=creation_date_end or 0,
+            )
+            response = await self._lnd_stub.ListPayments(
+                req, timeout=call_timeout(_TIMEOUT_LIST)
             )
-            response = await self._lnd_stub.ListPayments(req)
             return [Payment.from_lnd_grpc(p) for p in response.payments]
         except grpc.aio._call.AioRpcError as error:
+            raise_if_deadline_exceeded(error)
             _check_if_locked(error)
             raise HTTPException(
                 status.HTTP_500_INTERNAL_SERVER_ERROR, detail=error.details()
@@ -476,7 +612,9 @@ This will show more debug information.
                 is_keysend=is_keysend,
             )
 
-            response = await self._lnd_stub.AddInvoice(i)
+            response = await self._lnd_stub.AddInvoice(
+                i, timeout=call_timeout(_TIMEOUT_SHORT)
+            )
 
             # Can't use Invoice.from_lnd_grpc() here because
             # the response is not a standard invoice
@@ -494,6 +632,7 @@ This will show more debug information.
 
             return invoice
         except grpc.aio._call.AioRpcError as error:
+            raise_if_deadline_exceeded(error)
             _check_if_locked(error)
             raise HTTPException(
                 status.HTTP_500_INTERNAL_SERVER_ERROR, detail=error.details()
@@ -505,9 +644,12 @@ This will show more debug information.
 
         try:
             req = ln.PayReqString(pay_req=pay_req)
-            res = await self._lnd_stub.DecodePayReq(req)
+            res = await self._lnd_stub.DecodePayReq(
+                req, timeout=call_timeout(_TIMEOUT_SHORT)
+            )
             return PaymentRequest.from_lnd_grpc(res)
         except grpc.aio._call.AioRpcError as error:
+            raise_if_deadline_exceeded(error)
             _check_if_locked(error)
             if (
                 error.details() is not None
@@ -526,7 +668,7 @@ This will show more debug information.
         logger.trace("logger.get_fee_revenue()")
 
         req = ln.FeeReportRequest()
-        res = await self._lnd_stub.FeeReport(req)
+        res = await self._lnd_stub.FeeReport(req, timeout=call_timeout(_TIMEOUT_SHORT))
         return FeeRevenue.from_lnd_grpc(res)
 
     @logger.catch(exclude=(HTTPException,))
@@ -536,9 +678,12 @@ This will show more debug information.
         t = 1 if input.type == OnchainAddressType.NP2WKH else 2
         try:
             req = ln.NewAddressRequest(type=t)
-            response = await self._lnd_stub.NewAddress(req)
+            response = await self._lnd_stub.NewAddress(
+                req, timeout=call_timeout(_TIMEOUT_SHORT)
+            )
             return response.address
         except grpc.aio._call.AioRpcError as error:
+            raise_if_deadline_exceeded(error)
             _check_if_locked(error)
             raise HTTPException(
                 status.HTTP_500_INTERNAL_SERVER_ERROR, detail=error.details()
@@ -560,9 +705,12 @@ This will show more debug information.
             )
 
             bi = await btc.get_blockchain_info()
-            sendResponse = await self._lnd_stub.SendCoins(r)
+            sendResponse = await self._lnd_stub.SendCoins(
+                r, timeout=call_timeout(_TIMEOUT_ACTION)
+            )
             txResponse = await self._lnd_stub.GetTransactions(
-                ln.GetTransactionsRequest(start_height=-1, end_height=bi.blocks)
+                ln.GetTransactionsRequest(start_height=-1, end_height=bi.blocks),
+                timeout=call_timeout(_TIMEOUT_LIST),
             )
 
             tx = None
@@ -575,6 +723,7 @@ This will show more debug information.
             await broadcast_sse_msg(SSE.LN_ONCHAIN_PAYMENT_STATUS, r.model_dump())
             return r
         except grpc.aio._call.AioRpcError as error:
+            raise_if_deadline_exceeded(error)
             _check_if_locked(error)
             details = error.details()
             if details and details.find("invalid bech32 string") > -1:
@@ -592,6 +741,32 @@ This will show more debug information.
                     status.HTTP_500_INTERNAL_SERVER_ERROR, detail=details
                 )
 
+    @logger.catch(exclude=(HTTPException,))
+    async def send_many(self, outputs: Dict[str, int]) -> str:
+        logger.trace(f"logger.send_many(outputs={outputs})")
+
+        try:
+            res = await self._lnd_stub.SendMany(
+                ln.SendManyRequest(AddrToAmount=outputs),
+                timeout=call_timeout(_TIMEOUT_ACTION),
+            )
+            return res.txid
+        except grpc.aio._call.AioRpcError as error:
+            raise_if_deadline_exceeded(error)
+            _check_if_locked(error)
+            details = error.details()
+            if details and details.find("invalid bech32 string") > -1:
+                raise HTTPException(
+                    status.HTTP_400_BAD_REQUEST,
+                    detail=f"Could not parse a destination address: {details}",
+                )
+            elif details and details.find("insufficient funds available") > -1:
+                raise HTTPException(status.HTTP_412_PRECONDITION_FAILED, detail=details)
+            else:
+                raise HTTPException(
+                    status.HTTP_500_INTERNAL_SERVER_ERROR, detail=details
+                )
+
     @logger.catch(exclude=(HTTPException,))
     async def send_payment(
         self,
@@ -617,11 +792,17 @@ This will show more debug information.
             )
 
             p = None
-            async for response in self._router_stub.SendPaymentV2(r):
+            progress = None
+            timeout = call_timeout(timeout_seconds + _TIMEOUT_SHORT)
+            async for response in self._router_stub.SendPaymentV2(r, timeout=timeout):
                 p = Payment.from_lnd_grpc(response)
-                await broadcast_sse_msg(SSE.LN_PAYMENT_STATUS, p.model_dump())
+                if progress is None:
+                    progress = PaymentProgress(p.payment_hash)
+
+                await progress.update(p)
             return p
         except grpc.aio._call.AioRpcError as error:
+            raise_if_deadline_exceeded(error)
             _check_if_locked(error)
             if (
                 error.details() is not None
@@ -687,9 +868,12 @@ This will show more debug information.
 
         try:
             req = ln.GetInfoRequest()
-            response = await self._lnd_stub.GetInfo(req)
+            response = await self._lnd_stub.GetInfo(
+                req, timeout=call_timeout(_TIMEOUT_SHORT)
+            )
             return LnInfo.from_lnd_grpc(self.get_implementation_name(), response)
         except grpc.aio._call.AioRpcError as error:
+            raise_if_deadline_exceeded(error)
             _check_if_locked(error)
             raise HTTPException(
                 status.HTTP_500_INTERNAL_SERVER_ERROR, detail=error.details()
@@ -703,7 +887,9 @@ This will show more debug information.
 
         while True:
             try:
-                info = await self._lnd_stub.GetInfo(ln.GetInfoRequest())
+                info = await self._lnd_stub.GetInfo(
+                    ln.GetInfoRequest(), timeout=call_timeout(_TIMEOUT_SHORT)
+                )
 
                 if info is not None:
                     logger.debug(
@@ -714,6 +900,7 @@ This will show more debug information.
                     )
                     break
             except grpc.aio._call.AioRpcError as error:
+                raise_if_deadline_exceeded(error)
                 details = error.details()
                 if (
                     "the RPC server is in the process of starting up, but not yet "
@@ -743,10 +930,13 @@ This will show more debug information.
                 self._create_stubs()
 
             req = unlocker.UnlockWalletRequest(wallet_password=bytes(password, "utf-8"))
-            await self._wallet_unlocker.UnlockWallet(req)
+            await self._wallet_unlocker.UnlockWallet(
+                req, timeout=call_timeout(_TIMEOUT_ACTION)
+            )
             await self._wait_wallet_fully_ready()
             return True
         except grpc.aio._call.AioRpcError as error:
+            raise_if_deadline_exceeded(error)
             if error.details().find("invalid passphrase") > -1:
                 raise HTTPException(
                     status.HTTP_401_UNAUTHORIZED, detail=error.details()
@@ -764,51 +954,129 @@ This will show more debug information.
     async def listen_invoices(self) -> AsyncGenerator[Invoice, None]:
         logger.trace("logger.listen_invoices()")
 
-        request = ln.InvoiceSubscription()
+        # Resume from the last invoice we've seen. LND replays all invoices
+        # which were added or settled after these indexes before sending
+        # live updates.
+        info = await self.get_ln_info()
+        cursor = InvoiceCursor(_INVOICE_CURSOR_STATE, info.identity_pubkey, "indexes")
+        state = await cursor.load() or {}
+        indexes = {
+            "add_index": state.get("add_index", 0),
+            "settle_index": state.get("settle_index", 0),
+        }
+
+        while True:
+            request = ln.InvoiceSubscription(
+                add_index=indexes["add_index"], settle_index=indexes["settle_index"]
+            )
+            try:
+                async for r in self._lnd_stub.SubscribeInvoices(request):
+                    indexes = {
+                        "add_index": max(indexes["add_index"], r.add_index),
+                        "settle_index": max(indexes["settle_index"], r.settle_index),
+                    }
+                    cursor.save_soon(indexes)
+
+                    yield Invoice.from_lnd_grpc(r)
+            except grpc.aio._call.AioRpcError as error:
+                raise_if_deadline_exceeded(error)
+                _check_if_locked(error)
+
+                if error.code() != grpc.StatusCode.UNAVAILABLE:
+                    raise HTTPException(
+                        status.HTTP_500_INTERNAL_SERVER_ERROR, detail=error.details()
+                    )
+
+                logger.warning(
+                    "Invoice subscription lost, resubscribing in "
+                    f"{_RESUBSCRIBE_DELAY} seconds: {error.details()}"
+                )
+                await asyncio.sleep(_RESUBSCRIBE_DELAY)
+
+    @logger.catch(exclude=(HTTPException,))
+    async def listen_forward_events(self) -> ForwardSuccessEvent:
+        logger.trace("logger.listen_forward_events()")
+
+        request = router.SubscribeHtlcEventsRequest()
+        tracker = HtlcTracker()
         try:
-            async for r in self._lnd_stub.SubscribeInvoices(request):
-                yield Invoice.from_lnd_grpc(r)
+            async for e in self._router_stub.SubscribeHtlcEvents(request):
+                fwd = tracker.handle(e)
+                if fwd is not None:
+                    yield fwd
         except grpc.aio._call.AioRpcError as error:
+            raise_if_deadline_exceeded(error)
             _check_if_locked(error)
             raise HTTPException(
                 status.HTTP_500_INTERNAL_SERVER_ERROR, detail=error.details()
             )
+        finally:
+            tracker.clear()
 
     @logger.catch(exclude=(HTTPException,))
-    async def listen_forward_events(self) -> ForwardSuccessEvent:
-        logger.trace("logger.listen_forward_events()")
+    async def listen_node_events(self) -> AsyncGenerator[LnNodeEvent, None]:
+        logger.trace("logger.listen_node_events()")
+
+        queue = asyncio.Queue()
+
+        async def _forward(stream, to_event):
+            try:
+                async for u in stream:
+                    queue.put_nowait(to_event(u))
+            except grpc.aio._call.AioRpcError as error:
+                queue.put_nowait(error)
+
+        tx_stream = self._lnd_stub.SubscribeTransactions(ln.GetTransactionsRequest())
+        chan_stream = self._lnd_stub.SubscribeChannelEvents(
+            ln.ChannelEventSubscription()
+        )
+        peer_stream = self._lnd_stub.SubscribePeerEvents(ln.PeerEventSubscription())
+        tasks = [
+            asyncio.create_task(
+                _forward(tx_stream, lambda _: LnNodeEvent(LnNodeEventType.TRANSACTION))
+            ),
+            asyncio.create_task(_forward(chan_stream, _node_event_from_channel_update)),
+            asyncio.create_task(
+                _forward(peer_stream, lambda _: LnNodeEvent(LnNodeEventType.PEER))
+            ),
+        ]
 
-        request = router.SubscribeHtlcEventsRequest()
         try:
-            _fwd_cache = {}
+            while True:
+                e = await queue.get()
+                if isinstance(e, grpc.aio._call.AioRpcError):
+                    _check_if_locked(e)
+                    raise HTTPException(
+                        status.HTTP_500_INTERNAL_SERVER_ERROR, detail=e.details()
+                    )
 
-            async for e in self._router_stub.SubscribeHtlcEvents(request):
-                if e.event_type != 3:
-                    continue
-
-                evt = str(e)
-                failed_event = "forward_fail_event" in evt or "link_fail_event" in evt
-                if e.incoming_htlc_id not in _fwd_cache and not failed_event:
-                    _fwd_cache[e.incoming_htlc_id] = e
-                elif e.incoming_htlc_id in _fwd_cache and not failed_event:
-                    if hasattr(e, "settle_event") and len(e.settle_event.preimage) > 0:
-                        old_e = _fwd_cache[e.incoming_htlc_id]
-                        del _fwd_cache[e.incoming_htlc_id]
-                        amt_in_msat = old_e.forward_event.info.incoming_amt_msat
-                        amt_out_msat = old_e.forward_event.info.outgoing_amt_msat
-                        fee = amt_in_msat - amt_out_msat
-                        yield ForwardSuccessEvent(
-                            timestamp_ns=e.timestamp_ns,
-                            chan_id_in=e.incoming_channel_id,
-                            chan_id_out=e.outgoing_channel_id,
-                            amt_in_msat=amt_in_msat,
-                            amt_out_msat=amt_out_msat,
-                            fee_msat=fee,
-                        )
-                elif failed_event and e.incoming_htlc_id in _fwd_cache:
-                    del _fwd_cache[e.incoming_htlc_id]
+                yield e
+        finally:
+            for t in tasks:
+                t.cancel()
+
+    @logger.catch(exclude=(HTTPException,))
+    async def forwarding_history(
+        self, start_time: int
+    ) -> AsyncGenerator[ForwardSuccessEvent, None]:
+        logger.trace(f"logger.forwarding_history(start_time={start_time})")
+
+        async def fetch(index_offset: int, page_size: int):
+            req = ln.ForwardingHistoryRequest(
+                start_time=start_time,
+                index_offset=index_offset,
+                num_max_events=page_size,
+            )
+            res = await self._lnd_stub.ForwardingHistory(
+                req, timeout=call_timeout(_TIMEOUT_LIST)
+            )
+            return res.forwarding_events, res.last_offset_index
 
+        try:
+            async for e in fetch_pages(fetch):
+                yield ForwardSuccessEvent.from_lnd_grpc(e)
         except grpc.aio._call.AioRpcError as error:
+            raise_if_deadline_exceeded(error)
             _check_if_locked(error)
             raise HTTPException(
                 status.HTTP_500_INTERNAL_SERVER_ERROR, detail=error.details()
@@ -836,8 +1104,11 @@ This will show more debug information.
                 timeout=10,
             )
             try:
-                await self._lnd_stub.ConnectPeer(r)
+                await self._lnd_stub.ConnectPeer(
+                    r, timeout=call_timeout(_TIMEOUT_ACTION)
+                )
             except grpc.aio._call.AioRpcError as error:
+                raise_if_deadline_exceeded(error)
                 if (
                     error.details() is not None
                     and error.details().find("already connected to peer") > -1
@@ -852,10 +1123,13 @@ This will show more debug information.
                 local_funding_amount=local_funding_amount,
                 target_conf=target_confs,
             )
-            async for response in self._lnd_stub.OpenChannel(r):
+            async for response in self._lnd_stub.OpenChannel(
+                r, timeout=call_timeout(_TIMEOUT_ACTION)
+            ):
                 return str(response.chan_pending.txid.hex())
 
         except grpc.aio._call.AioRpcError as error:
+            raise_if_deadline_exceeded(error)
             raise HTTPException(
                 status.HTTP_500_INTERNAL_SERVER_ERROR, detail=error.details()
             )
@@ -867,10 +1141,13 @@ This will show more debug information.
         # get fresh list of peers and their aliases
         try:
             request = ln.NodeInfoRequest(pub_key=node_pub, include_channels=False)
-            response = await self._lnd_stub.GetNodeInfo(request)
+            response = await self._lnd_stub.GetNodeInfo(
+                request, timeout=call_timeout(_TIMEOUT_SHORT)
+            )
 
             return str(response.node.alias)
         except grpc.aio._call.AioRpcError as error:
+            raise_if_deadline_exceeded(error)
             details = error.details()
 
             if "unable to find node" in details:
@@ -885,7 +1162,9 @@ This will show more debug information.
 
         try:
             request = ln.ListChannelsRequest()
-            response = await self._lnd_stub.ListChannels(request)
+            response = await self._lnd_stub.ListChannels(
+                request, timeout=call_timeout(_TIMEOUT_LIST)
+            )
 
             channels = []
             for channel_grpc in response.channels:
@@ -896,7 +1175,9 @@ This will show more debug information.
                 channels.append(channel)
 
             request = ln.PendingChannelsRequest()
-            response = await self._lnd_stub.PendingChannels(request)
+            response = await self._lnd_stub.PendingChannels(
+                request, timeout=call_timeout(_TIMEOUT_LIST)
+            )
             for channel_grpc in response.pending_open_channels:
                 channel = Channel.from_lnd_grpc_pending(channel_grpc.channel)
                 channel.peer_alias = await alias_or_empty(
@@ -907,6 +1188,7 @@ This will show more debug information.
             return channels
 
         except grpc.aio._call.AioRpcError as error:
+            raise_if_deadline_exceeded(error)
             raise HTTPException(
                 status.HTTP_500_INTERNAL_SERVER_ERROR, detail=error.details()
             )
@@ -931,10 +1213,13 @@ This will show more debug information.
                 force=force_close,
                 target_conf=6,
             )
-            async for response in self._lnd_stub.CloseChannel(request):
+            async for response in self._lnd_stub.CloseChannel(
+                request, timeout=call_timeout(_TIMEOUT_ACTION)
+            ):
                 return str(response.close_pending.txid.hex())
 
         except grpc.aio._call.AioRpcError as error:
+            raise_if_deadline_exceeded(error)
             raise HTTPException(
                 status.HTTP_500_INTERNAL_SERVER_ERROR, detail=error.details()
             )
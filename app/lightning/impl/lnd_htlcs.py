@@ -0,0 +1,141 @@
+from collections import OrderedDict
+from typing import Dict, NamedTuple, Optional, Tuple
+
+from decouple import config
+
+import app.lightning.impl.protos.lnd.router_pb2 as router
+from app.api.metrics import remove_gauge, set_gauge
+from app.lightning.models import ForwardSuccessEvent
+
+LND_HTLC_TRACKER_MAX = config("lnd_htlc_tracker_max", default=10000, cast=int)
+LND_HTLC_TRACKER_EXPIRY = config("lnd_htlc_tracker_expiry", default=86400, cast=int)
+
+GAUGE_HTLCS = "ln_htlcs_in_flight"
+GAUGE_HTLCS_MSAT = "ln_htlcs_in_flight_msat"
+
+_FORWARD = router.HtlcEvent.EventType.FORWARD
+_SEND = router.HtlcEvent.EventType.SEND
+
+
+class _Htlc(NamedTuple):
+    timestamp_ns: int
+    chan_id_in: int
+    chan_id_out: int
+    amt_in_msat: int
+    amt_out_msat: int
+
+
+class HtlcTracker:
+    """Follows the HTLCs in flight from LND's SubscribeHtlcEvents
+
+    Forwarded and sent HTLCs are tracked from their forward event until they
+    settle or fail. A settled forward is turned into a ForwardSuccessEvent.
+
+    The state is bounded. HTLCs which don't resolve within expiry seconds, by the
+    time of the latest event, are dropped, and so are the oldest ones if more
+    than max_htlcs are in flight. The number and amount of the HTLCs in flight
+    per channel are kept in the ln_htlcs_in_flight gauges of /system/metrics.
+    """
+
+    def __init__(
+        self,
+        max_htlcs: int = LND_HTLC_TRACKER_MAX,
+        expiry: int = LND_HTLC_TRACKER_EXPIRY,
+    ) -> None:
+        self._max_htlcs = max_htlcs
+        self._expiry_ns = expiry * 1_000_000_000
+        self._htlcs: OrderedDict[Tuple[int, int, int], _Htlc] = OrderedDict()
+        self._counts: Dict[int, int] = {}
+        self._amounts: Dict[int, int] = {}
+
+    def __len__(self) -> int:
+        return len(self._htlcs)
+
+    def handle(self, e) -> Optional[ForwardSuccessEvent]:
+        if e.event_type != _FORWARD and e.event_type != _SEND:
+            return None
+
+        if e.event_type == _SEND:
+            key = (_SEND, e.outgoing_channel_id, e.outgoing_htlc_id)
+        else:
+            key = (_FORWARD, e.incoming_channel_id, e.incoming_htlc_id)
+
+        kind = e.WhichOneof("event")
+        if kind == "forward_event":
+            if key not in self._htlcs:
+                info = e.forward_event.info
+                self._add(
+                    key,
+                    _Htlc(
+                        e.timestamp_ns,
+                        e.incoming_channel_id,
+                        e.outgoing_channel_id,
+                        info.incoming_amt_msat,
+                        info.outgoing_amt_msat,
+                    ),
+                )
+            self._expire(e.timestamp_ns)
+            return None
+
+        if kind not in ("settle_event", "forward_fail_event", "link_fail_event"):
+            return None
+
+        htlc = self._remove(key)
+        if htlc is None or kind != "settle_event" or e.event_type != _FORWARD:
+            return None
+
+        return ForwardSuccessEvent(
+            timestamp_ns=e.timestamp_ns,
+            chan_id_in=str(htlc.chan_id_in),
+            chan_id_out=str(htlc.chan_id_out),
+            amt_in_msat=htlc.amt_in_msat,
+            amt_out_msat=htlc.amt_out_msat,
+            fee_msat=htlc.amt_in_msat - htlc.amt_out_msat,
+        )
+
+    def clear(self) -> None:
+        for key in list(self._htlcs):
+            self._remove(key)
+
+    def _add(self, key: Tuple[int, int, int], htlc: _Htlc) -> None:
+        self._htlcs[key] = htlc
+        self._update(htlc.chan_id_in, 1, htlc.amt_in_msat)
+        self._update(htlc.chan_id_out, 1, htlc.amt_out_msat)
+
+        while len(self._htlcs) > self._max_htlcs:
+            self._remove(next(iter(self._htlcs)))
+
+    def _remove(self, key: Tuple[int, int, int]) -> Optional[_Htlc]:
+        htlc = self._htlcs.pop(key, None)
+        if htlc is not None:
+            self._update(htlc.chan_id_in, -1, -htlc.amt_in_msat)
+            self._update(htlc.chan_id_out, -1, -htlc.amt_out_msat)
+
+        return htlc
+
+    def _expire(self, now_ns: int) -> None:
+        # HTLCs are kept in the order of their forward events, oldest first
+        while self._htlcs:
+            key, htlc = next(iter(self._htlcs.items()))
+            if now_ns - htlc.timestamp_ns <= self._expiry_ns:
+                break
+
+            self._remove(key)
+
+    def _update(self, chan_id: int, count: int, amount: int) -> None:
+        if chan_id == 0:
+            return
+
+        count += self._counts.get(chan_id, 0)
+        label = str(chan_id)
+        if count <= 0:
+            self._counts.pop(chan_id, None)
+            self._amounts.pop(chan_id, None)
+            remove_gauge(GAUGE_HTLCS, label)
+            remove_gauge(GAUGE_HTLCS_MSAT, label)
+            return
+
+        self._counts[chan_id] = count
+        self._amounts[chan_id] = self._amounts.get(chan_id, 0) + amount
+        set_gauge(GAUGE_HTLCS, label, count)
+        set_gauge(GAUGE_HTLCS_MSAT, label, self._amounts[chan_id])
@@ -0,0 +1,47 @@
+import asyncio
+from typing import Any, AsyncGenerator, Awaitable, Callable, Optional, Sequence, Tuple
+
+from decouple import config
+
+LND_PAGE_SIZE = config("lnd_list_page_size", default=1000, cast=int)
+LND_PAGE_PREFETCH = config("lnd_list_page_prefetch", default=True, cast=bool)
+
+# fetch(index_offset, page_size) -> (items, index offset of the next page)
+PageFetcher = Callable[[int, int], Awaitable[Tuple[Sequence[Any], int]]]
+
+
+async def fetch_pages(
+    fetch: PageFetcher,
+    index_offset: int = 0,
+    page_size: int = LND_PAGE_SIZE,
+    prefetch: bool = LND_PAGE_PREFETCH,
+) -> AsyncGenerator[Any, None]:
+    """Yields all items of a paginated LND list call, oldest first
+
+    The list is walked in pages of page_size items starting after index_offset,
+    so no single response gets large. With prefetch, the next page is requested
+    while the items of the current one are consumed. A page with less than
+    page_size items is the last one.
+    """
+
+    pending: Optional[asyncio.Future] = asyncio.ensure_future(
+        fetch(index_offset, page_size)
+    )
+
+    try:
+        while pending is not None:
+            items, index_offset = await pending
+            pending = None
+
+            more = len(items) >= page_size
+            if more and prefetch:
+                pending = asyncio.ensure_future(fetch(index_offset, page_size))
+
+            for item in items:
+                yield item
+
+            if more and pending is None:
+                pending = asyncio.ensure_future(fetch(index_offset, page_size))
+    finally:
+        if pending is not None:
+            pending.cancel()
@@ -1,5 +1,5 @@
 import asyncio
-from typing import AsyncGenerator, List, Optional
+from typing import AsyncGenerator, Dict, List, Optional
 
 from decouple import config
 from fastapi.exceptions import HTTPException
@@ -18,6 +18,7 @@ from app.lightning.models import (
     Invoice,
     LnInfo,
     LnInitState,
+    LnNodeEvent,
     NewAddressInput,
     OnChainTransaction,
     Payment,
@@ -97,15 +98,24 @@ class LnNodeCLNgRPCBlitz(LnNodeCLNgRPC):
         index_offset: int,
         num_max_invoices: int,
         reversed: bool,
+        creation_date_start: Optional[int] = None,
+        creation_date_end: Optional[int] = None,
     ):
         self._check_if_locked()
         return await super().list_invoices(
-            pending_only, index_offset, num_max_invoices, reversed
+            pending_only,
+            index_offset,
+            num_max_invoices,
+            reversed,
+            creation_date_start,
+            creation_date_end,
         )
 
-    async def list_on_chain_tx(self) -> List[OnChainTransaction]:
+    async def list_on_chain_tx(
+        self, start_height: Optional[int] = None, end_height: Optional[int] = None
+    ) -> List[OnChainTransaction]:
         self._check_if_locked()
-        return await super().list_on_chain_tx()
+        return await super().list_on_chain_tx(start_height, end_height)
 
     async def list_payments(
         self,
@@ -113,10 +123,17 @@ class LnNodeCLNgRPCBlitz(LnNodeCLNgRPC):
         index_offset: int,
         max_payments: int,
         reversed: bool,
+        creation_date_start: Optional[int] = None,
+        creation_date_end: Optional[int] = None,
     ):
         self._check_if_locked()
         return await super().list_payments(
-            include_incomplete, index_offset, max_payments, reversed
+            include_incomplete,
+            index_offset,
+            max_payments,
+            reversed,
+            creation_date_start,
+            creation_date_end,
         )
 
     async def add_invoice(
@@ -145,6 +162,10 @@ class LnNodeCLNgRPCBlitz(LnNodeCLNgRPC):
         self._check_if_locked()
         return await super().send_coins(input)
 
+    async def send_many(self, outputs: Dict[str, int]) -> str:
+        self._check_if_locked()
+        return await super().send_many(outputs)
+
     async def send_payment(
         self,
         pay_req: str,
@@ -178,6 +199,18 @@ class LnNodeCLNgRPCBlitz(LnNodeCLNgRPC):
         async for i in super().listen_forward_events():
             yield i
 
+    async def listen_node_events(self) -> AsyncGenerator[LnNodeEvent, None]:
+        self._check_if_locked()
+        async for i in super().listen_node_events():
+            yield i
+
+    async def forwarding_history(
+        self, start_time: int
+    ) -> AsyncGenerator[ForwardSuccessEvent, None]:
+        self._check_if_locked()
+        async for i in super().forwarding_history(start_time):
+            yield i
+
     async def channel_open(
         self, local_funding_amount: int, node_URI: str, target_confs: int
     ) -> str:
@@ -1,5 +1,5 @@
 import asyncio
-from typing import AsyncGenerator, List, Optional
+from typing import AsyncGenerator, Dict, List, Optional
 
 from decouple import config
 from fastapi.exceptions import HTTPException
@@ -18,6 +18,7 @@ from app.lightning.models import (
     Invoice,
     LnInfo,
     LnInitState,
+    LnNodeEvent,
     NewAddressInput,
     OnChainTransaction,
     Payment,
@@ -99,15 +100,24 @@ class LnNodeCLNjRPCBlitz(LnNodeCLNjRPC):
         index_offset: int,
         num_max_invoices: int,
         reversed: bool,
+        creation_date_start: Optional[int] = None,
+        creation_date_end: Optional[int] = None,
     ):
         self._check_if_locked()
         return await super().list_invoices(
-            pending_only, index_offset, num_max_invoices, reversed
+            pending_only,
+            index_offset,
+            num_max_invoices,
+            reversed,
+            creation_date_start,
+            creation_date_end,
         )
 
-    async def list_on_chain_tx(self) -> List[OnChainTransaction]:
+    async def list_on_chain_tx(
+        self, start_height: Optional[int] = None, end_height: Optional[int] = None
+    ) -> List[OnChainTransaction]:
         self._check_if_locked()
-        return await super().list_on_chain_tx()
+        return await super().list_on_chain_tx(start_height, end_height)
 
     async def list_payments(
         self,
@@ -115,10 +125,17 @@ class LnNodeCLNjRPCBlitz(LnNodeCLNjRPC):
         index_offset: int,
         max_payments: int,
         reversed: bool,
+        creation_date_start: Optional[int] = None,
+        creation_date_end: Optional[int] = None,
     ):
         self._check_if_locked()
         return await super().list_payments(
-            include_incomplete, index_offset, max_payments, reversed
+            include_incomplete,
+            index_offset,
+            max_payments,
+            reversed,
+            creation_date_start,
+            creation_date_end,
         )
 
     async def add_invoice(
@@ -147,6 +164,10 @@ class LnNodeCLNjRPCBlitz(LnNodeCLNjRPC):
         self._check_if_locked()
         return await super().send_coins(input)
 
+    async def send_many(self, outputs: Dict[str, int]) -> str:
+        self._check_if_locked()
+        return await super().send_many(outputs)
+
     async def send_payment(
         self,
         pay_req: str,
@@ -181,6 +202,18 @@ class LnNodeCLNjRPCBlitz(LnNodeCLNjRPC):
         async for i in super().listen_forward_events():
             yield i
 
+    async def listen_node_events(self) -> AsyncGenerator[LnNodeEvent, None]:
+        self._check_if_locked()
+        async for i in super().listen_node_events():
+            yield i
+
+    async def forwarding_history(
+        self, start_time: int
+    ) -> AsyncGenerator[ForwardSuccessEvent, None]:
+        self._check_if_locked()
+        async for i in super().forwarding_history(start_time):
+            yield i
+
     async def channel_open(
         self,
         local_funding_amount: int,
@@ -0,0 +1,125 @@
+import asyncio
+import heapq
+import time
+from typing import Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+from app.lightning.models import Invoice, InvoiceState
+
+# Heap entries of resolved invoices are only dropped when they are due. The
+# heap is rebuilt when they make up most of it.
+_COMPACT_MIN_SIZE = 1024
+
+
+def _expires_at(i: Invoice) -> Optional[int]:
+    if i.expiry_date:
+        return i.expiry_date
+
+    # LND's AddInvoice response carries no creation date
+    if i.expiry:
+        return int(time.time()) + i.expiry
+
+    return None
+
+
+class InvoiceExpiryScheduler:
+    """Emits a status update for open invoices at the moment they expire
+
+    Open invoices are kept in a heap ordered by their expiry time, keyed by
+    payment request. A single task, run(), sleeps until the next invoice is due
+    and hands the expired invoices with state CANCELED to its callback.
+    Invoices which get settled or canceled in the meantime are discarded.
+
+    The scheduler is seeded with the open invoices of the node. Invoices
+    resolved while the seed list is fetched are remembered between
+    begin_seed() and seed(), so they aren't scheduled from the stale list.
+    """
+
+    def __init__(self) -> None:
+        self._heap: List[Tuple[int, str]] = []
+        self._invoices: Dict[str, Tuple[int, Invoice]] = {}
+        self._resolved: Optional[Set[str]] = None
+        self._changed = asyncio.Event()
+
+    def __len__(self) -> int:
+        return len(self._invoices)
+
+    def begin_seed(self) -> None:
+        self._resolved = set()
+
+    def seed(self, invoices: List[Invoice]) -> None:
+        resolved = self._resolved or set()
+        self._resolved = None
+
+        for i in invoices:
+            if i.payment_request not in resolved:
+                self.add(i)
+
+    def add(self, invoice: Invoice) -> None:
+        expires_at = _expires_at(invoice)
+        key = invoice.payment_request
+        if (
+            invoice.state != InvoiceState.OPEN
+            or not key
+            or expires_at is None
+            or key in self._invoices
+        ):
+            return
+
+        self._invoices[key] = (expires_at, invoice)
+        heapq.heappush(self._heap, (expires_at, key))
+        if self._heap[0][1] == key:
+            self._changed.set()
+
+    def discard(self, payment_request: str) -> None:
+        if self._resolved is not None:
+            self._resolved.add(payment_request)
+
+        if self._invoices.pop(payment_request, None) is None:
+            return
+
+        if len(self._heap) > _COMPACT_MIN_SIZE + 2 * len(self._invoices):
+            self._heap = [(t, k) for k, (t, _) in self._invoices.items()]
+            heapq.heapify(self._heap)
+
+    def next_expiry(self) -> Optional[int]:
+        while self._heap:
+            expires_at, key = self._heap[0]
+            entry = self._invoices.get(key)
+            if entry is not None and entry[0] == expires_at:
+                return expires_at
+
+            heapq.heappop(self._heap)
+
+        return None
+
+    def pop_expired(self, now: float) -> List[Invoice]:
+        expired = []
+        while True:
+            expires_at = self.next_expiry()
+            if expires_at is None or expires_at > now:
+                return expired
+
+            _, key = heapq.heappop(self._heap)
+            _, invoice = self._invoices.pop(key)
+            expired.append(
+                invoice.model_copy(
+                    update={"state": InvoiceState.CANCELED, "settled": False}
+                )
+            )
+
+    async def run(self, on_expired: Callable[[Invoice], Awaitable[None]]) -> None:
+        while True:
+            self._changed.clear()
+
+            timeout = None
+            expires_at = self.next_expiry()
+            if expires_at is not None:
+                timeout = max(expires_at - time.time(), 0)
+
+            try:
+                await asyncio.wait_for(self._changed.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+            for invoice in self.pop_expired(time.time()):
+                await on_expired(invoice)
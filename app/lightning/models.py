@@ -3,7 +3,6 @@ import time
 from enum import Enum
 from typing import List, Optional, Union
 
-from deepdiff import DeepDiff
 from fastapi import HTTPException
 from fastapi.param_functions import Query
 from loguru import logger
@@ -11,7 +10,12 @@ from pydantic import BaseModel, validator
 from pydantic.types import conint
 
 import app.lightning.docs as docs
-from app.lightning.impl.cln_utils import parse_cln_msat
+from app.api.utils import fingerprint
+from app.lightning.impl.cln_utils import (
+    bolt11_timestamp,
+    cln_forward_time,
+    parse_cln_msat,
+)
 
 
 class LnInitState(str, Enum):
@@ -37,6 +41,38 @@ class InitLnRepoUpdate:
         }
 
 
+class LnNodeEventType(str, Enum):
+    TRANSACTION = "transaction"
+    CHANNEL = "channel"
+    PEER = "peer"
+
+
+class LnNodeEvent:
+    # Internal notification about a change on the node which isn't covered by
+    # the invoice, payment or forward listeners.
+    # CHANNEL events carry the affected channel if the backend knows it. Without
+    # channel_id, the channel list has to be fetched again.
+    type: LnNodeEventType
+    channel_id: Optional[str]
+    channel: Optional["Channel"]
+    active: Optional[bool]
+    closed: bool
+
+    def __init__(
+        self,
+        type: LnNodeEventType,
+        channel_id: Optional[str] = None,
+        channel: Optional["Channel"] = None,
+        active: Optional[bool] = None,
+        closed: bool = False,
+    ):
+        self.type = type
+        self.channel_id = channel_id
+        self.channel = channel
+        self.active = active
+        self.closed = closed
+
+
 class OnchainAddressType(str, Enum):
     P2WKH = "p2wkh"
     NP2WKH = "np2wkh"
@@ -165,7 +201,7 @@ class ForwardSuccessEvent(BaseModel):
             "incoming HTLC that created half the circuit."
         ),
     )
-    amt_out_msat: str = Query(
+    amt_out_msat: int = Query(
         ...,
         description=(
             "The total amount (in millisatoshis) of the "
@@ -182,9 +218,9 @@ class ForwardSuccessEvent(BaseModel):
     @classmethod
     def from_lnd_grpc(cls, evt) -> "ForwardSuccessEvent":
         return cls(
-            timestamp_ns=int(evt.timestamp),
-            chan_id_in=int(evt.chan_id_in),
-            chan_id_out=int(evt.chan_id_out),
+            timestamp_ns=int(evt.timestamp_ns),
+            chan_id_in=str(evt.chan_id_in),
+            chan_id_out=str(evt.chan_id_out),
             amt_in_msat=int(evt.amt_in_msat),
             amt_out_msat=int(evt.amt_out_msat),
             fee_msat=int(evt.fee_msat),
@@ -192,19 +228,21 @@ class ForwardSuccessEvent(BaseModel):
 
     @classmethod
     def from_cln_json(cls, fwd) -> "ForwardSuccessEvent":
+        # resolved_time is in seconds with fractions
         return cls(
-            timestamp_ns=fwd["resolved_time"],
+            timestamp_ns=int(cln_forward_time(fwd) * 1e9),
             chan_id_in=fwd["in_channel"],
             chan_id_out=fwd["out_channel"],
-            amt_in_msat=fwd["in_msatoshi"],
-            amt_out_msat=fwd["out_msatoshi"],
-            fee_msat=fwd["fee"],
+            amt_in_msat=parse_cln_msat(fwd["in_msat"]),
+            amt_out_msat=parse_cln_msat(fwd["out_msat"]),
+            fee_msat=parse_cln_msat(fwd["fee_msat"]),
         )
 
     @classmethod
     def from_cln_grpc(cls, fwd) -> "ForwardSuccessEvent":
+        # resolved_time is in seconds with fractions
         return cls(
-            timestamp_ns=fwd.received_time,
+            timestamp_ns=int(cln_forward_time(fwd) * 1e9),
             chan_id_in=fwd.in_channel,
             chan_id_out=fwd.out_channel,
             amt_in_msat=fwd.in_msat.msat,
@@ -213,6 +251,65 @@ class ForwardSuccessEvent(BaseModel):
         )
 
 
+class ForwardStatsGroupBy(str, Enum):
+    CHANNEL = "channel"
+    DAY = "day"
+
+
+class ForwardStatsEntry(BaseModel):
+    group: str = Query(
+        ...,
+        description=(
+            "The channel ID or the day (YYYY-MM-DD, UTC) this entry is grouped by."
+        ),
+    )
+    num_forwards_in: int = Query(
+        ...,
+        description=(
+            "Number of forwards which entered through the channel. "
+            "When grouped by day, the number of forwards of that day."
+        ),
+    )
+    num_forwards_out: int = Query(
+        ...,
+        description=(
+            "Number of forwards which left through the channel. "
+            "When grouped by day, the number of forwards of that day."
+        ),
+    )
+    amt_in_msat: int = Query(
+        ...,
+        description="Total amount (in millisatoshis) of the incoming HTLCs.",
+    )
+    amt_out_msat: int = Query(
+        ...,
+        description="Total amount (in millisatoshis) of the outgoing HTLCs.",
+    )
+    fee_msat: int = Query(
+        ...,
+        description=(
+            "Total fees (in millisatoshis) earned. When grouped by channel, fees are "
+            "accounted to the outgoing channel."
+        ),
+    )
+
+
+class ForwardStats(BaseModel):
+    from_timestamp: Optional[int] = Query(
+        None, description="Start of the time range (unix timestamp in seconds)."
+    )
+    to_timestamp: Optional[int] = Query(
+        None,
+        description="End of the time range (unix timestamp in seconds, exclusive).",
+    )
+    group_by: ForwardStatsGroupBy = Query(
+        ..., description="How the forwards are grouped."
+    )
+    groups: List[ForwardStatsEntry] = Query(
+        [], description="The statistics for each group."
+    )
+
+
 class Feature(BaseModel):
     name: str
     is_required: Optional[bool]
@@ -286,11 +383,8 @@ class CustomRecordsEntry(BaseModel):
     value: str
 
     @classmethod
-    def from_lnd_grpc(cls, e) -> "CustomRecordsEntry":
-        return cls(
-            key=e.key,
-            value=e.value,
-        )
+    def from_lnd_grpc(cls, key, value) -> "CustomRecordsEntry":
+        return cls(key=key, value=value.hex())
 
 
 class InvoiceHTLC(BaseModel):
@@ -338,10 +432,7 @@ class InvoiceHTLC(BaseModel):
     @classmethod
     def from_lnd_grpc(cls, h) -> "InvoiceHTLC":
         def _crecords(recs):
-            record_list = []
-            for r in recs:
-                record_list.append(CustomRecordsEntry.from_lnd_grpc(r))
-            return record_list
+            return [CustomRecordsEntry.from_lnd_grpc(k, v) for k, v in recs.items()]
 
         return cls(
             chan_id=h.chan_id,
@@ -385,7 +476,7 @@ class HopHint(BaseModel):
     def from_lnd_grpc(cls, h) -> "HopHint":
         return cls(
             node_id=h.node_id,
-            chan_id=h.chan_id,
+            chan_id=str(h.chan_id),
             fee_base_msat=h.fee_base_msat,
             fee_proportional_millionths=h.fee_proportional_millionths,
             cltv_expiry_delta=h.cltv_expiry_delta,
@@ -664,6 +755,9 @@ class Invoice(BaseModel):
         None, description="Signals whether or not this is an AMP invoice."
     )
 
+    # Building the models with model_construct instead of validating them is not
+    # faster with pydantic 2, see tests/benchmarks/bench_model_conversion.py.
+
     @classmethod
     def from_lnd_grpc(cls, i) -> "Invoice":
         def _route_hints(hints):
@@ -685,7 +779,7 @@ class Invoice(BaseModel):
             expiry_date=i.creation_date + i.expiry,
             settle_date=i.settle_date,
             payment_request=i.payment_request,
-            description_hash=i.description_hash,
+            description_hash=i.description_hash.hex(),
             expiry=i.expiry,
             fallback_addr=i.fallback_addr,
             cltv_expiry=i.cltv_expiry,
@@ -713,6 +807,7 @@ class Invoice(BaseModel):
             r_hash=i["payment_hash"],
             value_msat=amt,
             settled=True if i["status"] == "paid" else False,
+            creation_date=bolt11_timestamp(i.get("bolt11")),
             expiry_date=i["expires_at"],
             settle_date=i["paid_at"] if "paid_at" in i else None,
             payment_request=i["bolt11"],
@@ -740,16 +835,38 @@ class Invoice(BaseModel):
             r_hash=i.payment_hash.hex(),
             value_msat=i.amount_msat.msat,
             settled=True if state == InvoiceState.SETTLED else False,
+            creation_date=bolt11_timestamp(i.bolt11),
             expiry_date=i.expires_at,
             settle_date=i.paid_at,
             payment_request=i.bolt11,
             settle_index=i.pay_index,
-            amt_paid_sat=i.amount_received_msat.msat / 1000,
+            amt_paid_sat=round(i.amount_received_msat.msat / 1000),
             amt_paid_msat=i.amount_received_msat.msat,
             state=state,
         )
 
 
+class AddInvoiceInput(BaseModel):
+    value_msat: int = Query(..., ge=0, description="The amount of msat of the invoice")
+    memo: str = Query("", description="The memo of the invoice")
+    expiry: int = Query(3600, description="Expiry time in seconds")
+    is_keysend: bool = Query(
+        False, description="LND only: Whether this invoice is a keysend invoice."
+    )
+
+
+class AddInvoiceResult(BaseModel):
+    invoice: Optional[Invoice] = Query(
+        None, description="The created invoice, if it could be created."
+    )
+    status_code: Optional[int] = Query(
+        None, description="The HTTP status code of the error, if any."
+    )
+    error: Optional[str] = Query(
+        None, description="Why the invoice couldn't be created, if it failed."
+    )
+
+
 class PaymentStatus(str, Enum):
     UNKNOWN = "unknown"
     IN_FLIGHT = "in_flight"
@@ -1000,7 +1117,7 @@ class Route(BaseModel):
     @classmethod
     def from_lnd_grpc(cls, r):
         def _crecords(recs):
-            return [CustomRecordsEntry.from_lnd_grpc(r) for r in recs]
+            return [CustomRecordsEntry.from_lnd_grpc(k, v) for k, v in recs.items()]
 
         def _get_hops(hops) -> List[Hop]:
             return [Hop.from_lnd_grpc(h) for h in hops]
@@ -1324,6 +1441,18 @@ class SendCoinsInput(BaseModel):
         raise ValueError("Unknown input.")
 
 
+class PayoutInput(BaseModel):
+    address: str = Query(
+        ...,
+        description=(
+            "The base58 or bech32 encoded bitcoin address to send coins to on-chain"
+        ),
+    )
+    amount: conint(gt=0) = Query(
+        ..., description="The number of bitcoin denominated in satoshis to send"
+    )
+
+
 class SendCoinsResponse(BaseModel):
     txid: str = Query(..., description="The transaction ID for this onchain payment")
     address: str = Query(
@@ -1484,8 +1613,9 @@ class LnInfo(BaseModel):
 
     def __eq__(self, other):
         if isinstance(other, self.__class__):
-            diff = DeepDiff(self, other, ignore_order=True)
-            return len(diff) == 0
+            return fingerprint(self, ignore_order=True) == fingerprint(
+                other, ignore_order=True
+            )
         else:
             return False
 
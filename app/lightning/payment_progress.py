@@ -0,0 +1,108 @@
+import asyncio
+import time
+from typing import Dict, Optional
+
+from decouple import config
+from loguru import logger
+
+from app.api.utils import (
+    SSE,
+    broadcast_sse_msg,
+    send_sse_msg_to_topics,
+    sse_has_subscribers,
+)
+from app.lightning.models import HTLCAttempt, Payment, PaymentStatus
+
+PAYMENT_PROGRESS_MIN_INTERVAL = config(
+    "payment_progress_min_interval", default=0.5, cast=float
+)
+
+
+class PaymentProgress:
+    """Publishes the progress of a single outgoing payment
+
+    Updates are conflated, at most one ln_payment_progress message is sent per
+    min_interval. A message only contains the HTLC attempts which are new or
+    changed since the previous one and goes to clients subscribed to
+    ln_payment_progress or ln_payment_progress:<payment_hash>.
+
+    The final state is sent immediately and additionally broadcast to all clients
+    as ln_payment_status with the full payment. Progress is only tracked while a
+    client is subscribed to one of the topics.
+    """
+
+    def __init__(
+        self, payment_hash: str, min_interval: float = PAYMENT_PROGRESS_MIN_INTERVAL
+    ) -> None:
+        self._topics = [
+            SSE.LN_PAYMENT_PROGRESS,
+            f"{SSE.LN_PAYMENT_PROGRESS}:{payment_hash}",
+        ]
+        self._min_interval = min_interval
+        self._sent_htlcs: Dict[int, HTLCAttempt] = {}
+        self._sent_status: Optional[PaymentStatus] = None
+        self._last_sent = 0.0
+        self._latest: Optional[Payment] = None
+        self._flush_task: Optional[asyncio.Task] = None
+
+    async def update(self, p: Payment) -> None:
+        self._latest = p
+
+        if p.status in (PaymentStatus.SUCCEEDED, PaymentStatus.FAILED):
+            if self._flush_task is not None:
+                self._flush_task.cancel()
+                self._flush_task = None
+
+            if sse_has_subscribers(self._topics):
+                await self._flush(final=True)
+
+            await broadcast_sse_msg(SSE.LN_PAYMENT_STATUS, p.model_dump())
+            return
+
+        if self._flush_task is not None or not sse_has_subscribers(self._topics):
+            # The pending flush will pick up this update
+            return
+
+        wait = self._last_sent + self._min_interval - time.monotonic()
+        if wait <= 0:
+            await self._flush()
+        else:
+            self._flush_task = asyncio.create_task(self._delayed_flush(wait))
+
+    def delta(self, p: Payment, final: bool = False) -> Optional[dict]:
+        """Returns the changes since the last sent message, None if there are none"""
+
+        htlcs = [h for h in p.htlcs if self._sent_htlcs.get(h.attempt_id) != h]
+        if len(htlcs) == 0 and p.status == self._sent_status and not final:
+            return None
+
+        return {
+            "payment_hash": p.payment_hash,
+            "status": p.status,
+            "value_msat": p.value_msat,
+            "fee_msat": p.fee_msat,
+            "failure_reason": p.failure_reason,
+            "htlcs": [h.model_dump() for h in htlcs],
+            "final": final,
+        }
+
+    async def _delayed_flush(self, wait: float) -> None:
+        await asyncio.sleep(wait)
+        self._flush_task = None
+        try:
+            await self._flush()
+        except Exception as e:
+            logger.error(f"Unable to send payment progress: {e}")
+
+    async def _flush(self, final: bool = False) -> None:
+        p = self._latest
+        d = self.delta(p, final)
+        if d is None:
+            return
+
+        for h in p.htlcs:
+            self._sent_htlcs[h.attempt_id] = h
+        self._sent_status = p.status
+        self._last_sent = time.monotonic()
+
+        await send_sse_msg_to_topics(self._topics, SSE.LN_PAYMENT_PROGRESS, d)
@@ -0,0 +1,105 @@
+import asyncio
+from typing import Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+from fastapi import HTTPException
+
+SendMany = Callable[[Dict[str, int]], Awaitable[str]]
+Payout = Tuple[str, int, asyncio.Future]
+
+
+def _is_client_error(e: Exception) -> bool:
+    return isinstance(e, HTTPException) and 400 <= e.status_code < 500
+
+
+class PayoutQueue:
+    """Collects on-chain payouts and sends them as one transaction
+
+    A batch is sent window seconds after its first payout, or as soon as it
+    holds max_payouts payouts. pay() returns the txid of the batch transaction
+    once it is sent. Payouts to the same address within a batch are combined
+    into one output.
+
+    If send_many rejects a batch with a 4xx error, e.g. because of an invalid
+    address, the batch is split in halves which are sent one after another. A
+    bad output therefore only fails its own payouts. Other errors fail every
+    payout of the batch.
+
+    Payouts whose caller is cancelled before the batch is sent are left out.
+    """
+
+    def __init__(self, send_many: SendMany, window: float, max_payouts: int) -> None:
+        self._send_many = send_many
+        self._window = window
+        self._max_payouts = max(1, max_payouts)
+        self._pending: List[Payout] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        # Keeps references to the running sends, the event loop only holds weak ones
+        self._sends: Set[asyncio.Task] = set()
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    async def pay(self, address: str, amount: int) -> str:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((address, amount, future))
+
+        if len(self._pending) >= self._max_payouts:
+            self.flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self._window, self.flush)
+
+        return await future
+
+    def flush(self) -> None:
+        """Sends the pending payouts now"""
+
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+        batch = [p for p in self._pending if not p[2].done()]
+        self._pending = []
+        if len(batch) == 0:
+            return
+
+        task = asyncio.get_running_loop().create_task(self._send(batch))
+        self._sends.add(task)
+        task.add_done_callback(self._sends.discard)
+
+    async def _send(self, batch: List[Payout]) -> None:
+        outputs: Dict[str, int] = {}
+        for address, amount, _ in batch:
+            outputs[address] = outputs.get(address, 0) + amount
+
+        try:
+            txid = await self._send_many(outputs)
+        except asyncio.CancelledError:
+            for _, _, future in batch:
+                future.cancel()
+            raise
+        except Exception as e:
+            if len(outputs) > 1 and _is_client_error(e):
+                await self._send_split(batch, list(outputs))
+                return
+
+            for _, _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for _, _, future in batch:
+            if not future.done():
+                future.set_result(txid)
+
+    async def _send_split(self, batch: List[Payout], addresses: List[str]) -> None:
+        # Payouts to the same address stay together. The halves are sent one after
+        # another, so they don't compete for the same coins.
+        first = set(addresses[: len(addresses) // 2])
+        try:
+            await self._send([p for p in batch if p[0] in first])
+            await self._send([p for p in batch if p[0] not in first])
+        except asyncio.CancelledError:
+            for _, _, future in batch:
+                future.cancel()
+            raise
@@ -1,10 +1,14 @@
 from typing import List, Optional
 
-from fastapi import APIRouter, HTTPException, Query, status
+from fastapi import APIRouter, Body, HTTPException, Query, status
 from fastapi.params import Depends
+from fastapi.responses import JSONResponse
 
+from app.api.responses import ModelListResponse
 from app.auth.auth_bearer import JWTBearer
+from app.jobs.models import Job
 from app.lightning.docs import (
+    forward_stats_desc,
     get_balance_response_desc,
     new_address_desc,
     open_channel_desc,
@@ -13,8 +17,12 @@ from app.lightning.docs import (
     unlock_wallet_desc,
 )
 from app.lightning.models import (
+    AddInvoiceInput,
+    AddInvoiceResult,
     Channel,
     FeeRevenue,
+    ForwardStats,
+    ForwardStatsGroupBy,
     GenericTx,
     Invoice,
     LightningInfoLite,
@@ -23,18 +31,24 @@ from app.lightning.models import (
     OnChainTransaction,
     Payment,
     PaymentRequest,
+    PayoutInput,
     SendCoinsInput,
     SendCoinsResponse,
     UnlockWalletInput,
     WalletBalance,
 )
 from app.lightning.service import (
+    ADD_INVOICE_BATCH_MAX,
     add_invoice,
+    add_invoices,
     channel_close,
+    channel_close_job,
     channel_list,
     channel_open,
+    channel_open_job,
     decode_pay_request,
     get_fee_revenue,
+    get_forward_stats,
     get_ln_info,
     get_ln_info_lite,
     get_wallet_balance,
@@ -44,7 +58,10 @@ from app.lightning.service import (
     list_payments,
     new_address,
     send_coins,
+    send_coins_job,
     send_payment,
+    send_payment_job,
+    send_payout_job,
     unlock_wallet,
 )
 
@@ -60,6 +77,29 @@ responses = {
     }
 }
 
+job_response = {
+    202: {
+        "description": (
+            "With `background=true`: the job which runs the operation. "
+            "Progress is sent via the `job_status` SSE event and `/jobs/{id}`."
+        ),
+        "model": Job,
+    }
+}
+
+background_query = Query(
+    False,
+    description=(
+        "Return a job immediately instead of waiting for the operation to finish."
+    ),
+)
+
+
+def _accepted(job: Job) -> JSONResponse:
+    return JSONResponse(
+        status_code=status.HTTP_202_ACCEPTED, content=job.model_dump(mode="json")
+    )
+
 
 @router.post(
     "/add-invoice",
@@ -86,6 +126,26 @@ async def addinvoice(
         raise HTTPException(status.HTTP_501_NOT_IMPLEMENTED, detail=r.args[0])
 
 
+@router.post(
+    "/add-invoices",
+    name=f"{_PREFIX}.add-invoices",
+    summary="Adds several new invoices at once.",
+    description=(
+        "Creates the invoices concurrently. The results are returned in the "
+        "order of the request. An invoice which can't be created doesn't fail "
+        "the request, its result holds the error instead. "
+        f"At most {ADD_INVOICE_BATCH_MAX} invoices are accepted per request."
+    ),
+    dependencies=[Depends(JWTBearer())],
+    response_model=List[AddInvoiceResult],
+    responses=responses,
+)
+async def add_invoices_path(
+    invoices: List[AddInvoiceInput] = Body(..., max_length=ADD_INVOICE_BATCH_MAX),
+):
+    return await add_invoices(invoices)
+
+
 @router.get(
     "/get-balance",
     name=f"{_PREFIX}.get-balance",
@@ -126,6 +186,38 @@ async def get_fee_revenue_path() -> FeeRevenue:
         raise HTTPException(status.HTTP_501_NOT_IMPLEMENTED, detail=r.args[0])
 
 
+@router.get(
+    "/forwards/stats",
+    name=f"{_PREFIX}.forwards.stats",
+    summary="Returns routing statistics of forwards grouped by channel or day.",
+    description=forward_stats_desc,
+    dependencies=[Depends(JWTBearer())],
+    response_model=ForwardStats,
+    responses=responses,
+)
+async def get_forward_stats_path(
+    from_timestamp: Optional[int] = Query(
+        None,
+        alias="from",
+        description="Only include forwards at or after this unix timestamp (seconds).",
+    ),
+    to_timestamp: Optional[int] = Query(
+        None,
+        alias="to",
+        description="Only include forwards before this unix timestamp (seconds).",
+    ),
+    group_by: ForwardStatsGroupBy = Query(
+        ForwardStatsGroupBy.CHANNEL, description="Group by channel or by day (UTC)."
+    ),
+) -> ForwardStats:
+    try:
+        return await get_forward_stats(from_timestamp, to_timestamp, group_by)
+    except HTTPException:
+        raise
+    except NotImplementedError as r:
+        raise HTTPException(status.HTTP_501_NOT_IMPLEMENTED, detail=r.args[0])
+
+
 @router.get(
     "/list-all-tx",
     name=f"{_PREFIX}.list-all-tx",
@@ -170,7 +262,8 @@ async def list_all_tx_path(
     ),
 ):
     try:
-        return await list_all_tx(successful_only, index_offset, max_tx, reversed)
+        txs = await list_all_tx(successful_only, index_offset, max_tx, reversed)
+        return ModelListResponse(txs, GenericTx)
     except HTTPException:
         raise
     except NotImplementedError as r:
@@ -215,14 +308,31 @@ async def list_invoices_path(
             "from the specified index offset. This can be used to paginate backwards."
         ),
     ),
+    creation_date_start: int | None = Query(
+        None,
+        description=(
+            "If set, only invoices created at or after this unix timestamp "
+            "(in seconds) will be returned in the response."
+        ),
+    ),
+    creation_date_end: int | None = Query(
+        None,
+        description=(
+            "If set, only invoices created at or before this unix timestamp "
+            "(in seconds) will be returned in the response."
+        ),
+    ),
 ):
     try:
-        return await list_invoices(
+        invoices = await list_invoices(
             pending_only,
             index_offset,
             num_max_invoices,
             reversed,
+            creation_date_start,
+            creation_date_end,
         )
+        return ModelListResponse(invoices, Invoice)
     except HTTPException:
         raise
     except NotImplementedError as r:
@@ -238,9 +348,26 @@ async def list_invoices_path(
     dependencies=[Depends(JWTBearer())],
     responses=responses,
 )
-async def list_on_chain_tx_path():
+async def list_on_chain_tx_path(
+    start_height: int | None = Query(
+        None,
+        description=(
+            "If set, only transactions confirmed at or above this block height "
+            "will be returned in the response."
+        ),
+    ),
+    end_height: int | None = Query(
+        None,
+        description=(
+            "If set, only transactions confirmed at or below this block height "
+            "will be returned in the response. Unconfirmed transactions are only "
+            "included if this is not set."
+        ),
+    ),
+):
     try:
-        return await list_on_chain_tx()
+        txs = await list_on_chain_tx(start_height, end_height)
+        return ModelListResponse(txs, OnChainTransaction)
     except HTTPException:
         raise
     except NotImplementedError as r:
@@ -294,11 +421,31 @@ async def list_payments_path(
             "index order)."
         ),
     ),
+    creation_date_start: int | None = Query(
+        None,
+        description=(
+            "If set, only payments created at or after this unix timestamp "
+            "(in seconds) will be returned in the response."
+        ),
+    ),
+    creation_date_end: int | None = Query(
+        None,
+        description=(
+            "If set, only payments created at or before this unix timestamp "
+            "(in seconds) will be returned in the response."
+        ),
+    ),
 ):
     try:
-        return await list_payments(
-            include_incomplete, index_offset, max_payments, reversed
+        payments = await list_payments(
+            include_incomplete,
+            index_offset,
+            max_payments,
+            reversed,
+            creation_date_start,
+            creation_date_end,
         )
+        return ModelListResponse(payments, Payment)
     except HTTPException:
         raise
     except NotImplementedError as r:
@@ -335,10 +482,14 @@ async def new_address_path(input: NewAddressInput):
     responses={
         412: {"description": "When not enough funds are available."},
         423: responses[423],
+        **job_response,
     },
 )
-async def send_coins_path(input: SendCoinsInput):
+async def send_coins_path(input: SendCoinsInput, background: bool = background_query):
     try:
+        if background:
+            return _accepted(send_coins_job(input=input))
+
         return await send_coins(input=input)
     except HTTPException:
         raise
@@ -346,6 +497,31 @@ async def send_coins_path(input: SendCoinsInput):
         raise HTTPException(status.HTTP_501_NOT_IMPLEMENTED, detail=r.args[0])
 
 
+@router.post(
+    "/send-payout",
+    name=f"{_PREFIX}.send-payout",
+    summary="Queue an on-chain payout to be sent together with others.",
+    description=(
+        "Payouts are collected and sent as a single transaction, to save fees. "
+        "A batch is sent once its first payout waited for `payout_batch_window` "
+        "seconds or `payout_batch_max` payouts are queued. Returns a job "
+        "immediately. Its result is a SendCoinsResponse with the txid of the "
+        "batch transaction, sent via the `job_status` SSE event and "
+        "`/jobs/{id}`. Payouts below `payout_min_amount` sat or to an invalid "
+        "address are rejected right away."
+    ),
+    dependencies=[Depends(JWTBearer())],
+    status_code=status.HTTP_202_ACCEPTED,
+    response_model=Job,
+    responses={
+        400: {"description": "When the amount or the address is invalid."},
+        423: responses[423],
+    },
+)
+async def send_payout_path(input: PayoutInput):
+    return _accepted(await send_payout_job(input=input))
+
+
 @router.post(
     "/open-channel",
     name=f"{_PREFIX}.open-channel",
@@ -357,12 +533,21 @@ async def send_coins_path(input: SendCoinsInput):
         412: {"description": "When not enough funds are available."},
         423: responses[423],
         504: {"description": "When the peer is not reachable."},
+        **job_response,
     },
 )
 async def open_channel_path(
-    local_funding_amount: int, node_URI: str, target_confs: int = 3
+    local_funding_amount: int,
+    node_URI: str,
+    target_confs: int = 3,
+    background: bool = background_query,
 ):
     try:
+        if background:
+            return _accepted(
+                channel_open_job(local_funding_amount, node_URI, target_confs)
+            )
+
         return await channel_open(local_funding_amount, node_URI, target_confs)
     except HTTPException:
         raise
@@ -399,10 +584,15 @@ async def list_channels_path():
     description="For additional information see [LND docs](https://api.lightning.community/#closechannel)",
     dependencies=[Depends(JWTBearer())],
     response_model=str,
-    responses=responses,
+    responses={**responses, **job_response},
 )
-async def close_channel_path(channel_id: str, force_close: bool):
+async def close_channel_path(
+    channel_id: str, force_close: bool, background: bool = background_query
+):
     try:
+        if background:
+            return _accepted(channel_close_job(channel_id, force_close))
+
         return await channel_close(channel_id, force_close)
     except HTTPException:
         raise
@@ -437,6 +627,7 @@ async def close_channel_path(channel_id: str, force_close: bool):
             ),
         },
         423: responses[423],
+        **job_response,
     },
 )
 async def sendpayment(
@@ -444,8 +635,14 @@ async def sendpayment(
     timeout_seconds: int = 5,
     fee_limit_msat: int = 8000,
     amount_msat: Optional[int] = None,
+    background: bool = background_query,
 ):
     try:
+        if background:
+            return _accepted(
+                send_payment_job(pay_req, timeout_seconds, fee_limit_msat, amount_msat)
+            )
+
         return await send_payment(pay_req, timeout_seconds, fee_limit_msat, amount_msat)
     except HTTPException:
         raise
@@ -1,27 +1,51 @@
 import asyncio
-from typing import AsyncGenerator, List, Optional
+import time
+from typing import AsyncGenerator, Dict, List, Optional
 
 from decouple import config
 from fastapi import status
 from fastapi.exceptions import HTTPException
 from loguru import logger
 
-from app.api.utils import SSE, broadcast_sse_msg, redis_get
+from app.api.deadlines import clear_request_deadline
+from app.api.utils import (
+    SSE,
+    ChangeDetector,
+    broadcast_sse_msg,
+    redis_get,
+    sse_has_subscribers,
+)
+from app.bitcoind.service import register_new_block_listener, validate_address
+from app.jobs.models import Job
+from app.jobs.service import submit_job
+from app.lightning.channel_table import ChannelTable
+from app.lightning.forward_store import ForwardStore
+from app.lightning.invoice_expiry import InvoiceExpiryScheduler
 from app.lightning.models import (
+    AddInvoiceInput,
+    AddInvoiceResult,
     Channel,
     FeeRevenue,
+    ForwardStats,
+    ForwardStatsGroupBy,
     GenericTx,
     InitLnRepoUpdate,
     Invoice,
+    InvoiceState,
     LightningInfoLite,
     LnInfo,
+    LnNodeEvent,
+    LnNodeEventType,
     NewAddressInput,
     OnChainTransaction,
     Payment,
     PaymentRequest,
+    PayoutInput,
     SendCoinsInput,
     SendCoinsResponse,
 )
+from app.lightning.payout_queue import PayoutQueue
+from app.lightning.utils import alias_or_empty
 from app.system.models import APIPlatform
 
 PLATFORM = config("platform", cast=str)
@@ -52,7 +76,22 @@ else:
 
 GATHER_INFO_INTERVALL = config("gather_ln_info_interval", default=2, cast=float)
 
-_CACHE = {"wallet_balance": None}
+GATHER_INFO_SAFETY_INTERVAL = config(
+    "gather_ln_info_safety_interval", default=30.0, cast=float
+)
+
+# Gives a burst of node events time to settle before LnInfo is fetched again
+_LN_INFO_SETTLE_DELAY = 1.0
+
+_CACHE = {"wallet_balance": None, "wallet_balance_time": 0.0}
+
+WALLET_BALANCE_COALESCE_INTERVAL = config(
+    "wallet_balance_coalesce_interval", default=0.3, cast=float
+)
+
+WALLET_BALANCE_CACHE_MAX_AGE = config(
+    "wallet_balance_cache_max_age", default=60.0, cast=float
+)
 
 ENABLE_FWD_NOTIFICATIONS = config(
     "sse_notify_forward_successes", default=False, cast=bool
@@ -64,6 +103,31 @@ FWD_GATHER_INTERVAL = config("forwards_gather_interval", default=2.0, cast=float
 if FWD_GATHER_INTERVAL < 0.3:
     raise RuntimeError("forwards_gather_interval cannot be less than 0.3 seconds")
 
+# Invoices of a batch created at the same time and the largest batch accepted
+ADD_INVOICE_CONCURRENCY = config("add_invoice_concurrency", default=8, cast=int)
+ADD_INVOICE_BATCH_MAX = config("add_invoice_batch_max", default=1000, cast=int)
+
+# Payouts are sent together once the first one waited this long (in seconds),
+# or once this many are queued
+PAYOUT_BATCH_WINDOW = config("payout_batch_window", default=60.0, cast=float)
+PAYOUT_BATCH_MAX = config("payout_batch_max", default=20, cast=int)
+PAYOUT_MIN_AMOUNT = config("payout_min_amount", default=546, cast=int)
+
+CHANNEL_TABLE_REFRESH_INTERVAL = config(
+    "channel_table_refresh_interval", default=10.0, cast=float
+)
+
+# Gives a burst of balance changes time to settle before channels are listed again
+_CHANNEL_TABLE_SETTLE_DELAY = 1.0
+
+channel_table = ChannelTable()
+
+FORWARD_STORE_PATH = config("forward_store_path", default="~/.blitz_api/forwards")
+
+forward_store = ForwardStore(FORWARD_STORE_PATH)
+
+invoice_expiry = InvoiceExpiryScheduler()
+
 if ln_node != "none":
     ln = LnNode()
 
@@ -79,7 +143,17 @@ async def get_ln_info_lite() -> LightningInfoLite:
 
 
 async def get_wallet_balance():
-    return await ln.get_wallet_balance()
+    if _wallet_balance_fetch is not None and not _wallet_balance_fetch.done():
+        # The node is being asked for a new balance already, wait for that call
+        # instead of serving the old balance or making another one
+        return await asyncio.shield(_wallet_balance_fetch)
+
+    wb = _CACHE["wallet_balance"]
+    age = time.monotonic() - _CACHE["wallet_balance_time"]
+    if _listeners_registered and wb is not None and age < WALLET_BALANCE_CACHE_MAX_AGE:
+        return wb
+
+    return await _refresh_wallet_balance()
 
 
 async def list_all_tx(
@@ -89,32 +163,87 @@ async def list_all_tx(
 
 
 async def list_invoices(
-    pending_only: bool, index_offset: int, num_max_invoices: int, reversed: bool
+    pending_only: bool,
+    index_offset: int,
+    num_max_invoices: int,
+    reversed: bool,
+    creation_date_start: Optional[int] = None,
+    creation_date_end: Optional[int] = None,
 ) -> List[Invoice]:
     return await ln.list_invoices(
         pending_only,
         index_offset,
         num_max_invoices,
         reversed,
+        creation_date_start,
+        creation_date_end,
     )
 
 
-async def list_on_chain_tx() -> List[OnChainTransaction]:
-    return await ln.list_on_chain_tx()
+async def list_on_chain_tx(
+    start_height: Optional[int] = None, end_height: Optional[int] = None
+) -> List[OnChainTransaction]:
+    return await ln.list_on_chain_tx(start_height, end_height)
 
 
 async def list_payments(
-    include_incomplete: bool, index_offset: int, max_payments: int, reversed: bool
+    include_incomplete: bool,
+    index_offset: int,
+    max_payments: int,
+    reversed: bool,
+    creation_date_start: Optional[int] = None,
+    creation_date_end: Optional[int] = None,
 ) -> List[Payment]:
     return await ln.list_payments(
-        include_incomplete, index_offset, max_payments, reversed
+        include_incomplete,
+        index_offset,
+        max_payments,
+        reversed,
+        creation_date_start,
+        creation_date_end,
     )
 
 
 async def add_invoice(
-    value_msat: int, memo: str = "", expiry: int = 3600, is_keysend: bool = False
+    memo: str, value_msat: int, expiry: int = 3600, is_keysend: bool = False
 ) -> Invoice:
-    return await ln.add_invoice(memo, value_msat, expiry, is_keysend)
+    invoice = await ln.add_invoice(value_msat, memo, expiry, is_keysend)
+    invoice_expiry.add(invoice)
+    return invoice
+
+
+async def add_invoices(inputs: List[AddInvoiceInput]) -> List[AddInvoiceResult]:
+    """Creates the invoices concurrently, at most ADD_INVOICE_CONCURRENCY at a time
+
+    A failing invoice doesn't fail the batch, its error is returned in place of
+    the invoice instead.
+    """
+
+    sem = asyncio.Semaphore(ADD_INVOICE_CONCURRENCY)
+
+    async def _add(i: AddInvoiceInput) -> AddInvoiceResult:
+        async with sem:
+            try:
+                invoice = await add_invoice(
+                    i.memo, i.value_msat, i.expiry, i.is_keysend
+                )
+            except HTTPException as e:
+                return AddInvoiceResult(status_code=e.status_code, error=e.detail)
+            except NotImplementedError as e:
+                return AddInvoiceResult(
+                    status_code=status.HTTP_501_NOT_IMPLEMENTED, error=e.args[0]
+                )
+
+            if invoice is None:
+                # The backend logged an unexpected error
+                return AddInvoiceResult(
+                    status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                    error="Unknown error",
+                )
+
+            return AddInvoiceResult(invoice=invoice)
+
+    return await asyncio.gather(*[_add(i) for i in inputs])
 
 
 async def decode_pay_request(pay_req: str) -> PaymentRequest:
@@ -131,6 +260,62 @@ async def send_coins(input: SendCoinsInput) -> SendCoinsResponse:
     return res
 
 
+def send_coins_job(input: SendCoinsInput) -> Job:
+    return submit_job("send_coins", lambda: send_coins(input))
+
+
+async def _send_payout_batch(outputs: Dict[str, int]) -> str:
+    # Runs in the batch task, not bound to the request which started the batch
+    clear_request_deadline()
+
+    txid = await ln.send_many(outputs)
+    if txid is None:
+        # The backend logged an unexpected error
+        raise HTTPException(
+            status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Unknown error"
+        )
+
+    logger.info(f"Sent {len(outputs)} payouts in transaction {txid}")
+    _schedule_wallet_balance_update()
+    return txid
+
+
+payout_queue = PayoutQueue(_send_payout_batch, PAYOUT_BATCH_WINDOW, PAYOUT_BATCH_MAX)
+
+
+async def _validate_payout(input: PayoutInput) -> None:
+    # An invalid payout would fail the whole batch it is sent with. The queue can
+    # isolate it, but that costs additional attempts for the other payouts.
+    if input.amount < PAYOUT_MIN_AMOUNT:
+        raise HTTPException(
+            status.HTTP_400_BAD_REQUEST,
+            detail=f"Payouts must be at least {PAYOUT_MIN_AMOUNT} sat",
+        )
+
+    try:
+        valid = await validate_address(input.address)
+    except HTTPException as e:
+        logger.warning(f"Unable to validate payout address {input.address}: {e.detail}")
+        return
+
+    if not valid:
+        raise HTTPException(
+            status.HTTP_400_BAD_REQUEST,
+            detail=f"Invalid bitcoin address: {input.address}",
+        )
+
+
+async def send_payout(input: PayoutInput) -> SendCoinsResponse:
+    txid = await payout_queue.pay(input.address, input.amount)
+    return SendCoinsResponse(txid=txid, address=input.address, amount=input.amount)
+
+
+async def send_payout_job(input: PayoutInput) -> Job:
+    # Invalid payouts are rejected with the request, before a job is created
+    await _validate_payout(input)
+    return submit_job("send_payout", lambda: send_payout(input))
+
+
 async def send_payment(
     pay_req: str,
     timeout_seconds: int,
@@ -139,12 +324,23 @@ async def send_payment(
 ) -> Payment:
     res = await ln.send_payment(pay_req, timeout_seconds, fee_limit_msat, amount_msat)
     _schedule_wallet_balance_update()
+    _schedule_channel_balances_update()
     return res
 
 
-async def channel_open(
-    local_funding_amount: int, node_URI: str, target_confs: int
-) -> str:
+def send_payment_job(
+    pay_req: str,
+    timeout_seconds: int,
+    fee_limit_msat: int,
+    amount_msat: Optional[int] = None,
+) -> Job:
+    return submit_job(
+        "send_payment",
+        lambda: send_payment(pay_req, timeout_seconds, fee_limit_msat, amount_msat),
+    )
+
+
+def _validate_channel_open(local_funding_amount: int, node_URI: str, target_confs: int):
     if local_funding_amount < 1:
         raise ValueError("funding amount needs to be positive")
 
@@ -157,20 +353,48 @@ async def channel_open(
     if "@" not in node_URI:
         raise ValueError("node_URI must contain @ with node physical address")
 
+
+async def channel_open(
+    local_funding_amount: int, node_URI: str, target_confs: int
+) -> str:
+    _validate_channel_open(local_funding_amount, node_URI, target_confs)
+
     res = await ln.channel_open(local_funding_amount, node_URI, target_confs)
+    _schedule_wallet_balance_update()
+    _invalidate_channel_table()
     return res
 
 
+def channel_open_job(
+    local_funding_amount: int, node_URI: str, target_confs: int
+) -> Job:
+    # Invalid input is rejected right away instead of failing the job
+    _validate_channel_open(local_funding_amount, node_URI, target_confs)
+
+    return submit_job(
+        "channel_open",
+        lambda: channel_open(local_funding_amount, node_URI, target_confs),
+    )
+
+
 async def channel_list() -> List[Channel]:
-    res = await ln.channel_list()
-    return res
+    if not _listeners_registered or not channel_table.valid:
+        await _refresh_channel_table()
+
+    return channel_table.channels()
 
 
 async def channel_close(channel_id: int, force_close: bool) -> str:
     res = await ln.channel_close(channel_id, force_close)
+    _schedule_wallet_balance_update()
+    _invalidate_channel_table()
     return res
 
 
+def channel_close_job(channel_id: int, force_close: bool) -> Job:
+    return submit_job("channel_close", lambda: channel_close(channel_id, force_close))
+
+
 async def get_ln_info() -> LnInfo:
     ln_info = await ln.get_ln_info()
     if PLATFORM == APIPlatform.RASPIBLITZ:
@@ -187,6 +411,26 @@ async def get_fee_revenue() -> FeeRevenue:
     return await ln.get_fee_revenue()
 
 
+async def get_forward_stats(
+    from_timestamp: Optional[int],
+    to_timestamp: Optional[int],
+    group_by: ForwardStatsGroupBy,
+) -> ForwardStats:
+    def _to_ns(t: Optional[int]) -> Optional[int]:
+        return None if t is None else t * 1_000_000_000
+
+    groups = await forward_store.stats(
+        _to_ns(from_timestamp), _to_ns(to_timestamp), group_by
+    )
+
+    return ForwardStats(
+        from_timestamp=from_timestamp,
+        to_timestamp=to_timestamp,
+        group_by=group_by,
+        groups=groups,
+    )
+
+
 async def register_lightning_listener():
     """
     Registers all lightning listeners
@@ -208,34 +452,231 @@ async def register_lightning_listener():
         loop = asyncio.get_event_loop()
         loop.create_task(_handle_info_listener())
         loop.create_task(_handle_invoice_listener())
+        _start_invoice_expiry()
         loop.create_task(_handle_forward_event_listener())
+        loop.create_task(_handle_node_event_listener())
+        loop.create_task(_handle_channel_table_refresher())
+
+        global _listeners_registered
+        if not _listeners_registered:
+            register_new_block_listener(_handle_new_block)
+            _listeners_registered = True
     except NotImplementedError as r:
         raise HTTPException(status.HTTP_501_NOT_IMPLEMENTED, detail=r.args[0])
 
 
 async def _handle_info_listener():
-    last_info = None
-    last_info_lite = None
+    info_changes = ChangeDetector(ignore_order=True)
+    info_lite_changes = ChangeDetector()
     while True:
+        # Events arriving while fetching must trigger another round
+        _ln_info_invalidated.clear()
         info = await ln.get_ln_info()
 
-        if last_info != info:
+        changed = info_changes.update(info)
+        if len(changed) > 0:
+            logger.trace(f"LnInfo changed: {changed}")
             await broadcast_sse_msg(SSE.LN_INFO, info.model_dump())
-            last_info = info
 
         info_lite = LightningInfoLite.from_lninfo(info)
 
-        if last_info_lite != info_lite:
+        if len(info_lite_changes.update(info_lite)) > 0:
             await broadcast_sse_msg(SSE.LN_INFO_LITE, info_lite.model_dump())
-            last_info_lite = info_lite
 
-        await asyncio.sleep(GATHER_INFO_INTERVALL)
+        if not _node_events_active:
+            await asyncio.sleep(GATHER_INFO_INTERVALL)
+            continue
+
+        try:
+            await asyncio.wait_for(
+                _ln_info_invalidated.wait(), GATHER_INFO_SAFETY_INTERVAL
+            )
+            await asyncio.sleep(_LN_INFO_SETTLE_DELAY)
+        except asyncio.TimeoutError:
+            pass
 
 
 async def _handle_invoice_listener():
     async for i in ln.listen_invoices():
+        if i.state == InvoiceState.OPEN:
+            invoice_expiry.add(i)
+        elif i.payment_request:
+            invoice_expiry.discard(i.payment_request)
+
         await broadcast_sse_msg(SSE.LN_INVOICE_STATUS, i.model_dump())
-        _schedule_wallet_balance_update()
+        if i.state == InvoiceState.SETTLED:
+            _schedule_wallet_balance_update()
+            _schedule_channel_balances_update()
+
+
+_invoice_expiry_task: Optional[asyncio.Task] = None
+
+
+def _start_invoice_expiry():
+    global _invoice_expiry_task
+    if _invoice_expiry_task is None or _invoice_expiry_task.done():
+        _invoice_expiry_task = asyncio.get_event_loop().create_task(
+            _handle_invoice_expiry()
+        )
+
+
+async def _handle_invoice_expiry():
+    clear_request_deadline()
+    invoice_expiry.begin_seed()
+    try:
+        invoice_expiry.seed(await ln.list_invoices(True, 0, 0, False) or [])
+    except HTTPException as e:
+        # Invoices added from now on are still scheduled
+        invoice_expiry.seed([])
+        logger.error(f"Unable to list open invoices for expiry: {e.detail}")
+
+    async def _on_expired(invoice: Invoice):
+        await broadcast_sse_msg(SSE.LN_INVOICE_STATUS, invoice.model_dump())
+
+    await invoice_expiry.run(_on_expired)
+
+
+_node_events_active = False
+_ln_info_invalidated = asyncio.Event()
+
+
+async def _handle_node_event_listener():
+    global _node_events_active
+    _node_events_active = True
+    try:
+        async for e in ln.listen_node_events():
+            _ln_info_invalidated.set()
+            if e.type in (LnNodeEventType.TRANSACTION, LnNodeEventType.CHANNEL):
+                _schedule_wallet_balance_update()
+
+            if e.type == LnNodeEventType.CHANNEL:
+                await _apply_channel_event(e)
+    except NotImplementedError:
+        logger.info(
+            "Backend has no node event subscription, lightning info is polled and "
+            "wallet balance relies on invoices, payments, forwards and blocks"
+        )
+    except HTTPException as e:
+        logger.error(f"Node event subscription failed, polling instead: {e.detail}")
+    finally:
+        # Wake up the info listener so it falls back to regular polling
+        _node_events_active = False
+        _ln_info_invalidated.set()
+
+
+async def _handle_new_block(block: dict):
+    # Updates block height and sync state in LnInfo. Confirmations move funds
+    # between unconfirmed and confirmed balance.
+    _ln_info_invalidated.set()
+    _schedule_wallet_balance_update()
+    if not _node_events_active:
+        # Channels confirm with new blocks
+        _channel_table_dirty.set()
+
+
+_channel_table_dirty = asyncio.Event()
+_channel_table_lock = asyncio.Lock()
+
+
+def _invalidate_channel_table():
+    channel_table.invalidate()
+    _channel_table_dirty.set()
+
+
+async def _refresh_channel_table():
+    async with _channel_table_lock:
+        channels = await ln.channel_list()
+        changed, removed = channel_table.replace(channels)
+
+    await _broadcast_channel_changes(changed, removed)
+
+
+async def _broadcast_channel_changes(changed: List[Channel], removed: List[str]):
+    if len(changed) == 0 and len(removed) == 0 or not sse_has_subscribers():
+        return
+
+    await broadcast_sse_msg(
+        SSE.LN_CHANNEL_CHANGES,
+        {"changed": [c.model_dump() for c in changed], "removed": removed},
+    )
+
+
+async def _apply_channel_event(e: LnNodeEvent):
+    if e.channel_id is None:
+        # The backend couldn't tell which channel changed
+        _channel_table_dirty.set()
+        return
+
+    if e.channel is not None:
+        pubkey = e.channel.peer_publickey
+        if channel_table.alias(pubkey) is None:
+            try:
+                e.channel.peer_alias = await alias_or_empty(
+                    ln.peer_resolve_alias, pubkey
+                )
+            except HTTPException as r:
+                logger.warning(f"Unable to resolve alias of {pubkey}: {r.detail}")
+
+        changes = channel_table.upsert(e.channel)
+    elif e.closed:
+        changes = channel_table.remove(e.channel_id)
+    elif e.active is not None:
+        changes = channel_table.set_active(e.channel_id, e.active)
+    else:
+        return
+
+    await _broadcast_channel_changes(*changes)
+
+
+_channel_table_refreshed_at = 0.0
+_channel_balances_timer: Optional[asyncio.TimerHandle] = None
+
+
+def _schedule_channel_balances_update():
+    """Refreshes the channel list for changed channel balances
+
+    Balances change with every payment, settled invoice and forward. Polling
+    already picks them up, with node events the channel list is refreshed for
+    them at most once per channel_table_refresh_interval.
+    """
+
+    def _mark_dirty():
+        global _channel_balances_timer
+        _channel_balances_timer = None
+        _channel_table_dirty.set()
+
+    global _channel_balances_timer
+    if not _node_events_active or _channel_balances_timer is not None:
+        return
+
+    next_refresh = _channel_table_refreshed_at + CHANNEL_TABLE_REFRESH_INTERVAL
+    _channel_balances_timer = asyncio.get_event_loop().call_later(
+        max(next_refresh - time.monotonic(), 0), _mark_dirty
+    )
+
+
+async def _handle_channel_table_refresher():
+    global _channel_table_refreshed_at
+    clear_request_deadline()
+    while True:
+        _channel_table_dirty.clear()
+        try:
+            await _refresh_channel_table()
+        except HTTPException as e:
+            logger.error(f"Unable to refresh the channel list: {e.detail}")
+            channel_table.invalidate()
+
+        _channel_table_refreshed_at = time.monotonic()
+
+        interval = CHANNEL_TABLE_REFRESH_INTERVAL
+        if _node_events_active:
+            interval = GATHER_INFO_SAFETY_INTERVAL
+
+        try:
+            await asyncio.wait_for(_channel_table_dirty.wait(), interval)
+            await asyncio.sleep(_CHANNEL_TABLE_SETTLE_DELAY)
+        except asyncio.TimeoutError:
+            pass
 
 
 _fwd_update_scheduled = False
@@ -251,18 +692,26 @@ async def _handle_forward_event_listener():
 
         await asyncio.sleep(FWD_GATHER_INTERVAL)
 
+        await forward_store.flush()
+
         if len(_fwd_successes) > 0:
             sending_successes = _fwd_successes
             _fwd_successes = []
             await broadcast_sse_msg(SSE.LN_FORWARD_SUCCESSES, sending_successes)
 
         _schedule_wallet_balance_update()
+        _schedule_channel_balances_update()
         rev = await get_fee_revenue()
         await broadcast_sse_msg(SSE.LN_FEE_REVENUE, rev.model_dump())
 
         _fwd_update_scheduled = False
 
+    loop = asyncio.get_event_loop()
+    loop.create_task(_backfill_forward_store())
+
     async for i in ln.listen_forward_events():
+        forward_store.add([i])
+
         if ENABLE_FWD_NOTIFICATIONS:
             _fwd_successes.append(i.model_dump())
 
@@ -271,22 +720,73 @@ async def _handle_forward_event_listener():
             loop.create_task(_schedule_fwd_update())
 
 
-_wallet_balance_update_scheduled = False
+async def _backfill_forward_store():
+    try:
+        await forward_store.backfill(ln.forwarding_history)
+    except NotImplementedError:
+        logger.info("Backend can't list its forwarding history, skipping backfill")
+    except HTTPException as e:
+        logger.error(f"Unable to backfill the forward store: {e.detail}")
 
 
-def _schedule_wallet_balance_update():
-    async def _perform_update():
-        global _wallet_balance_update_scheduled
-        _wallet_balance_update_scheduled = True
-        await asyncio.sleep(1.1)
+_listeners_registered = False
+_wallet_balance_invalidated = False
+_wallet_balance_refresh: Optional[asyncio.Task] = None
+_wallet_balance_fetch: Optional[asyncio.Task] = None
+
+
+async def _refresh_wallet_balance():
+    """Gets the wallet balance from the node and updates the cache
+
+    Concurrent callers share a single call to the node.
+    """
+
+    async def _fetch():
+        clear_request_deadline()
+
         wb = await ln.get_wallet_balance()
-        if _CACHE["wallet_balance"] != wb:
+        changed = _CACHE["wallet_balance"] != wb
+        _CACHE["wallet_balance"] = wb
+        _CACHE["wallet_balance_time"] = time.monotonic()
+
+        if changed:
             await broadcast_sse_msg(SSE.WALLET_BALANCE, wb.model_dump())
-            _CACHE["wallet_balance"] = wb
 
-        _wallet_balance_update_scheduled = False
+        return wb
+
+    global _wallet_balance_fetch
+    if _wallet_balance_fetch is None or _wallet_balance_fetch.done():
+        loop = asyncio.get_event_loop()
+        _wallet_balance_fetch = loop.create_task(_fetch())
+
+    return await asyncio.shield(_wallet_balance_fetch)
+
+
+def _schedule_wallet_balance_update():
+    """Marks the cached wallet balance as outdated
+
+    Events arriving while a refresh is pending are coalesced, a burst of settled
+    invoices results in a single call to the node.
+    """
 
-    global _wallet_balance_update_scheduled
-    if not _wallet_balance_update_scheduled:
+    async def _perform_updates():
+        global _wallet_balance_invalidated
+        clear_request_deadline()
+        while _wallet_balance_invalidated:
+            await asyncio.sleep(WALLET_BALANCE_COALESCE_INTERVAL)
+            _wallet_balance_invalidated = False
+            try:
+                await _refresh_wallet_balance()
+            except HTTPException as e:
+                logger.error(f"Unable to refresh the wallet balance: {e.detail}")
+                _CACHE["wallet_balance"] = None
+            except Exception as e:
+                logger.exception(f"Unable to refresh the wallet balance: {e}")
+                _CACHE["wallet_balance"] = None
+
+    global _wallet_balance_invalidated
+    global _wallet_balance_refresh
+    _wallet_balance_invalidated = True
+    if _wallet_balance_refresh is None or _wallet_balance_refresh.done():
         loop = asyncio.get_event_loop()
-        loop.create_task(_perform_update())
+        _wallet_balance_refresh = loop.create_task(_perform_updates())
@@ -1,11 +1,29 @@
+import asyncio
+from collections import deque
+from typing import Any, List, Optional
+
 import grpc
 from fastapi import HTTPException, status
 from loguru import logger
 
+from app.api.utils import load_persisted_state, save_persisted_state
 from app.lightning.exceptions import NodeNotFoundError
 
+# Seconds the invoice cursor is saved after an invoice update
+_CURSOR_SAVE_DELAY = 5
+
+
+def raise_if_deadline_exceeded(error: grpc.aio._call.AioRpcError):
+    if error.code() == grpc.StatusCode.DEADLINE_EXCEEDED:
+        raise HTTPException(
+            status.HTTP_504_GATEWAY_TIMEOUT,
+            detail="The lightning node didn't respond in time",
+        )
+
 
 def generic_grpc_error_handler(error: grpc.aio._call.AioRpcError):
+    raise_if_deadline_exceeded(error)
+
     details = error.details()
     logger.debug(details)
 
@@ -29,3 +47,117 @@ async def alias_or_empty(func, node_pub: str) -> str:
         logger.debug(f"NodeNotFoundError for node_pub={node_pub}")
 
         return ""
+
+
+def in_range(value: Optional[int], start: Optional[int], end: Optional[int]) -> bool:
+    """Checks start <= value <= end, a missing bound isn't checked"""
+
+    if start is not None and (value is None or value < start):
+        return False
+
+    if end is not None and (value is None or value > end):
+        return False
+
+    return True
+
+
+class PageCollector:
+    """Collects one page of a list which is filtered while it is read
+
+    Selects the same items as slicing the complete filtered list with
+    [index_offset : index_offset + max_items] would, after reversing it if
+    reversed is set. max_items 0 or None selects all items.
+
+    Items must be added oldest first. Without reversed, done is True as soon as
+    the page is complete and the caller can stop reading. With reversed, the list
+    must be read to the end, but only the newest index_offset + max_items items
+    are kept.
+    """
+
+    def __init__(self, index_offset: int, max_items: Optional[int], reversed: bool):
+        self._max = max_items or 0
+        self._offset = index_offset if self._max > 0 else 0
+        self._reversed = reversed
+
+        size = self._offset + self._max if self._max > 0 else None
+        self._items = deque(maxlen=size if reversed else None)
+
+    @property
+    def done(self) -> bool:
+        if self._reversed or self._max == 0:
+            return False
+
+        return len(self._items) >= self._offset + self._max
+
+    @property
+    def limit(self) -> Optional[int]:
+        """Number of items which need to be read, if known in advance"""
+
+        if self._reversed or self._max == 0:
+            return None
+
+        return self._offset + self._max
+
+    def add(self, item: Any) -> None:
+        self._items.append(item)
+
+    def page(self) -> List[Any]:
+        items = list(self._items)
+        if self._reversed:
+            items.reverse()
+
+        if self._max == 0:
+            return items
+
+        return items[self._offset : self._offset + self._max]
+
+
+class InvoiceCursor:
+    """Persists the position of an invoice subscription
+
+    The position is stored under key together with the pubkey of the node it
+    belongs to. A position of another node, e.g. after the node was replaced,
+    is ignored on load.
+
+    Saving after each invoice update is debounced. If the API stops before a
+    save, the subscription resumes at an older position and the node sends the
+    invoices updated since then again.
+    """
+
+    def __init__(self, name: str, node_id: str, key: str = "lastpay_index") -> None:
+        self._name = name
+        self._node_id = node_id
+        self._key = key
+        self._position: Any = None
+        self._save_task: Optional[asyncio.Task] = None
+
+    async def load(self) -> Any:
+        """Returns the stored position, or None if it has to be rescanned"""
+
+        state = await load_persisted_state(self._name)
+        if state is None or self._key not in state:
+            return None
+
+        if state.get("node_id") != self._node_id:
+            logger.info("Stored invoice cursor belongs to another node, rescanning")
+            return None
+
+        self._position = state[self._key]
+        return self._position
+
+    def save_soon(self, position: Any) -> None:
+        self._position = position
+        if self._save_task is None:
+            loop = asyncio.get_running_loop()
+            self._save_task = loop.create_task(self._save_later())
+
+    async def save(self, position: Any) -> None:
+        self._position = position
+        await save_persisted_state(
+            self._name, {"node_id": self._node_id, self._key: self._position}
+        )
+
+    async def _save_later(self) -> None:
+        await asyncio.sleep(_CURSOR_SAVE_DELAY)
+        self._save_task = None
+        await self.save(self._position)
@@ -3,7 +3,7 @@ import sys
 from contextlib import asynccontextmanager
 
 from decouple import config as dconfig
-from fastapi import FastAPI, Request
+from fastapi import FastAPI, Query, Request
 from fastapi.encoders import jsonable_encoder
 from fastapi.exceptions import HTTPException
 from fastapi_plugins import (
@@ -18,6 +18,8 @@ from starlette import status
 from starlette.middleware.cors import CORSMiddleware
 from starlette.responses import RedirectResponse
 
+from app.api.cpu_pool import shutdown_cpu_pool
+from app.api.deadlines import RequestDeadlineMiddleware, clear_request_deadline
 from app.api.models import ApiStartupStatus, StartupState
 from app.api.utils import SSE, broadcast_sse_msg, build_sse_event, sse_mgr
 from app.api.warmup import (
@@ -38,6 +40,7 @@ from app.bitcoind.service import (
     register_bitcoin_status_gatherer,
     register_bitcoin_zmq_sub,
 )
+from app.jobs.router import router as jobs_router
 from app.lightning.models import LnInitState
 from app.lightning.router import router as ln_router
 from app.lightning.service import initialize_ln_repo, register_lightning_listener
@@ -98,6 +101,7 @@ async def lifespan(app: FastAPI):
     # cleanup
     await redis_plugin.terminate()
     remove_local_cookie()
+    shutdown_cpu_pool()
 
 
 app = FastAPI(lifespan=lifespan)
@@ -106,6 +110,7 @@ app.include_router(bitcoin_router)
 if node_type != "none":
     app.include_router(ln_router)
 app.include_router(system_router)
+app.include_router(jobs_router)
 if setup_router is not None:
     app.include_router(setup_router)
 
@@ -122,6 +127,17 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Server-sent event streams stay open, they must not run into the request deadline
+app.add_middleware(
+    RequestDeadlineMiddleware,
+    exclude_paths=[
+        "/sse/subscribe",
+        "/apps/status-sub",
+        "/bitcoin/block-sub",
+        "/system/hardware-info-sub",
+    ],
+)
+
 
 api_startup_status = ApiStartupStatus()
 
@@ -238,7 +254,17 @@ def _send_sse_event(id, event, data):
     "/sse/subscribe",
     status_code=status.HTTP_200_OK,
 )
-async def stream(request: Request):
+async def stream(
+    request: Request,
+    topics: str | None = Query(
+        None,
+        description=(
+            "Comma separated list of additional topics to receive, e.g. "
+            "`ln_payment_progress` for all payments or "
+            "`ln_payment_progress:<payment_hash>` for a single payment."
+        ),
+    ),
+):
     token = request.cookies.get("access_token")
     if not token:
         # No token in cookies found, try to get it from the Authorization header
@@ -259,7 +285,8 @@ async def stream(request: Request):
             detail="Invalid authorization code.",
         )
 
-    event_source, id = sse_mgr.add_connection(request)
+    topic_list = [t.strip() for t in topics.split(",") if t.strip()] if topics else []
+    event_source, id = sse_mgr.add_connection(request, topic_list)
     new_connections.append(id)
 
     await _send_sse_event(
@@ -281,6 +308,9 @@ async def warmup_new_connections():
     # when the startup state changes. Especially the hardware info
     # is rather data intensive. This is OK for now, to keep the code simple.
 
+    # Runs in the background, detached from the request which started it
+    clear_request_deadline()
+
     async def _handle(id, event, res):
         if isinstance(res, BaseModel):
             return await _send_sse_event(id, event, res.model_dump())
@@ -3,6 +3,8 @@ from typing import Optional
 from fastapi import APIRouter, HTTPException, Request, Response, status
 from fastapi.params import Depends, Query
 
+from app.api.metrics import get_metrics
+from app.api.models import ApiMetrics
 from app.api.utils import SSE
 from app.auth.auth_bearer import JWTBearer
 from app.auth.auth_handler import sign_jwt
@@ -17,8 +19,8 @@ from app.system.models import (
     ConnectionInfo,
     LoginInput,
     RawDebugLogData,
-    SystemInfo,
     SystemHealthInfo,
+    SystemInfo,
 )
 from app.system.service import (
     HW_INFO_YIELD_TIME,
@@ -176,6 +178,21 @@ async def get_system_health(
     return await system_health(verbose)
 
 
+@router.get(
+    "/metrics",
+    name=f"{_PREFIX}.metrics",
+    summary="Returns internal metrics of the API",
+    description=(
+        "Timings of the CPU-heavy processing stages and the current values "
+        "of the gauges kept by the API."
+    ),
+    response_model=ApiMetrics,
+    dependencies=[Depends(JWTBearer())],
+)
+async def get_metrics_path() -> ApiMetrics:
+    return get_metrics()
+
+
 @router.post(
     "/reboot",
     name=f"{_PREFIX}.reboot",
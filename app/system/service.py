@@ -3,8 +3,9 @@ from typing import Dict, Optional
 
 from decouple import config
 from fastapi import HTTPException, Request, status
+from loguru import logger
 
-from app.api.utils import SSE, broadcast_sse_msg
+from app.api.utils import SSE, ChangeDetector, broadcast_sse_msg
 from app.system.models import (
     APIPlatform,
     ConnectionInfo,
@@ -107,12 +108,13 @@ async def get_debug_logs_raw() -> RawDebugLogData:
 
 
 async def _handle_gather_hardware_info():
-    last_info = {}
+    info_changes = ChangeDetector()
     while True:
         info = await get_hardware_info()
-        if last_info != info:
+        changed = info_changes.update(info)
+        if len(changed) > 0:
+            logger.trace(f"Hardware info changed: {changed}")
             await broadcast_sse_msg(SSE.HARDWARE_INFO, info)
-            last_info = info
 
         await asyncio.sleep(HW_INFO_YIELD_TIME)
 
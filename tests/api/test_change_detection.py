@@ -0,0 +1,18 @@
+from app.api.utils import ChangeDetector, fingerprint
+
+
+def test_change_detector_reports_changed_fields():
+    detector = ChangeDetector()
+
+    assert detector.update({"a": 1, "b": {"x": [1, 2]}}) == ["a", "b"]
+    assert detector.update({"b": {"x": [1, 2]}, "a": 1}) == []
+    assert detector.update({"a": 2, "b": {"x": [1, 2]}}) == ["a"]
+    assert detector.update({"a": 2}) == ["b"]
+
+
+def test_fingerprint_ignore_order():
+    a = {"uris": ["x", "y"], "chains": [{"chain": "bitcoin", "network": "main"}]}
+    b = {"uris": ["y", "x"], "chains": [{"network": "main", "chain": "bitcoin"}]}
+
+    assert fingerprint(a) != fingerprint(b)
+    assert fingerprint(a, ignore_order=True) == fingerprint(b, ignore_order=True)
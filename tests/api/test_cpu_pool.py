@@ -0,0 +1,57 @@
+import pytest
+
+import app.lightning.impl.protos.lnd.lightning_pb2 as ln
+from app.api.cpu_pool import run_cpu_bound, shutdown_cpu_pool
+from app.api.metrics import get_metrics
+from app.lightning.impl.generic_txs import lnd_generic_txs, pack_messages
+
+
+def _lnd_data():
+    invoices = [
+        ln.Invoice(memo=f"i{i}", value_msat=1000, creation_date=i, state=0)
+        for i in range(0, 30, 3)
+    ]
+    transactions = [
+        ln.Transaction(tx_hash=f"{i:064x}", amount=5000, time_stamp=i)
+        for i in range(1, 30, 3)
+    ]
+    payments = [
+        ln.Payment(payment_request=f"lnbc{i}", value_msat=2000, creation_date=i)
+        for i in range(2, 30, 3)
+    ]
+    return invoices, transactions, payments
+
+
+@pytest.mark.asyncio
+async def test_offloaded_run_matches_inline():
+    invoices, transactions, payments = _lnd_data()
+    comments = {"lnbc17": "comment"}
+
+    async def _run(offload: bool):
+        return await run_cpu_bound(
+            "test_list_all_tx",
+            offload,
+            lnd_generic_txs,
+            pack_messages(invoices, offload),
+            pack_messages(transactions, offload),
+            pack_messages(payments, offload),
+            comments,
+            5,
+            10,
+            True,
+        )
+
+    try:
+        inline = await _run(False)
+        offloaded = await _run(True)
+    finally:
+        shutdown_cpu_pool()
+
+    assert offloaded == inline
+    assert [t.time_stamp for t in inline] == list(range(24, 14, -1))
+    assert [t.index for t in inline] == list(range(5, 15))
+    assert next(t for t in inline if t.id == "lnbc17").comment == "comment"
+
+    timing = get_metrics().stages["test_list_all_tx"]
+    assert timing.count == 2
+    assert timing.offloaded == 1
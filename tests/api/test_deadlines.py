@@ -0,0 +1,52 @@
+import asyncio
+import time
+
+import pytest
+from fastapi import HTTPException
+
+import app.api.deadlines as deadlines
+
+
+def test_call_timeout_without_request():
+    assert deadlines.call_timeout(20) == 20
+    assert deadlines.call_timeout(None) is None
+
+
+def test_call_timeout_is_capped_by_request_deadline():
+    token = deadlines._deadline.set(time.monotonic() + 5)
+    try:
+        assert deadlines.call_timeout(20) <= 5
+        assert deadlines.call_timeout(1) == 1
+    finally:
+        deadlines._deadline.reset(token)
+
+    token = deadlines._deadline.set(time.monotonic() - 1)
+    try:
+        with pytest.raises(HTTPException) as e:
+            deadlines.call_timeout(20)
+
+        assert e.value.status_code == 504
+    finally:
+        deadlines._deadline.reset(token)
+
+
+@pytest.mark.asyncio
+async def test_middleware_skips_excluded_paths():
+    seen = {}
+
+    async def _app(scope, receive, send):
+        seen[scope["path"]] = deadlines._deadline.get()
+
+    middleware = deadlines.RequestDeadlineMiddleware(
+        _app, exclude_paths=["/sse/subscribe"]
+    )
+
+    async def _receive():
+        await asyncio.sleep(10)
+
+    for path in ("/sse/subscribe", "/lightning/get-balance"):
+        scope = {"type": "http", "path": path, "headers": []}
+        await middleware(scope, _receive, None)
+
+    assert seen["/sse/subscribe"] is None
+    assert seen["/lightning/get-balance"] is not None
@@ -0,0 +1,52 @@
+from typing import List
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.api.responses import ModelListResponse
+from app.lightning.models import Invoice, OnChainTransaction
+from tests.models.utils import lnd_invoice
+
+
+def test_model_list_response_matches_response_model():
+    lnd_inv = lnd_invoice()
+    lnd_inv.memo = 'ünïcode "quoted"\n\x01 ⚡'
+    invoices = [Invoice.from_lnd_grpc(lnd_inv) for _ in range(3)]
+    txs = [
+        OnChainTransaction(
+            tx_hash="ab" * 32,
+            amount=-2000,
+            num_confirmations=1,
+            block_height=100,
+            time_stamp=1700000000,
+            total_fees=300,
+            dest_addresses=["bc1q"],
+            label="",
+        )
+    ]
+
+    app = FastAPI()
+
+    @app.get("/invoices", response_model=List[Invoice])
+    def _invoices():
+        return invoices
+
+    @app.get("/invoices-bytes", response_model=List[Invoice])
+    def _invoices_bytes():
+        return ModelListResponse(invoices, Invoice)
+
+    @app.get("/txs", response_model=List[OnChainTransaction])
+    def _txs():
+        return txs
+
+    @app.get("/txs-bytes", response_model=List[OnChainTransaction])
+    def _txs_bytes():
+        return ModelListResponse(txs, OnChainTransaction)
+
+    client = TestClient(app)
+    for path in ("/invoices", "/txs"):
+        expected = client.get(path)
+        response = client.get(f"{path}-bytes")
+
+        assert response.content == expected.content
+        assert response.headers["content-type"] == expected.headers["content-type"]
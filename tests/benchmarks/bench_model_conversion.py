@@ -0,0 +1,89 @@
+"""Times building the invoice models with and without pydantic validation
+
+The converters call the model classes, e.g. Invoice(**kwargs), which validates
+every field. The alternative is model_construct, which skips validation. Both
+are timed with the exact keyword arguments the converters pass for LND gRPC
+and CLN JSON invoices, including the nested models.
+
+Run with: python -m tests.benchmarks.bench_model_conversion [count]
+"""
+
+import sys
+import timeit
+from contextlib import contextmanager
+
+from app.lightning.models import (
+    Amp,
+    CustomRecordsEntry,
+    Feature,
+    FeaturesEntry,
+    HopHint,
+    Invoice,
+    InvoiceHTLC,
+    RouteHint,
+)
+from tests.models.utils import cln_invoice, lnd_invoice
+
+_MODELS = (
+    Amp,
+    CustomRecordsEntry,
+    Feature,
+    FeaturesEntry,
+    HopHint,
+    Invoice,
+    InvoiceHTLC,
+    RouteHint,
+)
+
+
+@contextmanager
+def _recording(calls: list):
+    """Records the (model, kwargs) of every model the converters build"""
+
+    def _init(self, **kwargs):
+        calls.append((type(self), kwargs))
+        super(type(self), self).__init__(**kwargs)
+
+    for m in _MODELS:
+        m.__init__ = _init
+
+    try:
+        yield
+    finally:
+        for m in _MODELS:
+            del m.__init__
+
+
+def _time(f) -> float:
+    return min(timeit.repeat(f, number=1, repeat=5))
+
+
+def main(count: int) -> None:
+    cases = (
+        ("lnd_grpc", Invoice.from_lnd_grpc, [lnd_invoice() for _ in range(count)]),
+        ("cln_json", Invoice.from_cln_json, [cln_invoice() for _ in range(count)]),
+    )
+
+    for name, convert, invoices in cases:
+        calls = []
+        with _recording(calls):
+            for i in invoices:
+                convert(i)
+
+        def _validate():
+            return [m(**kwargs) for m, kwargs in calls]
+
+        def _construct():
+            return [m.model_construct(**kwargs) for m, kwargs in calls]
+
+        validate = _time(_validate)
+        construct = _time(_construct)
+        print(
+            f"{name}: {validate * 1000:8.1f} ms with Model(**kwargs), "
+            f"{construct * 1000:8.1f} ms with model_construct "
+            f"for {count} invoices ({len(calls)} models)"
+        )
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 10000)
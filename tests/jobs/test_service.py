@@ -0,0 +1,58 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+import app.jobs.service as jobs
+from app.jobs.models import JobStatus
+
+
+async def _wait(job_id: str):
+    while jobs.get_job(job_id).status == JobStatus.RUNNING:
+        await asyncio.sleep(0.01)
+
+    return jobs.get_job(job_id)
+
+
+@pytest.mark.asyncio
+async def test_job_result_and_error():
+    async def _ok():
+        return "txid"
+
+    async def _fail():
+        raise HTTPException(412, detail="not enough funds")
+
+    ok = await _wait(jobs.submit_job("send_coins", _ok).id)
+    assert ok.status == JobStatus.SUCCEEDED
+    assert ok.result == "txid"
+
+    failed = await _wait(jobs.submit_job("send_coins", _fail).id)
+    assert failed.status == JobStatus.FAILED
+    assert failed.error.status_code == 412
+    assert failed.error.detail == "not enough funds"
+
+
+@pytest.mark.asyncio
+async def test_finished_jobs_are_bounded(monkeypatch):
+    monkeypatch.setattr(jobs, "MAX_FINISHED_JOBS", 2)
+
+    async def _ok():
+        return None
+
+    ids = [jobs.submit_job("send_payment", _ok).id for _ in range(4)]
+    for id in ids[-2:]:
+        await _wait(id)
+
+    known = [j.id for j in jobs.list_jobs()]
+    assert ids[0] not in known
+    assert ids[-1] in known
+
+
+@pytest.mark.asyncio
+async def test_job_not_implemented_without_message():
+    async def _unsupported():
+        raise NotImplementedError()
+
+    failed = await _wait(jobs.submit_job("send_coins", _unsupported).id)
+    assert failed.status == JobStatus.FAILED
+    assert failed.error.status_code == 501
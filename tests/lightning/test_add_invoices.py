@@ -0,0 +1,59 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException, status
+
+import app.lightning.service as service
+from app.lightning.models import AddInvoiceInput, Invoice, InvoiceState
+
+
+class _FakeNode:
+    def __init__(self):
+        self.running = 0
+        self.max_running = 0
+
+    async def add_invoice(self, value_msat, memo, expiry, is_keysend):
+        self.running += 1
+        self.max_running = max(self.max_running, self.running)
+        await asyncio.sleep(0.01)
+        self.running -= 1
+
+        if memo == "fail":
+            raise HTTPException(status.HTTP_500_INTERNAL_SERVER_ERROR, detail="no")
+
+        return Invoice(
+            memo=memo,
+            value_msat=value_msat,
+            payment_request=f"lnbc{value_msat}",
+            add_index=memo,
+            state=InvoiceState.OPEN,
+        )
+
+
+@pytest.mark.asyncio
+async def test_add_invoices(monkeypatch):
+    node = _FakeNode()
+    monkeypatch.setattr(service, "ln", node)
+    monkeypatch.setattr(service, "ADD_INVOICE_CONCURRENCY", 3)
+
+    inputs = [
+        AddInvoiceInput(value_msat=i, memo="fail" if i == 4 else str(i))
+        for i in range(10)
+    ]
+    res = await service.add_invoices(inputs)
+
+    assert node.max_running == 3
+    assert [r.invoice.value_msat for r in res if r.invoice] == [
+        0,
+        1,
+        2,
+        3,
+        5,
+        6,
+        7,
+        8,
+        9,
+    ]
+    assert res[4].invoice is None
+    assert res[4].status_code == 500
+    assert res[4].error == "no"
@@ -0,0 +1,43 @@
+from app.lightning.channel_table import ChannelTable
+from app.lightning.models import Channel
+
+
+def _channel(channel_id: str, balance_local: int, active: bool = True) -> Channel:
+    return Channel(
+        channel_id=channel_id,
+        active=active,
+        peer_publickey=f"pub_{channel_id}",
+        peer_alias=f"alias_{channel_id}",
+        balance_local=balance_local,
+        balance_remote=100 - balance_local,
+        balance_capacity=100,
+    )
+
+
+def test_channel_table_diff():
+    table = ChannelTable()
+    changed, removed = table.replace([_channel("a", 10), _channel("b", 20)])
+    assert [c.channel_id for c in changed] == ["a", "b"]
+    assert removed == []
+
+    changed, removed = table.replace([_channel("a", 10), _channel("c", 30)])
+    assert [c.channel_id for c in changed] == ["c"]
+    assert removed == ["b"]
+
+    changed, _ = table.set_active("a", False)
+    assert changed[0].active is False
+    assert table.set_active("a", False) == ([], [])
+
+    assert table.remove("c") == ([], ["c"])
+    assert [c.channel_id for c in table.channels()] == ["a"]
+
+
+def test_channel_table_keeps_aliases():
+    table = ChannelTable()
+    table.replace([_channel("a", 10)])
+
+    c = _channel("a", 50)
+    c.peer_alias = "n/a"
+    changed, _ = table.upsert(c)
+    assert changed[0].peer_alias == "alias_a"
+    assert changed[0].balance_local == 50
@@ -0,0 +1,85 @@
+from app.lightning.impl.cln_onchain import OnChainTxTable
+from app.lightning.impl.cln_utils import CLN_LIST_FILTERS
+
+
+def _income(tag: str, txid: str, timestamp: int, msat: int) -> dict:
+    return {
+        "account": "wallet",
+        "tag": tag,
+        "credit_msat": msat if tag == "deposit" else 0,
+        "debit_msat": msat if tag != "deposit" else 0,
+        "outpoint": f"{txid}:0",
+        "txid": txid,
+        "timestamp": timestamp,
+    }
+
+
+def _event(tag: str, txid: str, timestamp: int, blockheight: int) -> dict:
+    return {
+        "account": "wallet",
+        "type": "chain",
+        "tag": tag,
+        "outpoint": f"{txid}:1",
+        "txid": txid,
+        "timestamp": timestamp,
+        "blockheight": blockheight,
+    }
+
+
+def test_onchain_table_joins_events():
+    table = OnChainTxTable()
+    table.block_height = 110
+
+    table.add_income_event(_income("deposit", "a", 10, 5000_000))
+    table.add_income_event(_income("withdrawal", "b", 20, 2000_000))
+    table.add_income_event(_income("onchain_fee", "b", 20, 300_000))
+    table.add_account_event(_event("deposit", "a", 10, 100))
+
+    txs = {t.tx_hash: t for t in table.transactions()}
+    assert txs["a"].amount == 5000
+    assert txs["a"].block_height == 100
+    assert txs["a"].num_confirmations == 10
+    assert txs["b"].amount == -2000
+    assert txs["b"].total_fees == 300
+    assert txs["b"].block_height == 0
+    assert table.income_time == 20
+
+    # Events at the boundary are fetched again, nothing changes
+    table.add_income_event(_income("withdrawal", "b", 20, 2000_000))
+    table.add_account_event(_event("withdrawal", "b", 30, 105))
+    table.block_height = 111
+
+    txs = {t.tx_hash: t for t in table.transactions()}
+    assert len(txs) == 2
+    assert txs["b"].total_fees == 300
+    assert txs["b"].num_confirmations == 6
+
+    assert [t.tx_hash for t in table.transactions(start_height=101)] == ["b"]
+    assert [t.tx_hash for t in table.transactions(end_height=100)] == ["a"]
+
+
+def _filtered(method: str, key: str, e: dict) -> dict:
+    # What CLN returns when it applies our response filter
+    fields = CLN_LIST_FILTERS[method][key][0]
+    return {k: v for k, v in e.items() if k in fields}
+
+
+def test_onchain_table_with_filtered_events():
+    table = OnChainTxTable()
+    table.block_height = 110
+
+    for e in (
+        _income("deposit", "a", 10, 5000_000),
+        _income("withdrawal", "b", 20, 2000_000),
+        _income("onchain_fee", "b", 20, 300_000),
+    ):
+        table.add_income_event(_filtered("bkpr-listincome", "income_events", e))
+
+    for e in (_event("deposit", "a", 10, 100), _event("withdrawal", "b", 20, 105)):
+        table.add_account_event(_filtered("bkpr-listaccountevents", "events", e))
+
+    txs = {t.tx_hash: t for t in table.transactions()}
+    assert txs["a"].block_height == 100
+    assert txs["b"].block_height == 105
+    assert txs["b"].total_fees == 300
+    assert table.events_time == 20
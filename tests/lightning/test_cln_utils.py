@@ -0,0 +1,71 @@
+import time
+
+import app.lightning.impl.protos.cln.node_pb2 as ln
+from app.lightning.impl.cln_utils import (
+    FeeRevenueAggregator,
+    bolt11_timestamp,
+    cln_forward_time,
+)
+
+
+def _fwd(age_seconds: float, fee_msat: int) -> dict:
+    return {"resolved_time": time.time() - age_seconds, "fee_msat": fee_msat}
+
+
+def test_fee_revenue_aggregator_windows():
+    agg = FeeRevenueAggregator()
+    agg.add_forwards(
+        [
+            _fwd(60, 1),  # 1 minute
+            _fwd(3 * 86400, 10),  # 3 days
+            _fwd(20 * 86400, 100),  # 20 days
+            _fwd(200 * 86400, 1000),  # 200 days
+            _fwd(400 * 86400, 10000),  # 400 days
+        ]
+    )
+
+    assert agg.num_forwards == 5
+    assert agg.classify() == (1, 11, 111, 1111, 11111)
+
+
+def test_fee_revenue_aggregator_persistence():
+    agg = FeeRevenueAggregator()
+    agg.add_forwards([_fwd(60, 5), _fwd(10 * 86400, 7)])
+    agg.next_updated_index = 3
+
+    restored = FeeRevenueAggregator.from_dict(agg.to_dict())
+    assert restored.num_forwards == 2
+    assert restored.next_updated_index == 3
+    assert restored.classify() == agg.classify()
+
+    restored.add_forwards([_fwd(0, 3)])
+    assert restored.classify() == (8, 8, 15, 15, 15)
+
+
+def test_fee_revenue_aggregator_invalid_state():
+    agg = FeeRevenueAggregator.from_dict({"total": "abc"})
+    assert agg.num_forwards == 0
+    assert agg.classify() == (0, 0, 0, 0, 0)
+
+
+def test_forward_time_prefers_resolved_time():
+    assert cln_forward_time({"received_time": 1.0, "resolved_time": 2.0}) == 2.0
+    assert cln_forward_time({"received_time": 1.0}) == 1.0
+
+    fwd = ln.ListforwardsForwards(received_time=1.0)
+    assert cln_forward_time(fwd) == 1.0
+
+
+def test_bolt11_timestamp():
+    # Example invoice of BOLT #11
+    bolt11 = (
+        "lnbc2500u1pvjluezpp5qqqsyqcyq5rqwzqfqqqsyqcyq5rqwzqfqqqsyqcyq5rqwzqfqypq"
+        "dq5xysxxatsyp3k7enxv4jsxqzpuaztrnwngzn3kdzw5hydlzf03qdgm2hdq27cqv3agm2awh"
+        "z5se903vruatfhq77w3ls4evs3ch9zw97j25emudupq63nyw24cg27h2rspfj9srp"
+    )
+    assert bolt11_timestamp(bolt11) == 1496314658
+    assert bolt11_timestamp(bolt11.upper()) == 1496314658
+
+    assert bolt11_timestamp(None) is None
+    assert bolt11_timestamp("") is None
+    assert bolt11_timestamp("lnbc210n1") is None
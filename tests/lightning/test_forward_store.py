@@ -0,0 +1,70 @@
+import pytest
+
+from app.lightning.forward_store import ForwardStore
+from app.lightning.models import ForwardStatsGroupBy, ForwardSuccessEvent
+
+_DAY_NS = 86400 * 1_000_000_000
+
+
+def _fwd(ts_ns: int, chan_in: str, chan_out: str, amt: int, fee: int):
+    return ForwardSuccessEvent(
+        timestamp_ns=ts_ns,
+        chan_id_in=chan_in,
+        chan_id_out=chan_out,
+        amt_in_msat=amt + fee,
+        amt_out_msat=amt,
+        fee_msat=fee,
+    )
+
+
+@pytest.mark.asyncio
+async def test_forward_store_backfill_and_stats(tmp_path):
+    history = [
+        _fwd(1 * _DAY_NS, "a", "b", 1000, 1),
+        _fwd(1 * _DAY_NS + 5, "b", "c", 2000, 2),
+        _fwd(2 * _DAY_NS, "a", "c", 3000, 3),
+    ]
+
+    async def _history(start_time: int):
+        for f in history:
+            yield f
+
+    store = ForwardStore(str(tmp_path))
+
+    # live forwards arriving before backfilling finished must not be counted twice
+    store.add([history[-1]])
+    await store.backfill(_history)
+    store.add([_fwd(3 * _DAY_NS, "c", "a", 4000, 4)])
+    assert store.count == 3
+    await store.flush()
+    assert store.count == 4
+
+    stats = await store.stats(None, None, ForwardStatsGroupBy.CHANNEL)
+    by_chan = {s.group: s for s in stats}
+    assert by_chan["a"].num_forwards_in == 2
+    assert by_chan["a"].num_forwards_out == 1
+    assert by_chan["c"].fee_msat == 5
+    assert by_chan["c"].amt_in_msat == 4004
+
+    by_day = await store.stats(2 * _DAY_NS, None, ForwardStatsGroupBy.DAY)
+    assert [s.group for s in by_day] == ["1970-01-03", "1970-01-04"]
+    assert [s.fee_msat for s in by_day] == [3, 4]
+
+    # data survives reopening the store
+    reopened = ForwardStore(str(tmp_path))
+    reopened.open()
+    assert reopened.count == 4
+    assert reopened.last_timestamp_ns == 3 * _DAY_NS
+
+
+@pytest.mark.asyncio
+async def test_forward_store_grows(tmp_path):
+    store = ForwardStore(str(tmp_path))
+    store.open()
+    store._backfilled = True
+    store.add([_fwd(i + 1, "a", "b", 1, 1) for i in range(5000)])
+    await store.flush()
+
+    stats = await store.stats(None, None, ForwardStatsGroupBy.CHANNEL)
+    assert store.count == 5000
+    assert stats[1].fee_msat == 5000
@@ -0,0 +1,37 @@
+import asyncio
+
+import pytest
+
+import app.lightning.utils as utils
+from app.lightning.utils import InvoiceCursor
+
+
+@pytest.mark.asyncio
+async def test_invoice_cursor(monkeypatch, tmp_path):
+    monkeypatch.setenv("HOME", str(tmp_path))
+    monkeypatch.setattr(utils, "_CURSOR_SAVE_DELAY", 0.01)
+
+    cursor = InvoiceCursor("cursor", "node_a")
+    assert await cursor.load() is None
+
+    # saves are debounced, only the latest index is written
+    cursor.save_soon(1)
+    cursor.save_soon(2)
+    assert await InvoiceCursor("cursor", "node_a").load() is None
+    await asyncio.sleep(0.05)
+    assert await InvoiceCursor("cursor", "node_a").load() == 2
+
+    # the cursor of another node is ignored
+    assert await InvoiceCursor("cursor", "node_b").load() is None
+
+
+@pytest.mark.asyncio
+async def test_invoice_cursor_with_several_indexes(monkeypatch, tmp_path):
+    monkeypatch.setenv("HOME", str(tmp_path))
+
+    cursor = InvoiceCursor("cursor", "node_a", key="indexes")
+    await cursor.save({"add_index": 3, "settle_index": 2})
+
+    loaded = await InvoiceCursor("cursor", "node_a", key="indexes").load()
+    assert loaded == {"add_index": 3, "settle_index": 2}
+    assert await InvoiceCursor("cursor", "node_a").load() is None
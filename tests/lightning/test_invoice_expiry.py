@@ -0,0 +1,66 @@
+import asyncio
+import time
+
+import pytest
+
+from app.lightning.invoice_expiry import InvoiceExpiryScheduler
+from app.lightning.models import Invoice, InvoiceState
+
+
+def _invoice(n: int, expiry_date: int, state=InvoiceState.OPEN) -> Invoice:
+    return Invoice(
+        payment_request=f"lnbc{n}",
+        value_msat=1000,
+        expiry_date=expiry_date,
+        add_index=str(n),
+        state=state,
+    )
+
+
+def test_pop_expired_in_order():
+    s = InvoiceExpiryScheduler()
+    s.add(_invoice(1, 30))
+    s.add(_invoice(2, 10))
+    s.add(_invoice(3, 20))
+    s.add(_invoice(4, 5, InvoiceState.SETTLED))
+    s.discard("lnbc3")
+
+    assert s.next_expiry() == 10
+    assert s.pop_expired(25) == [
+        _invoice(2, 10).model_copy(update={"state": InvoiceState.CANCELED})
+    ]
+    assert [i.payment_request for i in s.pop_expired(30)] == ["lnbc1"]
+    assert len(s) == 0
+    assert s.next_expiry() is None
+
+
+def test_seed_skips_invoices_resolved_meanwhile():
+    s = InvoiceExpiryScheduler()
+    s.begin_seed()
+    s.discard("lnbc1")
+    s.seed([_invoice(1, 10), _invoice(2, 10)])
+
+    assert [i.payment_request for i in s.pop_expired(10)] == ["lnbc2"]
+
+
+@pytest.mark.asyncio
+async def test_run_emits_at_expiry():
+    s = InvoiceExpiryScheduler()
+    expired = []
+
+    async def _on_expired(i: Invoice):
+        expired.append(i.payment_request)
+
+    task = asyncio.create_task(s.run(_on_expired))
+    try:
+        s.add(_invoice(1, int(time.time()) + 3600))
+        await asyncio.sleep(0)
+        s.add(_invoice(2, int(time.time()) - 1))
+        await asyncio.sleep(0.05)
+
+        assert expired == ["lnbc2"]
+        assert len(s) == 1
+    finally:
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
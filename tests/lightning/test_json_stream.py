@@ -0,0 +1,87 @@
+import asyncio
+import json
+
+import pytest
+
+from app.lightning.impl.cln_jrpc_pool import CLNConnectionPool, CLNRPCError
+from app.lightning.impl.json_stream import JSONArrayStream, JSONFrameReader
+
+
+def _chunks(data: bytes, size: int):
+    return [data[i : i + size] for i in range(0, len(data), size)]
+
+
+def test_frame_reader_split_chunks():
+    responses = [
+        {"jsonrpc": "2.0", "id": 1, "result": {"text": 'a "quoted"\n\nvalue'}},
+        {"jsonrpc": "2.0", "id": 2, "result": {"list": [1, 2, 3]}},
+    ]
+    data = b"".join(json.dumps(r).encode() + b"\n\n" for r in responses)
+
+    for size in (1, 2, 7, len(data)):
+        reader = JSONFrameReader()
+        docs = []
+        for c in _chunks(data, size):
+            docs += reader.feed(c)
+
+        assert docs == responses
+
+
+def test_array_stream_elements():
+    invoices = [{"label": f"inv {i}", "description": 'x"}]\\'} for i in range(5)]
+    response = {
+        "jsonrpc": "2.0",
+        "id": 1,
+        "result": {"other": [{"a": 1}], "invoices": invoices, "after": True},
+    }
+    data = json.dumps(response).encode() + b"\n\n"
+
+    for size in (1, 3, 16, len(data)):
+        stream = JSONArrayStream("invoices")
+        elements = []
+        for c in _chunks(data, size):
+            elements += stream.feed(c)
+
+        assert elements == invoices
+        assert stream.done
+        assert stream.document == {
+            "jsonrpc": "2.0",
+            "id": 1,
+            "result": {"other": [{"a": 1}], "invoices": [], "after": True},
+        }
+
+
+def test_array_stream_error():
+    error = {"jsonrpc": "2.0", "id": 1, "error": {"code": -32601, "message": "x"}}
+
+    stream = JSONArrayStream("invoices")
+    assert stream.feed(json.dumps(error).encode()) == []
+    assert stream.done
+    assert stream.document == error
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("stream_lists", [False, True])
+async def test_pool_stream(tmp_path, stream_lists):
+    invoices = [{"label": f"inv {i}"} for i in range(3)]
+    responses = [
+        {"jsonrpc": "2.0", "id": 1, "result": {"invoices": invoices}},
+        {"jsonrpc": "2.0", "id": 1, "error": {"code": -32602, "message": "x"}},
+    ]
+
+    async def _answer(reader, writer):
+        await reader.read(4096)
+        writer.write(json.dumps(responses.pop(0)).encode() + b"\n\n")
+        await writer.drain()
+
+    socket_path = str(tmp_path / "lightning-rpc")
+    server = await asyncio.start_unix_server(_answer, path=socket_path)
+    pool = CLNConnectionPool(socket_path, 1, stream_lists=stream_lists)
+
+    async with server:
+        elements = [e async for e in pool.stream("listinvoices", {}, "invoices", 5)]
+        assert elements == invoices
+
+        with pytest.raises(CLNRPCError):
+            async for _ in pool.stream("listinvoices", {}, "invoices", 5):
+                pass
@@ -0,0 +1,77 @@
+import app.lightning.impl.protos.lnd.router_pb2 as router
+from app.api.metrics import get_metrics
+from app.lightning.impl.lnd_htlcs import GAUGE_HTLCS, GAUGE_HTLCS_MSAT, HtlcTracker
+
+_FORWARD = router.HtlcEvent.EventType.FORWARD
+
+
+def _forward(htlc_id: int, ts: int, amt_in: int = 1100, amt_out: int = 1000):
+    e = router.HtlcEvent(
+        incoming_channel_id=1,
+        outgoing_channel_id=2,
+        incoming_htlc_id=htlc_id,
+        outgoing_htlc_id=htlc_id,
+        timestamp_ns=ts,
+        event_type=_FORWARD,
+    )
+    e.forward_event.info.incoming_amt_msat = amt_in
+    e.forward_event.info.outgoing_amt_msat = amt_out
+    return e
+
+
+def _resolve(htlc_id: int, ts: int, kind: str):
+    e = router.HtlcEvent(
+        incoming_channel_id=1,
+        outgoing_channel_id=2,
+        incoming_htlc_id=htlc_id,
+        outgoing_htlc_id=htlc_id,
+        timestamp_ns=ts,
+        event_type=_FORWARD,
+    )
+    if kind == "settle":
+        e.settle_event.preimage = b"\x01" * 32
+    else:
+        e.forward_fail_event.SetInParent()
+    return e
+
+
+def _gauges():
+    g = get_metrics().gauges
+    return g.get(GAUGE_HTLCS, {}), g.get(GAUGE_HTLCS_MSAT, {})
+
+
+def test_htlc_tracker_forwards():
+    tracker = HtlcTracker(max_htlcs=10, expiry=100)
+
+    assert tracker.handle(_forward(1, 10)) is None
+    assert tracker.handle(_forward(2, 20)) is None
+    assert len(tracker) == 2
+    assert _gauges() == ({"1": 2, "2": 2}, {"1": 2200, "2": 2000})
+
+    fwd = tracker.handle(_resolve(1, 30, "settle"))
+    assert fwd.chan_id_in == "1"
+    assert fwd.chan_id_out == "2"
+    assert fwd.fee_msat == 100
+    assert fwd.timestamp_ns == 30
+
+    assert tracker.handle(_resolve(2, 40, "fail")) is None
+    assert len(tracker) == 0
+    assert _gauges() == ({}, {})
+
+    # Unknown HTLCs are ignored
+    assert tracker.handle(_resolve(3, 50, "settle")) is None
+
+
+def test_htlc_tracker_is_bounded():
+    tracker = HtlcTracker(max_htlcs=3, expiry=100)
+
+    for i in range(5):
+        tracker.handle(_forward(i, i))
+    assert len(tracker) == 3
+    assert tracker.handle(_resolve(0, 5, "settle")) is None
+
+    tracker.handle(_forward(10, 4 + 100 * 1_000_000_000))
+    assert len(tracker) == 2
+
+    tracker.clear()
+    assert _gauges() == ({}, {})
@@ -0,0 +1,20 @@
+import pytest
+
+from app.lightning.impl.lnd_utils import fetch_pages
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("prefetch", [False, True])
+async def test_fetch_pages(prefetch):
+    items = list(range(1, 24))
+    calls = []
+
+    async def fetch(index_offset: int, page_size: int):
+        calls.append(index_offset)
+        page = [i for i in items if i > index_offset][:page_size]
+        return page, page[-1] if page else index_offset
+
+    res = [i async for i in fetch_pages(fetch, 2, page_size=5, prefetch=prefetch)]
+
+    assert res == items[2:]
+    assert calls == [2, 7, 12, 17, 22]
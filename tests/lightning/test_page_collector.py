@@ -0,0 +1,43 @@
+from app.lightning.utils import PageCollector, in_range
+
+
+def _collect(items, index_offset, max_items, reversed):
+    page = PageCollector(index_offset, max_items, reversed)
+    for i in items:
+        page.add(i)
+        if page.done:
+            break
+
+    return page
+
+
+def test_page_collector_matches_slicing():
+    items = list(range(10))
+
+    for offset in (0, 3, 9, 12):
+        for max_items in (0, 1, 4, 20):
+            for reversed in (False, True):
+                expected = list(reversed and items[::-1] or items)
+                if max_items != 0:
+                    expected = expected[offset : offset + max_items]
+
+                page = _collect(items, offset, max_items, reversed)
+                assert page.page() == expected
+
+
+def test_page_collector_stops_early():
+    page = _collect(range(100), 5, 10, False)
+    assert page.done
+    assert page.limit == 15
+    assert page.page() == list(range(5, 15))
+
+    assert PageCollector(5, 10, True).limit is None
+    assert PageCollector(5, 0, False).limit is None
+
+
+def test_in_range():
+    assert in_range(5, None, None)
+    assert in_range(5, 5, 5)
+    assert not in_range(4, 5, None)
+    assert not in_range(6, None, 5)
+    assert not in_range(None, 1, None)
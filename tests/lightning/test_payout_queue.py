@@ -0,0 +1,85 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException, status
+
+from app.lightning.payout_queue import PayoutQueue
+
+
+@pytest.mark.asyncio
+async def test_payouts_are_batched_by_count():
+    batches = []
+
+    async def send_many(outputs):
+        batches.append(outputs)
+        return f"tx{len(batches)}"
+
+    queue = PayoutQueue(send_many, window=3600, max_payouts=3)
+    res = await asyncio.gather(queue.pay("a", 1), queue.pay("b", 2), queue.pay("a", 3))
+
+    assert res == ["tx1", "tx1", "tx1"]
+    assert batches == [{"a": 4, "b": 2}]
+
+    last = asyncio.create_task(queue.pay("c", 4))
+    await asyncio.sleep(0)
+    assert len(queue) == 1
+
+    queue.flush()
+    assert await last == "tx2"
+    assert batches[1] == {"c": 4}
+
+
+@pytest.mark.asyncio
+async def test_payouts_are_batched_by_window():
+    batches = []
+
+    async def send_many(outputs):
+        batches.append(outputs)
+        return "tx"
+
+    queue = PayoutQueue(send_many, window=0.01, max_payouts=100)
+    res = await asyncio.gather(queue.pay("a", 1), queue.pay("b", 2))
+
+    assert res == ["tx", "tx"]
+    assert batches == [{"a": 1, "b": 2}]
+
+
+@pytest.mark.asyncio
+async def test_batch_error_fails_all_payouts():
+    async def send_many(outputs):
+        raise HTTPException(status.HTTP_412_PRECONDITION_FAILED, detail="funds")
+
+    queue = PayoutQueue(send_many, window=0.01, max_payouts=100)
+    res = await asyncio.gather(
+        queue.pay("a", 1), queue.pay("b", 2), return_exceptions=True
+    )
+
+    assert [r.status_code for r in res] == [412, 412]
+
+
+@pytest.mark.asyncio
+async def test_invalid_address_only_fails_its_payouts():
+    batches = []
+
+    async def send_many(outputs):
+        batches.append(outputs)
+        if "invalid" in outputs:
+            raise HTTPException(status.HTTP_400_BAD_REQUEST, detail="bad address")
+
+        return f"tx{len(batches)}"
+
+    queue = PayoutQueue(send_many, window=0.01, max_payouts=100)
+    res = await asyncio.gather(
+        queue.pay("a", 1),
+        queue.pay("invalid", 2),
+        queue.pay("b", 3),
+        queue.pay("c", 4),
+        return_exceptions=True,
+    )
+
+    assert res[1].status_code == 400
+    assert all(r.startswith("tx") for r in (res[0], res[2], res[3]))
+
+    # every valid output is sent exactly once
+    sent = [a for b in batches if "invalid" not in b for a in b]
+    assert sorted(sent) == ["a", "b", "c"]
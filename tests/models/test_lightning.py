@@ -0,0 +1,20 @@
+from app.lightning.models import Invoice
+from tests.models.utils import cln_invoice, lnd_invoice
+
+
+def test_invoice_from_lnd_grpc_matches_validation():
+    invoice = Invoice.from_lnd_grpc(lnd_invoice())
+    validated = Invoice.model_validate(invoice.model_dump())
+
+    assert invoice == validated
+    assert invoice.model_dump_json() == validated.model_dump_json()
+    assert invoice.route_hints[0].hop_hints[0].chan_id == "123456789"
+    assert invoice.htlcs[0].custom_records[0].value == "0102"
+
+
+def test_invoice_from_cln_json_matches_validation():
+    invoice = Invoice.from_cln_json(cln_invoice())
+    validated = Invoice.model_validate(invoice.model_dump())
+
+    assert invoice == validated
+    assert invoice.model_dump_json() == validated.model_dump_json()
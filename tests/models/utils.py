@@ -0,0 +1,63 @@
+import app.lightning.impl.protos.lnd.lightning_pb2 as ln
+
+
+def lnd_invoice() -> ln.Invoice:
+    i = ln.Invoice(
+        memo="memo",
+        r_preimage=bytes(32),
+        r_hash=bytes(range(32)),
+        value_msat=21000,
+        settled=True,
+        creation_date=1700000000,
+        settle_date=1700000100,
+        payment_request="lnbc210n1",
+        description_hash=bytes(range(32)),
+        expiry=3600,
+        cltv_expiry=40,
+        add_index=7,
+        settle_index=3,
+        amt_paid_sat=21,
+        amt_paid_msat=21000,
+        state=ln.Invoice.SETTLED,
+        payment_addr=bytes(32),
+    )
+
+    hint = i.route_hints.add()
+    hint.hop_hints.add(
+        node_id="02" + "a" * 64,
+        chan_id=123456789,
+        fee_base_msat=1,
+        fee_proportional_millionths=2,
+        cltv_expiry_delta=40,
+    )
+
+    htlc = i.htlcs.add(
+        chan_id=1,
+        htlc_index=2,
+        amt_msat=21000,
+        accept_height=5,
+        accept_time=6,
+        resolve_time=7,
+        expiry_height=8,
+        state=ln.SETTLED,
+        mpp_total_amt_msat=21000,
+    )
+    htlc.custom_records[5482373484] = b"\x01\x02"
+
+    i.features[14].name = "payment-addr"
+    i.features[14].is_required = True
+    i.features[14].is_known = True
+
+    return i
+
+
+def cln_invoice() -> dict:
+    return {
+        "label": "label",
+        "description": "memo",
+        "payment_hash": "ab" * 32,
+        "amount_msat": 21000,
+        "status": "unpaid",
+        "expires_at": 1700003600,
+        "bolt11": "lnbc210n1",
+    }